@@ -1,7 +1,7 @@
 import streamlit as st
 from PIL import Image
-import pandas as pd
 import os
+from src.storage import SCREENING_KIND, latest_assessment
 
 # ---------------------- PAGE CONFIG ----------------------
 st.set_page_config(
@@ -65,24 +65,18 @@ st.markdown("---")
 # ---------------------- LAST ASSESSMENT SNAPSHOT ----------------------
 st.subheader("📋 Your Latest Assessment Summary")
 
-data_path = "data/user_assessments.csv"
+last = latest_assessment(kind=SCREENING_KIND)
 
-if os.path.exists(data_path):
-    df = pd.read_csv(data_path)
+if last is not None:
 
-    if len(df) > 0:
-        last = df.iloc[-1]
+    col1, col2, col3, col4 = st.columns(4)
 
-        col1, col2, col3, col4 = st.columns(4)
+    col1.metric("🧠 PHQ-9 (Depression)", last["phq9"])
+    col2.metric("😰 GAD-7 (Anxiety)", last["gad7"])
+    col3.metric("🔥 MDQ Symptoms", last["mdq_symptoms"])
+    col4.metric("👁 PQ-B Risk", last["pqb"])
 
-        col1.metric("🧠 PHQ-9 (Depression)", last["phq9"])
-        col2.metric("😰 GAD-7 (Anxiety)", last["gad7"])
-        col3.metric("🔥 MDQ Symptoms", last["mdq_symptoms"])
-        col4.metric("👁 PQ-B Risk", last["pqb"])
-
-        st.success("Your last assessment has been loaded successfully. View the Dashboard for details.")
-    else:
-        st.warning("No previous assessments found.")
+    st.success("Your last assessment has been loaded successfully. View the Dashboard for details.")
 else:
     st.warning("No assessment data found. Please complete your first assessment!")
 
@@ -0,0 +1,851 @@
+# benchmarks.py
+"""
+Micro-benchmarks for the feature and inference hot paths.
+
+    python benchmarks.py features --n 1000000
+    python benchmarks.py feature-rss --n 50000
+    python benchmarks.py import-time --check
+    python benchmarks.py audio --n 200 --workers 4
+    python benchmarks.py rt-stats --n 1000000
+    python benchmarks.py compiled
+    python benchmarks.py serve --clients 16 --requests 50
+    python benchmarks.py summary --n 200000
+    python benchmarks.py population --n 2000000
+    python benchmarks.py shap --n 100000
+    python benchmarks.py explain
+    python benchmarks.py reports --n 500 --workers 4
+    python benchmarks.py training --n 20000
+    python benchmarks.py search --n 200000
+    python benchmarks.py stacking
+    python benchmarks.py scoring --n 1000000
+    python benchmarks.py rescore --n 500000 --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+TEXTS_CSV = "data/training_data.csv"
+
+
+def _timeit(fn, repeat=3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _sample_texts(n, seed=0):
+    base = pd.read_csv(TEXTS_CSV)["text"].astype(str).to_numpy()
+    rng = np.random.default_rng(seed)
+    return base[rng.integers(0, len(base), n)].tolist()
+
+
+# ============================================================
+# extract_features vs extract_features_batch
+# ============================================================
+
+def bench_features(n, repeat=3):
+    from src.features import FEATURE_COLUMNS, extract_features, extract_features_batch
+
+    texts = _sample_texts(n)
+    t_row, ref = _timeit(lambda: pd.DataFrame([extract_features(t) for t in texts]), repeat)
+    t_vec, out = _timeit(lambda: extract_features_batch(texts), repeat)
+    same = np.array_equal(ref[FEATURE_COLUMNS].to_numpy(np.float32), out)
+
+    print(f"texts: {n:,}")
+    print(f"per-text + DataFrame: {t_row:.3f}s ({n / t_row:,.0f} texts/sec)")
+    print(f"extract_features_batch: {t_vec:.3f}s ({n / t_vec:,.0f} texts/sec)")
+    print(f"speedup: {t_row / t_vec:.1f}x  identical: {same}")
+
+
+# ============================================================
+# dense vs sparse feature matrix: peak RSS
+# ============================================================
+
+def _feature_build_child(mode, n):
+    """Runs in a fresh interpreter so ru_maxrss reflects one path only."""
+    from src.features import build_feature_dataframe, build_feature_matrix
+    from src.perf import peak_rss_mb
+    from train import create_synthetic
+
+    df = create_synthetic(n=n)
+    # the synthetic generator has three texts; give TF-IDF a realistic vocabulary
+    rng = np.random.default_rng(0)
+    vocab = np.array([f"word{i}" for i in range(5000)])
+    df["text_response"] = [" ".join(w) for w in vocab[rng.zipf(1.3, (n, 12)) % len(vocab)]]
+    base = peak_rss_mb()
+    t0 = time.perf_counter()
+    if mode == "sparse":
+        X, cols, _ = build_feature_matrix(df, fit_tfidf=True)
+        nbytes = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    else:
+        feat, _ = build_feature_dataframe(df, fit_tfidf=True)
+        nbytes = int(feat.memory_usage(index=False).sum())
+    print(json.dumps({"mode": mode, "seconds": time.perf_counter() - t0,
+                      "matrix_mb": nbytes / 2**20, "base_rss_mb": base,
+                      "peak_rss_mb": peak_rss_mb()}))
+
+
+def bench_feature_rss(n):
+    print(f"rows: {n:,}")
+    for mode in ("dense", "sparse"):
+        out = subprocess.run([sys.executable, __file__, "_feature-build", mode, str(n)],
+                             capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:>6}: matrix {r['matrix_mb']:8.1f} MB  peak RSS {r['peak_rss_mb']:8.1f} MB "
+              f"(+{r['peak_rss_mb'] - r['base_rss_mb']:.1f} MB over input)  {r['seconds']:.2f}s")
+
+
+# ============================================================
+# audio feature extraction: serial vs process pool vs cache
+# ============================================================
+
+def _wav_clips(n, seconds=3.0, sr=16000, distinct=None, seed=0):
+    import io
+    import wave
+    rng = np.random.default_rng(seed)
+    distinct = distinct or n
+    t = np.arange(int(seconds * sr)) / sr
+    clips = []
+    for i in range(distinct):
+        y = 0.3 * np.sin(2 * np.pi * rng.uniform(100, 400) * t) + 0.05 * rng.standard_normal(len(t))
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sr)
+            w.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
+        clips.append(buf.getvalue())
+    return [clips[i % distinct] for i in range(n)]
+
+
+def bench_audio(n, workers):
+    import tempfile
+    import src.features as F
+
+    if F._librosa() is None:
+        print("librosa is not installed; audio features fall back to zeros")
+        return
+    clips = _wav_clips(n)
+    F.audio_features_from_bytes(clips[0])    # JIT warm-up (numba)
+    F.AUDIO_CACHE_DIR = tempfile.mkdtemp(prefix="audio_cache_")
+    runs = [("serial", dict(workers=1, use_cache=False)),
+            (f"pool x{workers}", dict(workers=workers, use_cache=False)),
+            ("pool, cold cache", dict(workers=workers, use_cache=True)),
+            ("warm cache", dict(workers=workers, use_cache=True))]
+    print(f"clips: {n:,} x 3 s")
+    for name, kw in runs:
+        t, _ = _timeit(lambda: F.audio_features_batch(clips, **kw), repeat=1)
+        print(f"{name:>17}: {t:7.2f}s  {n / t:9.1f} clips/sec")
+
+
+# ============================================================
+# reaction-time aggregation: per-row apply vs ragged reductions
+# ============================================================
+
+def _rt_apply(df):
+    """The original four-pass implementation of _flatten_rts, for comparison."""
+    df = df.copy()
+    df['rt_mean'] = df['reaction_times'].apply(lambda x: float(np.mean(x)) if hasattr(x, "__iter__") else float(x))
+    df['rt_std'] = df['reaction_times'].apply(lambda x: float(np.std(x)) if hasattr(x, "__iter__") else 0.0)
+    df['rt_min'] = df['reaction_times'].apply(lambda x: float(np.min(x)) if hasattr(x, "__iter__") else float(x))
+    df['rt_max'] = df['reaction_times'].apply(lambda x: float(np.max(x)) if hasattr(x, "__iter__") else float(x))
+    return df
+
+
+def bench_rt_stats(n, repeat=3):
+    from src.features import _flatten_rts, ragged_from_lists, segment_stats
+
+    rng = np.random.default_rng(0)
+    flat = rng.lognormal(0.5, 0.22, 6 * n)
+    df = pd.DataFrame({"reaction_times": [list(r) for r in flat.reshape(n, 6)]})
+    cols = ["rt_mean", "rt_std", "rt_min", "rt_max"]
+
+    t_old, ref = _timeit(lambda: _rt_apply(df), repeat=1)
+    t_new, out = _timeit(lambda: _flatten_rts(df), repeat)
+    t_flat, (values, offsets) = _timeit(lambda: ragged_from_lists(df["reaction_times"]), repeat)
+    t_red, _ = _timeit(lambda: segment_stats(values, offsets), repeat)
+    same = np.allclose(ref[cols].to_numpy(), out[cols].to_numpy(), rtol=1e-12)
+
+    print(f"participants: {n:,} x 6 reaction times")
+    print(f"4x Series.apply (mean/std/min/max): {t_old:.3f}s")
+    print(f"ragged (+median/IQR): {t_new:.3f}s  = flatten {t_flat:.3f}s + reductions {t_red:.3f}s")
+    print(f"speedup: {t_old / t_new:.1f}x  identical: {same}")
+
+
+# ============================================================
+# compiled ensemble vs predict_ensemble
+# ============================================================
+
+def bench_compiled(bundle_path, n_batch=100_000):
+    import timeit
+    from src.compiled import compile_bundle
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+    from src.model import get_bundle, predict_ensemble
+
+    bundle = get_bundle(bundle_path)
+    fused = compile_bundle(bundle)
+    X = pd.DataFrame(extract_features_batch(_sample_texts(n_batch)), columns=FEATURE_COLUMNS)
+    row_df, row = X.iloc[:1], X.to_numpy(np.float64)[:1]
+
+    def per_call(fn, number):
+        return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+    t_ref = per_call(lambda: predict_ensemble(row_df, bundle=bundle), 20)
+    t_fused = per_call(lambda: fused.predict(row), 2000)
+    print(f"single row: predict_ensemble {t_ref * 1e6:,.0f} us   compiled {t_fused * 1e6:,.1f} us "
+          f"({t_ref / t_fused:,.0f}x)")
+
+    t_ref, ref = _timeit(lambda: predict_ensemble(X, bundle=bundle), repeat=1)
+    t_fused, out = _timeit(lambda: fused.predict(X))
+    print(f"{n_batch:,} rows: predict_ensemble {t_ref:.2f}s   compiled {t_fused:.2f}s  "
+          f"max |diff| {np.max(np.abs(ref - out)):.1e}")
+
+
+# ============================================================
+# prediction service: inline per-session calls vs micro-batching
+# ============================================================
+
+def bench_serve(clients, requests, mode, max_batch, max_wait_ms):
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+    from src.model import get_bundle, predict_ensemble
+    from src.serve import PredictClient, serve
+
+    feats = extract_features_batch(_sample_texts(clients * requests))
+    rows = [dict(zip(FEATURE_COLUMNS, map(float, r))) for r in feats]
+    bundle = get_bundle()
+
+    def run(call):
+        def worker(c):
+            lat = []
+            for i in range(requests):
+                t0 = time.perf_counter()
+                call(rows[c * requests + i])
+                lat.append(time.perf_counter() - t0)
+            return lat
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(clients) as ex:
+            lat = np.concatenate(list(ex.map(worker, range(clients))))
+        return time.perf_counter() - t0, lat * 1000
+
+    def report(name, elapsed, lat):
+        print(f"{name:>14}: {len(lat) / elapsed:8.0f} req/s   p50 {np.percentile(lat, 50):7.2f} ms"
+              f"   p99 {np.percentile(lat, 99):7.2f} ms")
+
+    print(f"clients: {clients}  requests/client: {requests}  mode: {mode}")
+    report("inline", *run(lambda r: predict_ensemble(pd.DataFrame([r]), bundle=bundle, mode=mode)))
+
+    ready, holder = threading.Event(), {}
+
+    def server_thread():
+        loop = asyncio.new_event_loop()
+        holder["loop"] = loop
+        sock_path = f"/tmp/neuromindx-bench-{os.getpid()}.sock"
+        holder["url"] = f"unix://{sock_path}"
+        loop.run_until_complete(serve(unix_path=sock_path, ready=ready, mode=mode,
+                                      max_batch=max_batch, max_wait_ms=max_wait_ms))
+
+    threading.Thread(target=server_thread, daemon=True).start()
+    ready.wait(30)
+    client = PredictClient(holder["url"])
+    report("micro-batched", *run(lambda r: client.predict([r])))
+    m = client.metrics()
+    print(f"server: {m['batches']} batches, mean {m['mean_batch_rows']:.1f} rows/batch, "
+          f"latency p50 {m['latency_ms']['p50']:.2f} ms  p99 {m['latency_ms']['p99']:.2f} ms")
+
+
+# ============================================================
+# dashboard reads: full history vs summary tables
+# ============================================================
+
+def bench_summary(n, repeat=3):
+    import tempfile
+    from src import storage
+
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2024-01-01", periods=365).strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+    df = pd.DataFrame({
+        "user_id": rng.integers(1, 300, n),
+        "assessment_type": rng.choice(["depression", "anxiety", "stress"], n),
+        "score": rng.integers(0, 30, n),
+        "created_at": np.sort(days[rng.integers(0, len(days), n)]),
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, db_path = os.path.join(tmp, "a.csv"), os.path.join(tmp, "a.db")
+        df.to_csv(csv_path, index=False)
+        t_mig, _ = _timeit(lambda: storage.migrate_csv(csv_path, db_path), repeat=1)
+
+        def full():
+            hist = storage.load_assessments(db_path)
+            return hist.iloc[-1], hist.groupby("assessment_type")["score"].mean()
+
+        def summary():
+            s = storage.assessment_summary(db_path)
+            return storage.latest_assessment(db_path), s["metrics"]
+
+        t_full, (last_ref, means_ref) = _timeit(full, repeat)
+        t_sum, (last, metrics) = _timeit(summary, repeat)
+        t_last, _ = _timeit(lambda: storage.latest_assessment(db_path), repeat)
+        t_append, _ = _timeit(lambda: storage.append_record(df.iloc[0].to_dict(), db_path), repeat)
+
+    same = np.allclose(metrics.set_index("kind")["mean"].loc[means_ref.index], means_ref) \
+        and last["user_id"] == last_ref["user_id"]
+    print(f"history: {n:,} rows (import + summaries {t_mig:.2f}s)")
+    print(f"full read + iloc[-1] + groupby: {t_full * 1000:8.1f} ms")
+    print(f"summary tables + tail read:     {t_sum * 1000:8.1f} ms  ({t_full / t_sum:.0f}x)  "
+          f"latest only {t_last * 1000:.2f} ms")
+    print(f"append (row + summaries): {t_append * 1000:.2f} ms   consistent: {same}")
+
+
+# ============================================================
+# population comparison: per-render groupby vs pre-aggregated summary
+# ============================================================
+
+def bench_population(n, repeat=3):
+    import tempfile
+    from src import population
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "user_id": rng.integers(1, 300, n),
+        "assessment_type": rng.choice(["depression", "anxiety", "stress"], n),
+        "score": rng.integers(0, 30, n),
+        "created_at": "2024-01-01",
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "population.csv")
+        df.to_csv(csv_path, index=False)
+
+        def per_render():
+            pop = pd.read_csv(csv_path)
+            means = pop.groupby("assessment_type")["score"].mean()
+            scores = pop.loc[pop["assessment_type"] == "anxiety", "score"]
+            return means, 100.0 * ((scores < 17).mean() + 0.5 * (scores == 17).mean())
+
+        def summarised():
+            summary = population.population_summary(csv_path)
+            means = {r["assessment_type"]: r["mean"] for r in population.type_stats(summary)}
+            return means, population.percentile_rank(summary, "anxiety", 17)
+
+        t_old, (means_ref, pct_ref) = _timeit(per_render, repeat=1)
+        t_build, _ = _timeit(lambda: population.refresh_population_summary(csv_path), repeat=1)
+        t_new, (means, pct) = _timeit(summarised, repeat)
+        df.iloc[:1000].to_csv(csv_path, mode="a", header=False, index=False)
+        t_incr, _ = _timeit(lambda: population.population_summary(csv_path), repeat=1)
+
+    same = np.allclose([means[k] for k in means_ref.index], means_ref)
+    print(f"population: {n:,} rows")
+    print(f"read_csv + groupby per render: {t_old * 1000:9.1f} ms")
+    print(f"summary per render:            {t_new * 1000:9.3f} ms   means identical: {same}  "
+          f"percentile {pct:.2f} (exact {pct_ref:.2f})")
+    print(f"full build {t_build:.2f}s   refresh after appending 1,000 rows {t_incr * 1000:.1f} ms")
+
+
+# ============================================================
+# SHAP for plot + table: two full passes vs one shared, sampled pass
+# ============================================================
+
+def bench_shap(n, max_rows):
+    from src import explainability
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+    from src.model import get_bundle
+
+    model = get_bundle()["lgbm"]
+    X = pd.DataFrame(extract_features_batch(_sample_texts(n)), columns=FEATURE_COLUMNS)
+
+    def two_passes():
+        # what plot + table used to do: TreeSHAP over all of X, twice
+        return [np.abs(model.predict(X, pred_contrib=True)[:, :-1]).mean(axis=0)
+                for _ in range(2)][0]
+
+    def shared():
+        explainability._RESULTS.clear()
+        res = explainability.compute_shap(model, X, FEATURE_COLUMNS, max_rows=max_rows)
+        explainability.top_shap_table(model, X, FEATURE_COLUMNS, shap_result=res)
+        return np.abs(res["values"]).mean(axis=0)
+
+    t_old, ref = _timeit(two_passes, repeat=1)
+    t_new, est = _timeit(shared, repeat=1)
+    print(f"rows: {n:,}   sample: {max_rows:,}")
+    print(f"two full passes: {t_old:.2f}s   one shared sampled pass: {t_new:.2f}s "
+          f"({t_old / t_new:.0f}x)   max rel. error of mean |SHAP|: "
+          f"{np.max(np.abs(est - ref) / np.maximum(ref, 1e-12)):.3f}")
+
+
+# ============================================================
+# per-prediction explanation latency
+# ============================================================
+
+def bench_explain(bundle_path, repeat=20):
+    import timeit
+    from src.explainability import explain_prediction
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+    from src.model import get_bundle
+
+    bundle = get_bundle(bundle_path)
+    X = pd.DataFrame(extract_features_batch(_sample_texts(1)), columns=FEATURE_COLUMNS)
+    t0 = time.perf_counter()
+    res = explain_prediction(X, bundle=bundle)
+    print(f"first call (builds caches): {(time.perf_counter() - t0) * 1000:.1f} ms")
+    for name, m in res["members"].items():
+        t = min(timeit.repeat(lambda: explain_prediction(X, bundle=bundle, members=[name]),
+                              number=repeat, repeat=3)) / repeat
+        print(f"{name:>9} ({m['method']:>16}): {t * 1000:6.2f} ms   "
+              f"base {m['base']:.3f} + sum {m['contributions'].sum():+.3f} = {m['proba']:.3f}")
+    t = min(timeit.repeat(lambda: explain_prediction(X, bundle=bundle), number=repeat,
+                          repeat=3)) / repeat
+    print(f"whole ensemble: {t * 1000:.2f} ms")
+
+
+# ============================================================
+# PDF reports: matplotlib images vs native reportlab drawing
+# ============================================================
+
+def _report_matplotlib(inference):
+    """The previous build_report_bytes body: risk bar and table through matplotlib PNGs."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from io import BytesIO
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    def png(fig):
+        buf = BytesIO()
+        plt.savefig(buf, format="png", dpi=150, bbox_inches="tight")
+        plt.close(fig)
+        return buf.getvalue()
+
+    proba = inference["proba"]
+    fig, ax = plt.subplots(figsize=(6, 0.8))
+    ax.barh([0], [proba], color="#ef553b")
+    ax.barh([0], [1 - proba], left=[proba], color="#e6e6e6")
+    ax.set_xlim(0, 1)
+    ax.axis("off")
+    bar = png(fig)
+    df = pd.DataFrame(list(inference["features"].items()), columns=["feature", "value"])
+    df = df.sort_values("feature").head(18)
+    fig, ax = plt.subplots(figsize=(6, len(df) * 0.25 + 0.5))
+    ax.axis("off")
+    table = ax.table(cellText=df.values, colLabels=df.columns, loc="center")
+    table.auto_set_font_size(False)
+    table.set_fontsize(8)
+    table.scale(1, 1.2)
+    feat = png(fig)
+
+    out = BytesIO()
+    c = canvas.Canvas(out, pagesize=A4)
+    w, h = A4
+    c.drawImage(ImageReader(BytesIO(bar)), 40, h - 140, width=400, height=60)
+    c.drawImage(ImageReader(BytesIO(feat)), 40, h - 720, width=500, height=200)
+    c.showPage()
+    c.save()
+    return out.getvalue()
+
+
+def bench_reports(n, workers):
+    import tempfile
+    import report
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+
+    feats = pd.DataFrame(extract_features_batch(_sample_texts(n)), columns=FEATURE_COLUMNS)
+    rng = np.random.default_rng(0)
+    inferences = [{"proba": float(p), "features": f}
+                  for p, f in zip(rng.random(n), feats.to_dict(orient="records"))]
+    sample = inferences[:min(n, 50)]
+
+    t_old, _ = _timeit(lambda: [_report_matplotlib(i) for i in sample], repeat=1)
+    t_new, _ = _timeit(lambda: [report.build_report_bytes(i) for i in sample], repeat=1)
+    print(f"single process, {len(sample)} reports: matplotlib {len(sample) / t_old:6.1f} pages/sec"
+          f"   reportlab {len(sample) / t_new:6.1f} pages/sec ({t_old / t_new:.0f}x)")
+    with tempfile.TemporaryDirectory() as tmp:
+        report.build_reports(inferences, tmp, workers=1)
+        report.build_reports(inferences, tmp, workers=workers)
+    print(f"(cpu count: {os.cpu_count()}; pool speed-up is bounded by available cores)")
+
+
+def bench_training(n, cores):
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+    from src.training import default_members, train_members
+
+    texts = _sample_texts(n)
+    X = pd.DataFrame(extract_features_batch(texts), columns=FEATURE_COLUMNS)
+    y = (X["num_words"] > X["num_words"].median()).astype(int).to_numpy()
+    specs = default_members(random_state=0)
+    _, seq = train_members(X, y, specs, cores=cores, parallel=False, verbose=False)
+    _, par = train_members(X, y, specs, cores=cores, parallel=True, verbose=False)
+    print(par.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    t_seq, t_par = seq.attrs["wall_s"], par.attrs["wall_s"]
+    print(f"{n} rows: sequential {t_seq:.2f}s   parallel {t_par:.2f}s ({t_seq / t_par:.1f}x)"
+          f"   slowest member {par['wall_s'].max():.2f}s")
+    print(f"(cpu count: {os.cpu_count()}; parallel wall time approaches the slowest member "
+          f"only with at least one core per member)")
+
+
+def bench_search(n, folds):
+    import itertools
+    import tempfile
+    from src import search
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+
+    texts = _sample_texts(n)
+    y = np.arange(n) % 2
+
+    def make_xy():
+        return pd.DataFrame(extract_features_batch(texts), columns=FEATURE_COLUMNS), y
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t_build, cache = _timeit(lambda: search.fold_cache(make_xy, {"n": n}, n_folds=folds,
+                                                           cache_dir=tmp), repeat=1)
+        t_extract, _ = _timeit(make_xy, repeat=1)
+        t_load, _ = _timeit(lambda: [np.asarray(a) for a in search.load_fold(cache, 0)])
+    print(f"{n} rows, {folds} folds: cache build {t_build:.2f}s; per trial: "
+          f"re-extract {t_extract * 1e3:8.1f} ms   cached fold {t_load * 1e3:6.1f} ms "
+          f"({t_extract / t_load:.0f}x)")
+
+    rng = np.random.default_rng(0)
+    for member, space in search.SPACES.items():
+        _, _, r_max = space["resource"]
+        grid = int(np.prod([len(v) for v in space["params"].values()]))
+        hb = sum(max(1, int(b["n"] * search.ETA ** -i)) * b["r"] * search.ETA ** i
+                 for b in search.brackets(member, rng=rng) for i in range(b["s"] + 1))
+        print(f"  {member:<9} grid {grid:3d} configs x {r_max} = {grid * r_max:8.0f}   "
+              f"hyperband {hb:8.0f} resource units per fold ({grid * r_max / hb:.1f}x less)")
+
+
+def bench_stacking(bundle_path, folds, repeat=50):
+    from src.model import get_bundle, predict_ensemble
+    from src.search import csv_fold_cache, load_full
+    from src.stacking import stack_bundle
+
+    bundle = dict(get_bundle(bundle_path))
+    bundle.pop("stacker", None)
+    cache = csv_fold_cache(TEXTS_CSV, n_folds=folds)
+    stacked = dict(bundle)
+    stacker = stack_bundle(stacked, cache, verbose=False)
+    X, _ = load_full(cache)
+    row = X.iloc[:1]
+
+    def per_call(b):
+        predict_ensemble(row, bundle=b)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            predict_ensemble(row, bundle=b)
+        return (time.perf_counter() - t0) / repeat
+
+    t_mean, t_stack = per_call(bundle), per_call(stacked)
+    print(f"out-of-fold AUC: equal mean {stacker['auc_mean']:.4f}   "
+          f"stacked {stacker['auc']:.4f} (all members {stacker['auc_all']:.4f})")
+    print("member AUC:", {n: round(v, 4) for n, v in stacker["member_auc"].items()})
+    print(f"members {stacker['members']} weights {[round(w, 3) for w in stacker['weights']]}, "
+          f"pruned {stacker['pruned'] or 'none'}")
+    print(f"single row: equal mean {t_mean * 1e3:.2f} ms   stacked {t_stack * 1e3:.2f} ms "
+          f"({t_mean / t_stack:.1f}x)")
+    t_scores, _ = _timeit(lambda: predict_ensemble(X, bundle=bundle), repeat=1)
+    t_pruned, _ = _timeit(lambda: predict_ensemble(X, bundle=stacked), repeat=1)
+    print(f"{len(X):,} rows: equal mean {t_scores:.3f}s   stacked {t_pruned:.3f}s")
+
+
+def _reference_scoring(r):
+    """The rules as run_assessment applied them inline (before src/scoring.py)."""
+    def risk_label(score, thresholds):
+        for th, label in thresholds:
+            if score <= th:
+                return label
+        return thresholds[-1][1]
+    dep_label = risk_label(r["phq9"], [(4,"Minimal"),(9,"Mild"),(14,"Moderate"),(19,"Moderately severe"),(27,"Severe")])
+    anx_label = risk_label(r["gad7"], [(4,"Minimal"),(9,"Mild"),(14,"Moderate"),(21,"Severe")])
+    psychosis_risk = "Elevated" if r["pqb"] >= 2 else "Low"
+    bipolar_flag = "Positive" if r["mdq_positive"] else "Negative"
+    cog_total = r["mem_score"] + (1 if r["vf_score"] < 10 else 2) + r["clock_score"]
+    if cog_total <= 2:
+        cog_label = "Possible Cognitive Concern"
+    elif cog_total <= 4:
+        cog_label = "Mild Concerns"
+    else:
+        cog_label = "No major cognitive concerns noted"
+    motor_label = "Normal"
+    if r["taps"] < 15:
+        motor_label = "Bradykinesia-like (low taps) — consider evaluation for parkinsonism"
+    summary = []
+    if dep_label in ("Moderate","Moderately severe","Severe"):
+        summary.append(("Depression", dep_label))
+    if anx_label in ("Moderate","Severe"):
+        summary.append(("Anxiety", anx_label))
+    if bipolar_flag == "Positive":
+        summary.append(("Bipolar disorder (screen)", "Possible — MDQ positive"))
+    if psychosis_risk == "Elevated":
+        summary.append(("Psychosis risk / Prodrome", "Elevated"))
+    if cog_label != "No major cognitive concerns noted":
+        summary.append(("Cognitive impairment", cog_label))
+    if motor_label != "Normal":
+        summary.append(("Motor/parkinsonism", motor_label))
+    return {"dep_label": dep_label, "anx_label": anx_label, "cog_label": cog_label,
+            "motor_label": motor_label, "urgent_suicidal": r["phq9_item9"] >= 1,
+            "urgent_psychosis": r["pqb"] >= 3,
+            "summary": ";".join([f"{c}:{n}" for c,n in summary]) or "No major signals"}
+
+
+def _raw_assessments(n, seed=0):
+    from src.scoring import ITEMS, RECALL_WORDS
+    rng = np.random.default_rng(seed)
+    cols = {}
+    for prefix, k in ITEMS.items():
+        hi = {"phq9": 4, "gad7": 4, "mdq": 2, "pqb": 2}[prefix]
+        for i in range(1, k + 1):
+            cols[f"{prefix}_{i}"] = rng.integers(0, hi, n)
+    cols["mdq_impair"] = rng.choice(["No", "Yes"], n)
+    words = np.array(RECALL_WORDS + ["cat", "", " "])
+    cols["recall_input"] = [", ".join(w) for w in rng.choice(words, (n, 3))]
+    cols["vf_input"] = [",".join(w) for w in rng.choice(np.array(["dog", " cat", "", " "]), (n, 12))]
+    cols["clock_hour"] = rng.integers(1, 13, n)
+    cols["clock_min"] = rng.integers(0, 60, n)
+    cols["taps"] = rng.integers(5, 40, n)
+    return pd.DataFrame(cols)
+
+
+def bench_scoring(n, sample=20_000):
+    from src.scoring import ITEMS, score_frame
+
+    raw = _raw_assessments(n)
+    t_raw, scored = _timeit(lambda: score_frame(raw), repeat=1)
+    totals = scored[["phq9", "phq9_item9", "gad7", "mdq_symptoms", "mdq_positive", "pqb",
+                     "mem_score", "vf_score", "clock_score", "taps"]]
+    t_tot, again = _timeit(lambda: score_frame(totals), repeat=1)
+    assert (again["summary"] == scored["summary"]).all()
+
+    records = totals.iloc[:sample].to_dict(orient="records")
+    t_ref, ref = _timeit(lambda: [_reference_scoring(r) for r in records], repeat=1)
+    ref = pd.DataFrame(ref)
+    mismatches = {c: int((ref[c].to_numpy() != np.asarray(scored[c].iloc[:sample], dtype=ref[c].dtype)).sum())
+                  for c in ref.columns}
+    # raw items: totals and derived scores match a per-row recomputation
+    r0 = raw.iloc[:sample]
+    checks = {
+        "phq9": r0[[f"phq9_{i}" for i in range(1, ITEMS["phq9"] + 1)]].sum(axis=1),
+        "mdq_positive": (r0[[f"mdq_{i}" for i in range(1, 8)]].sum(axis=1) >= 5)
+                        & (r0["mdq_impair"] == "Yes"),
+        "mem_score": r0["recall_input"].map(lambda s: sum(1 for w in ["apple", "penny", "river",
+                                                                       "window", "tiger"] if w in s.lower())),
+        "vf_score": r0["vf_input"].map(lambda s: len([a.strip() for a in s.split(",") if a.strip()])),
+        "clock_score": r0["clock_hour"].isin((10, 11, 12)).astype(int) + r0["clock_min"].isin((9, 10, 11)),
+    }
+    for c, v in checks.items():
+        mismatches[c] = int((v.to_numpy() != scored[c].iloc[:sample].to_numpy()).sum())
+    per_row = t_ref / sample
+    print(f"{n:,} assessments: vectorized {t_raw:.2f}s from raw items, {t_tot:.2f}s from totals "
+          f"({n / t_tot:,.0f} rows/s)")
+    print(f"per-row rules: {per_row * 1e6:.1f} us/row -> {per_row * n:.1f}s for {n:,} "
+          f"({per_row * n / t_tot:.0f}x)")
+    print(f"mismatches vs interactive rules on {sample:,} rows: {mismatches}")
+    print(scored["summary"].value_counts().head(5).to_string())
+
+
+def bench_rescore(n, workers=4, chunk_rows=50_000, sample=20_000):
+    import shutil
+    import tempfile
+    from src import rescore, storage
+    from src.scoring import score_frame, summary_column
+
+    totals = score_frame(_raw_assessments(n), labels=False)[rescore.SCORE_COLUMNS]
+    totals["summary"] = "stale"
+    column = summary_column()
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, db_path = os.path.join(tmp, "a.csv"), os.path.join(tmp, "a.db")
+        totals.to_csv(csv_path, index=False)
+        storage.migrate_csv(csv_path, db_path)
+        times = {}
+        for w in sorted({1, workers}):
+            path = os.path.join(tmp, f"w{w}.db")
+            shutil.copy(db_path, path)
+            times[w], done = _timeit(lambda: rescore.rescore_store(
+                path, workers=w, chunk_rows=chunk_rows, verbose=False), repeat=1)
+
+        # interrupted after two chunks, then resumed from the checkpoint
+        write, calls = rescore.write_column, []
+
+        def interrupted(*a, **k):
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            calls.append(1)
+            return write(*a, **k)
+
+        rescore.write_column = interrupted
+        try:
+            rescore.rescore_store(db_path, workers=workers, chunk_rows=chunk_rows, verbose=False)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            rescore.write_column = write
+        ckpt = storage.get_meta(rescore.checkpoint_key(), db_path)
+        resumed = rescore.rescore_store(db_path, workers=workers, chunk_rows=chunk_rows,
+                                        verbose=False)
+        stored = storage.read_rows(0, n, [column], db_path=db_path)[column]
+
+        out_csv = os.path.join(tmp, "out.csv")
+        t_csv, _ = _timeit(lambda: rescore.rescore_csv(
+            csv_path, out_csv, workers=workers, chunk_rows=chunk_rows, verbose=False), repeat=1)
+        from_csv = pd.read_csv(out_csv)[column]
+
+    ref = pd.Series([_reference_scoring(r)["summary"]
+                     for r in totals.iloc[:sample].to_dict(orient="records")])
+    print(f"{n:,} stored assessments, {chunk_rows:,} rows per chunk")
+    for w, t in times.items():
+        print(f"  store, {w} worker(s): {t:6.2f}s  ({n / t:,.0f} rows/s)")
+    print(f"  CSV, {workers} worker(s):   {t_csv:6.2f}s  ({n / t_csv:,.0f} rows/s)")
+    print(f"resume: interrupted at rowid {ckpt}, resumed run re-scored {resumed:,} rows; "
+          f"missing {int(stored.isna().sum())}")
+    print(f"mismatches vs interactive rules on {sample:,} rows: "
+          f"store {int((stored.iloc[:sample].to_numpy() != ref.to_numpy()).sum())}, "
+          f"CSV {int((from_csv.iloc[:sample].to_numpy() != ref.to_numpy()).sum())}")
+
+
+# ============================================================
+# cold import time of page-facing modules
+# ============================================================
+
+def bench_import_time(check=False):
+    from src.perf import IMPORT_BASELINE, IMPORT_BUDGETS, check_import_budget, import_baseline
+
+    baseline = import_baseline()
+    print(f"{'import ' + IMPORT_BASELINE:<20} {baseline:8.1f} ms  (baseline)")
+    failures = []
+    for module, budget in IMPORT_BUDGETS.items():
+        total, problems = check_import_budget(module, budget, baseline)
+        status = "ok" if not problems else "OVER"
+        print(f"{module:<20} {total:8.1f} ms  (budget {budget:g} x = {budget * baseline:.0f} ms)  {status}")
+        failures += problems
+    for p in failures:
+        print("  -", p)
+    if check and failures:
+        sys.exit(1)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="NeuroMindX micro-benchmarks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("features", help="per-text vs batch text features")
+    p.add_argument("--n", type=int, default=1_000_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("feature-rss", help="peak RSS of dense vs sparse build_feature_*")
+    p.add_argument("--n", type=int, default=50_000)
+
+    p = sub.add_parser("import-time", help="cold import time of page-facing modules")
+    p.add_argument("--check", action="store_true", help="exit 1 if any budget is exceeded")
+
+    p = sub.add_parser("audio", help="audio feature throughput (needs librosa)")
+    p.add_argument("--n", type=int, default=200)
+    p.add_argument("--workers", type=int, default=4)
+
+    p = sub.add_parser("rt-stats", help="reaction-time aggregation, apply vs ragged")
+    p.add_argument("--n", type=int, default=1_000_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("compiled", help="single-row latency of the compiled ensemble")
+    p.add_argument("--bundle", default="models/final_model")
+    p.add_argument("--n", type=int, default=100_000, help="rows for the batch comparison")
+
+    p = sub.add_parser("serve", help="concurrent clients: inline vs micro-batching service")
+    p.add_argument("--clients", type=int, default=16)
+    p.add_argument("--requests", type=int, default=50, help="requests per client")
+    p.add_argument("--mode", default="sequential")
+    p.add_argument("--max-batch", type=int, default=64)
+    p.add_argument("--max-wait-ms", type=float, default=5.0)
+
+    p = sub.add_parser("summary", help="dashboard reads: full history vs summary tables")
+    p.add_argument("--n", type=int, default=200_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("population", help="population comparison: groupby vs summary")
+    p.add_argument("--n", type=int, default=2_000_000)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("shap", help="SHAP plot + table: two full passes vs shared sample")
+    p.add_argument("--n", type=int, default=100_000)
+    p.add_argument("--max-rows", type=int, default=10_000)
+
+    p = sub.add_parser("explain", help="per-prediction explanation latency")
+    p.add_argument("--bundle", default="models/final_model")
+
+    p = sub.add_parser("reports", help="PDF reports: matplotlib vs native drawing, process pool")
+    p.add_argument("--n", type=int, default=500)
+    p.add_argument("--workers", type=int, default=4)
+
+    p = sub.add_parser("training", help="ensemble fit: sequential vs concurrent members")
+    p.add_argument("--n", type=int, default=20_000)
+    p.add_argument("--cores", type=int, default=None)
+
+    p = sub.add_parser("search", help="hyperparameter search: fold cache and Hyperband budget")
+    p.add_argument("--n", type=int, default=200_000)
+    p.add_argument("--folds", type=int, default=3)
+
+    p = sub.add_parser("stacking", help="equal mean vs learned weights with pruned members")
+    p.add_argument("--bundle", default="models/final_model")
+    p.add_argument("--folds", type=int, default=5)
+
+    p = sub.add_parser("scoring", help="assessment rules: per-row vs vectorized engine")
+    p.add_argument("--n", type=int, default=1_000_000)
+
+    p = sub.add_parser("rescore", help="bulk re-scoring of stored assessments, resume")
+    p.add_argument("--n", type=int, default=500_000)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--chunk-rows", type=int, default=50_000)
+
+    p = sub.add_parser("_feature-build")
+    p.add_argument("mode", choices=["dense", "sparse"])
+    p.add_argument("n", type=int)
+
+    args = ap.parse_args(argv)
+    if args.cmd == "features":
+        bench_features(args.n, args.repeat)
+    elif args.cmd == "feature-rss":
+        bench_feature_rss(args.n)
+    elif args.cmd == "import-time":
+        bench_import_time(args.check)
+    elif args.cmd == "audio":
+        bench_audio(args.n, args.workers)
+    elif args.cmd == "rt-stats":
+        bench_rt_stats(args.n, args.repeat)
+    elif args.cmd == "compiled":
+        bench_compiled(args.bundle, args.n)
+    elif args.cmd == "serve":
+        bench_serve(args.clients, args.requests, args.mode, args.max_batch, args.max_wait_ms)
+    elif args.cmd == "summary":
+        bench_summary(args.n, args.repeat)
+    elif args.cmd == "population":
+        bench_population(args.n, args.repeat)
+    elif args.cmd == "shap":
+        bench_shap(args.n, args.max_rows)
+    elif args.cmd == "explain":
+        bench_explain(args.bundle)
+    elif args.cmd == "reports":
+        bench_reports(args.n, args.workers)
+    elif args.cmd == "training":
+        bench_training(args.n, args.cores)
+    elif args.cmd == "search":
+        bench_search(args.n, args.folds)
+    elif args.cmd == "stacking":
+        bench_stacking(args.bundle, args.folds)
+    elif args.cmd == "scoring":
+        bench_scoring(args.n)
+    elif args.cmd == "rescore":
+        bench_rescore(args.n, args.workers, args.chunk_rows)
+    elif args.cmd == "_feature-build":
+        _feature_build_child(args.mode, args.n)
+
+
+if __name__ == "__main__":
+    main()
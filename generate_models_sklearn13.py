@@ -2,22 +2,15 @@
 
 import os
 import random
-import joblib
 import numpy as np
 import pandas as pd
 
 from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.neural_network import MLPClassifier
 
-try:
-    from lightgbm import LGBMClassifier
-    lgbm_available = True
-except:
-    lgbm_available = False
-
-from src.features import extract_features
+from src.features import extract_features_batch, FEATURE_COLUMNS
+from src.compiled import export_compiled
+from src.artifact import save_bundle
+from src.training import default_members, train_members
 
 # ==============================================================
 # 1. Generate synthetic dataset
@@ -44,74 +37,66 @@ def gen_text(label):
     return base + random.choice(["", " I don't know why.", " It's been this way."])
 
 
-print("Generating data...")
-rows = []
-for _ in range(1500):
-    lbl = 1 if random.random() < 0.5 else 0
-    rows.append({"text": gen_text(lbl), "label": lbl})
-
-df = pd.DataFrame(rows)
-os.makedirs("data", exist_ok=True)
-df.to_csv("data/training_data.csv", index=False)
+# The pool in train_members re-imports this file in each worker under the
+# spawn start method (macOS, Windows), so the script body lives in main().
+def main():
+    print("Generating data...")
+    rows = []
+    for _ in range(1500):
+        lbl = 1 if random.random() < 0.5 else 0
+        rows.append({"text": gen_text(lbl), "label": lbl})
 
+    df = pd.DataFrame(rows)
+    os.makedirs("data", exist_ok=True)
+    df.to_csv("data/training_data.csv", index=False)
 
-# ==============================================================
-# 2. Extract features using YOUR extractor
-# ==============================================================
 
-print("Extracting features...")
-X = pd.DataFrame([extract_features(t) for t in df["text"]])
-y = df["label"]
+    # ==============================================================
+    # 2. Extract features using YOUR extractor
+    # ==============================================================
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
+    print("Extracting features...")
+    X = pd.DataFrame(extract_features_batch(df["text"]), columns=FEATURE_COLUMNS)
+    y = df["label"]
 
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
 
-# ==============================================================
-# 3. Train models using sklearn 1.3.0 (YOUR system)
-# ==============================================================
 
-print("Training Logistic Regression...")
-logistic = LogisticRegression(max_iter=2000)
-logistic.fit(X_train, y_train)
+    # ==============================================================
+    # 3. Train models using sklearn 1.3.0 (YOUR system)
+    # ==============================================================
 
-print("Training Random Forest...")
-rf = RandomForestClassifier(n_estimators=200, random_state=42)
-rf.fit(X_train, y_train)
+    print("Training Logistic Regression, Random Forest, MLP and LightGBM...")
+    # Members are fitted concurrently; LightGBM missing -> RF fallback (src/training.py)
+    models, _ = train_members(X_train, y_train,
+                              default_members(random_state=42, logistic_max_iter=2000),
+                              X_val=X_test, y_val=y_test)
+    logistic, rf, mlp, lgbm = (models[n] for n in ("logistic", "rf", "mlp", "lgbm"))
 
-print("Training MLP...")
-mlp = MLPClassifier(hidden_layer_sizes=(64, 32), max_iter=600, random_state=42)
-mlp.fit(X_train, y_train)
 
-if lgbm_available:
-    print("Training LightGBM...")
-    lgbm = LGBMClassifier(random_state=42)
-    lgbm.fit(X_train, y_train)
-else:
-    print("LightGBM not installed → fallback RF")
-    lgbm = rf
+    # ==============================================================
+    # 4. Save models as one versioned artifact (src/artifact.py)
+    # ==============================================================
 
+    os.makedirs("models", exist_ok=True)
 
-# ==============================================================
-# 4. Save models properly for sklearn 1.3.0
-# ==============================================================
+    bundle = {
+        "logistic": logistic,
+        "rf": rf,
+        "mlp": mlp,
+        "lgbm": lgbm
+    }
 
-os.makedirs("models", exist_ok=True)
+    save_bundle(bundle, "models/final_model")
 
-joblib.dump(logistic, "models/logistic.pkl")
-joblib.dump(rf, "models/rf.pkl")
-joblib.dump(mlp, "models/mlp.pkl")
-joblib.dump(lgbm, "models/lgbm.pkl")
+    # NumPy-only fused artifact for low-latency scoring (see src/compiled.py)
+    diff = export_compiled("models/final_model", "models/final_model.npz")
+    print(f"Compiled ensemble -> models/final_model.npz (max |diff| {diff:.1e})")
 
-bundle = {
-    "logistic": logistic,
-    "rf": rf,
-    "mlp": mlp,
-    "lgbm": lgbm
-}
+    print("\n✔ All models saved in models/final_model/ using sklearn 1.3.0")
 
-joblib.dump(bundle, "models/ensemble.pkl")
-joblib.dump(bundle, "models/final_model.pkl")
 
-print("\n✔ All models saved in /models using sklearn 1.3.0")
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,71 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from src.dashboard_utils import get_summary_metrics, get_radar_chart, get_recommendations
+from src.storage import SCREENING_KIND, assessment_summary
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 st.title("📊 Mental Health Insights Dashboard")
 
 st.markdown("""
 Welcome to your **Personal Wellness Dashboard**.  
-Here you’ll see a summary of your recent assessments and any early-warning signals for neuropsychiatric conditions (like depression, anxiety, ADHD, or mild cognitive issues).
+Here you’ll see a summary of your recent assessments: the latest screening scores, how they compare with your own history, and how they have changed over time.
 """)
 
-# Load user data
-try:
-    df = pd.read_csv("data/user_assessments.csv")
-except FileNotFoundError:
+# Load running aggregates (counts / means / daily trends), not the full history
+stats = assessment_summary()
+if stats["count"] == 0:
     st.warning("⚠️ No assessment data found. Please complete an assessment first!")
     st.stop()
 
-summary = get_summary_metrics(df)
+INSTRUMENTS = {
+    "phq9": "🧠 PHQ-9 (Depression)",
+    "gad7": "😰 GAD-7 (Anxiety)",
+    "mdq_symptoms": "🔥 MDQ Symptoms",
+    "pqb": "👁 PQ-B Risk",
+    "mem_score": "📝 Memory Recall",
+    "vf_score": "🗣 Verbal Fluency",
+    "clock_score": "🕒 Clock Drawing",
+    "taps": "👆 Finger Taps",
+}
 
-# --- Top cards
-st.markdown("### 🧠 Overall Mental Health Summary")
-col1, col2, col3, col4 = st.columns(4)
-col1.metric("Mood Stability", f"{summary['mood_stability']} / 10")
-col2.metric("Stress Control", f"{summary['stress_control']} / 10")
-col3.metric("Sleep Quality", f"{summary['sleep_quality']} / 10")
-col4.metric("Energy Levels", f"{summary['energy']} / 10")
+metrics = stats["metrics"]
+screening = metrics[metrics["kind"] == SCREENING_KIND].set_index("metric")
 
-st.markdown("---")
+# --- Top cards: the latest screening's stored totals
+st.markdown("### 🧠 Latest Screening")
+if screening.empty:
+    st.info("No screening assessment recorded yet.")
+else:
+    shown = [m for m in INSTRUMENTS if m in screening.index]
+    for row in range(0, len(shown), 4):
+        for col, metric in zip(st.columns(4), shown[row:row + 4]):
+            last, mean = screening.at[metric, "last"], screening.at[metric, "mean"]
+            col.metric(INSTRUMENTS[metric], f"{last:g}", f"{last - mean:+.1f} vs your average",
+                       delta_color="off")
 
-# --- Overall score
-st.subheader("💫 Overall Health Index")
-st.progress(summary["wellness_score"] / 100)
-st.write(f"**Your Mental Wellness Score:** {summary['wellness_score']:.1f}/100")
+st.markdown("---")
 
-# --- Radar Chart
-st.markdown("### 📈 Pattern Overview")
-radar_fig = get_radar_chart(summary)
-st.plotly_chart(radar_fig, use_container_width=True)
+# --- Per-instrument history
+st.markdown("### 📈 Your History")
+history = screening.loc[[m for m in INSTRUMENTS if m in screening.index],
+                        ["n", "mean", "std", "min", "max", "last"]]
+history.index = [INSTRUMENTS[m] for m in history.index]
+st.dataframe(history.round(2), use_container_width=True)
 
-# --- Risk Analysis Bar Chart
-risk_levels = pd.DataFrame({
-    "Domain": ["Depression Risk", "Anxiety Risk", "ADHD-Like Patterns", "Cognitive Decline Risk"],
-    "Probability (%)": [
-        summary["depression_risk"],
-        summary["anxiety_risk"],
-        summary["adhd_risk"],
-        summary["cognitive_risk"]
-    ]
-})
-bar_fig = px.bar(
-    risk_levels,
-    x="Domain",
-    y="Probability (%)",
-    color="Probability (%)",
-    color_continuous_scale="RdYlGn_r",
-    title="🧩 Risk Prediction Overview"
-)
-st.plotly_chart(bar_fig, use_container_width=True)
+trend = stats["trend"]
+trend = trend[(trend["kind"] == SCREENING_KIND) & trend["metric"].isin(INSTRUMENTS)]
+if len(trend):
+    trend = trend.assign(Instrument=trend["metric"].map(INSTRUMENTS),
+                         Day=pd.to_datetime(trend["bucket"], errors="coerce"))
+    line_fig = px.line(trend, x="Day", y="mean", color="Instrument", markers=True,
+                       labels={"mean": "Daily mean"}, title="🧩 Daily Scores")
+    st.plotly_chart(line_fig, use_container_width=True)
 
-# --- Recommendations
-st.markdown("### 🌿 Personalized Recommendations")
-for rec in get_recommendations(summary):
-    st.success(f"💡 {rec}")
+# --- Other assessment types
+kinds = stats["kinds"]
+st.markdown("### 🗂 Assessments Recorded")
+st.dataframe(kinds.rename(columns={"kind": "Type", "n": "Count", "last_at": "Last taken"}),
+             use_container_width=True, hide_index=True)
 
 st.markdown("---")
-st.markdown("If any of your risk levels are above 70%, it’s advisable to consult a licensed mental-health professional for a detailed evaluation.")
+st.markdown("Scores are screening totals, not a diagnosis. If a score worries you, consult a licensed mental-health professional for a detailed evaluation.")
@@ -1,36 +1,37 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import os
 
 from src.features import extract_features   # your real extractor
+from src.model import ensemble_weights, get_bundle, predict_ensemble, MODES
+from src.explainability import explain_prediction
+from src.serve import client_from_env
 
 
 # ============================================================
 # SAFE MODEL LOADER (NO IMPORT ERRORS)
 # ============================================================
 
-@st.cache_resource
 def load_model():
     """
     Safely loads the ensemble model stored in:
-        models/final_model.pkl
+        models/final_model/  (artifact directory, see src/artifact.py)
     Works with sklearn 1.3.0
+    Served from the shared in-process registry: unpickled once per
+    process and reloaded only when the file changes.
     """
     base = os.path.dirname(os.path.dirname(__file__))  # Neuromindx project root
-    model_path = os.path.join(base, "models", "final_model.pkl")
+    model_path = os.path.join(base, "models", "final_model")
 
     if not os.path.exists(model_path):
-        st.error("❌ final_model.pkl is missing in /models folder!")
+        st.error("❌ final_model is missing in /models folder!")
         return None
     
-    try:
-        model = joblib.load(model_path)
-        return model
-    except Exception as e:
-        st.error(f"❌ Failed to load model: {e}")
-        return None
+    model = get_bundle(model_path)
+    if model is None:
+        st.error("❌ Failed to load model bundle (see server log).")
+    return model
 
 
 # ============================================================
@@ -49,6 +50,9 @@ bundle = load_model()
 if bundle is None:
     st.stop()
 
+# Shared micro-batching service (python -m src.serve), if NEUROMINDX_PREDICT_URL is set
+client = client_from_env()
+
 
 # ============================================================
 # INPUT BOX
@@ -59,6 +63,23 @@ user_text = st.text_area(
     placeholder="Example: I feel stressed and tired today..."
 )
 
+with st.expander("⚙️ Inference settings"):
+    if client is not None:
+        # the service scores every request in the mode it was started with (--mode)
+        try:
+            mode = client.metrics()["mode"]
+            st.caption(f"Ensemble execution mode: **{mode}** (set by the prediction service).")
+        except Exception:
+            mode = "sequential"
+            st.caption("Prediction service unreachable; this session scores in sequential mode.")
+    else:
+        mode = st.selectbox(
+            "Ensemble execution mode",
+            MODES,
+            help="parallel: run members concurrently. cascade: skip RF/MLP when logistic is confident. "
+                 "compiled: all members fused into one NumPy pass."
+        )
+
 
 # ============================================================
 # RUN PREDICTION
@@ -76,19 +97,18 @@ if st.button("Analyze"):
     st.write("### Extracted Features")
     st.write(X)
 
-    # Run ensemble prediction
+    # Run ensemble prediction (through the shared prediction service if configured)
     try:
-        p1 = bundle["logistic"].predict_proba(X)[:, 1]
-        p2 = bundle["rf"].predict_proba(X)[:, 1]
-        p3 = bundle["mlp"].predict_proba(X)[:, 1]
-
-        # LightGBM behaves differently; use predict() not predict_proba()
-        try:
-            p4 = bundle["lgbm"].predict(X)
-        except:
-            p4 = p1  # fallback
-
-        final_score = float((p1 + p2 + p3 + p4) / 4)
+        scores = None
+        if client is not None:
+            try:
+                scores, info = client.predict(X, return_info=True)
+                timings = {"service": info["latency_ms"] / 1000.0, "batch_rows": info["batch_rows"]}
+            except Exception as e:
+                st.warning(f"Prediction service unavailable ({e}); scoring in this session.")
+        if scores is None:
+            scores, timings = predict_ensemble(X, bundle=bundle, mode=mode, return_timings=True)
+        final_score = float(scores[0])
 
     except Exception as e:
         st.error(f"Prediction failed: {e}")
@@ -114,5 +134,25 @@ if st.button("Analyze"):
     else:
         st.error("🔴 High Risk — You may be experiencing emotional distress.")
 
+    with st.expander("🔍 Why this score? (per-feature contributions)"):
+        try:
+            explanation = explain_prediction(X, bundle=bundle)
+            st.caption("Change in predicted probability contributed by each feature, "
+                       "relative to each model's baseline, averaged over the ensemble.")
+            st.bar_chart(explanation["table"].set_index("feature")["contribution"])
+            st.dataframe(explanation["table"])
+            st.write({name: m["method"] for name, m in explanation["members"].items()})
+        except Exception as e:
+            st.info(f"Explanation unavailable: {e}")
+
+    with st.expander("⏱ Per-model timings"):
+        st.write({k: (f"{v * 1000:.2f} ms" if k not in ("skipped_rows", "batch_rows") else v)
+                  for k, v in timings.items()})
+        stacker = bundle.get("stacker")
+        st.caption("Ensemble weights: " + ("learned (src/stacking.py)" if stacker else "equal mean"))
+        st.write({n: round(w, 3) for n, w in ensemble_weights(bundle).items()})
+        if stacker and stacker.get("pruned"):
+            st.caption(f"Pruned members (not run): {', '.join(stacker['pruned'])}")
+
     st.write("---")
     st.write("✔ Model loaded using sklearn 1.3.0 (compatible)")
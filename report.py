@@ -1,56 +1,157 @@
 # report.py
+"""
+PDF screening reports.
+
+    build_report_bytes(inference, bundle)       one report, returns PDF bytes
+    build_reports(inferences, out_dir, ...)     many reports over a process pool
+
+    python report.py data/training_data.csv --out reports --workers 4 --limit 2000
+
+The risk bar, feature table, contribution chart and waveform are drawn
+with reportlab vector primitives (no matplotlib figure / PNG round trip
+per report). A precomputed SHAP image stored in the bundle is decoded
+once per process and reused.
+"""
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from io import BytesIO
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import datetime
+import hashlib
+import os
+import re
+import time
+from src.model import get_bundle
 
-def _plot_risk_bar(proba):
-    fig, ax = plt.subplots(figsize=(6,0.8))
-    ax.barh([0],[proba], color="#ef553b")
-    ax.barh([0],[1-proba], left=[proba], color="#e6e6e6")
-    ax.set_xlim(0,1)
-    ax.axis('off')
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return buf.read()
+RISK_COLOR = (0.937, 0.333, 0.231)      # "#ef553b"
+TRACK_COLOR = (0.902, 0.902, 0.902)     # "#e6e6e6"
+NEG_COLOR = (0.388, 0.431, 0.980)       # "#636efa"
+GRID_COLOR = (0.75, 0.75, 0.75)
+WAVE_COLUMNS = 500                      # min/max envelope points drawn for audio
 
-def _feat_table_image(features, top_n=20):
-    df = pd.DataFrame(list(features.items()), columns=["feature","value"])
-    df = df.sort_values("feature").head(top_n)
-    fig, ax = plt.subplots(figsize=(6, len(df)*0.25 + 0.5))
-    ax.axis('off')
-    table = ax.table(cellText=df.values, colLabels=df.columns, loc='center')
-    table.auto_set_font_size(False)
-    table.set_fontsize(8)
-    table.scale(1,1.2)
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-    return buf.read()
+_IMAGES = {}    # id(bundle) -> (bundle, ImageReader of bundle["last_shap_png"])
+
+
+# ---------------------------------------------------
+# NATIVE DRAWING HELPERS
+# ---------------------------------------------------
 
-def _waveform_image(audio_bytes):
+def _draw_risk_bar(c, proba, x, y, width, height):
+    proba = min(max(proba, 0.0), 1.0)
+    c.setFillColorRGB(*TRACK_COLOR)
+    c.rect(x, y, width, height, stroke=0, fill=1)
+    c.setFillColorRGB(*RISK_COLOR)
+    c.rect(x, y, width * proba, height, stroke=0, fill=1)
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont("Helvetica", 9)
+    c.drawString(x + width + 8, y + height / 2 - 3, f"{proba:.2f}")
+
+def _fmt(v):
+    if isinstance(v, (float, np.floating)):
+        return f"{v:.4g}"
+    s = str(v)
+    return s if len(s) <= 40 else s[:37] + "..."
+
+def _draw_feature_table(c, features, x, top, width, top_n=20, row_h=10.5):
+    rows = sorted((k, v) for k, v in features.items()
+                  if not isinstance(v, (bytes, bytearray)))[:top_n]
+    col = x + width * 0.55
+    c.setFont("Helvetica-Bold", 8)
+    c.drawString(x + 4, top - row_h + 3, "feature")
+    c.drawString(col + 4, top - row_h + 3, "value")
+    c.setFont("Helvetica", 8)
+    for i, (k, v) in enumerate(rows, start=1):
+        c.drawString(x + 4, top - (i + 1) * row_h + 3, str(k)[:48])
+        c.drawString(col + 4, top - (i + 1) * row_h + 3, _fmt(v))
+    bottom = top - (len(rows) + 1) * row_h
+    c.setStrokeColorRGB(*GRID_COLOR)
+    c.setLineWidth(0.4)
+    for i in range(len(rows) + 2):
+        c.line(x, top - i * row_h, x + width, top - i * row_h)
+    for xx in (x, col, x + width):
+        c.line(xx, top, xx, bottom)
+    c.setStrokeColorRGB(0, 0, 0)
+
+def _draw_contributions(c, table, x, top, width, top_n=10, row_h=16):
+    df = table.head(top_n)
+    if not len(df):
+        return
+    label_w = width * 0.3
+    axis = x + label_w + (width - label_w) / 2
+    half = (width - label_w) / 2 - 30
+    scale = half / max(float(df["contribution"].abs().max()), 1e-12)
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(x, top, "Feature contributions to this estimate")
+    c.setFont("Helvetica", 8)
+    for i, (feat, v) in enumerate(zip(df["feature"], df["contribution"]), start=1):
+        y = top - i * row_h
+        c.setFillColorRGB(0, 0, 0)
+        c.drawString(x, y + 3, str(feat)[:30])
+        c.setFillColorRGB(*(RISK_COLOR if v > 0 else NEG_COLOR))
+        c.rect(min(axis, axis + v * scale), y, abs(v) * scale, row_h - 5, stroke=0, fill=1)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawString(axis + v * scale + (4 if v >= 0 else -30), y + 3, f"{v:+.3f}")
+    c.setStrokeColorRGB(0.5, 0.5, 0.5)
+    c.line(axis, top - 4, axis, top - (len(df) + 1) * row_h + row_h - 2)
+    c.setStrokeColorRGB(0, 0, 0)
+
+def _draw_waveform(c, audio_bytes, x, y, width, height):
     try:
         import librosa, io
-        y, sr = librosa.load(io.BytesIO(audio_bytes), sr=16000)
-        fig, ax = plt.subplots(figsize=(6,1.5))
-        ax.plot(np.linspace(0, len(y)/sr, len(y)), y, linewidth=0.4)
-        ax.axis('off')
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        plt.close(fig)
-        buf.seek(0)
-        return buf.read()
+        sig, sr = librosa.load(io.BytesIO(audio_bytes), sr=16000)
+    except Exception:
+        return
+    if not len(sig):
+        return
+    cols = min(WAVE_COLUMNS, len(sig))
+    seg = np.array_split(sig, cols)
+    lo = np.array([s.min() for s in seg])
+    hi = np.array([s.max() for s in seg])
+    peak = max(float(np.abs(sig).max()), 1e-9)
+    mid, amp = y + height / 2, height / 2 / peak
+    xs = x + np.arange(cols) * (width / cols)
+    p = c.beginPath()
+    for xx, a, b in zip(xs, lo, hi):
+        p.moveTo(xx, mid + a * amp)
+        p.lineTo(xx, mid + b * amp)
+    c.setLineWidth(0.4)
+    c.drawPath(p, stroke=1, fill=0)
+
+def _bundle_image(bundle):
+    """ImageReader for bundle["last_shap_png"], decoded once per bundle."""
+    cached = _IMAGES.get(id(bundle))
+    if cached is None or cached[0] is not bundle:
+        cached = (bundle, ImageReader(BytesIO(bundle["last_shap_png"])))
+        _IMAGES[id(bundle)] = cached
+    return cached[1]
+
+def _explanation(inference, bundle):
+    """Per-prediction explanation from inference["explanation"], or computed from its features."""
+    if inference.get("explanation") is not None:
+        return inference["explanation"]
+    feats = inference.get("features", {})
+    if not bundle or not feats:
+        return None
+    try:
+        from src.explainability import explain_prediction
+        from src.model import feature_columns
+        cols = feature_columns(bundle)
+        if not all(c in feats for c in cols):
+            return None
+        return explain_prediction(pd.DataFrame([{c: feats[c] for c in cols}]), bundle=bundle)
     except Exception:
         return None
 
+
+# ---------------------------------------------------
+# SINGLE REPORT
+# ---------------------------------------------------
+
 def build_report_bytes(inference, bundle=None, title="NeuroMindX Report"):
+    if isinstance(bundle, (str, bytes, os.PathLike)):
+        bundle = get_bundle(bundle)
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     w, h = A4
@@ -62,8 +163,7 @@ def build_report_bytes(inference, bundle=None, title="NeuroMindX Report"):
     c.setFont("Helvetica", 9)
     c.drawString(40, h-68, f"Generated: {ts}")
     proba = float(inference.get("proba", 0.0))
-    bar = _plot_risk_bar(proba)
-    c.drawImage(ImageReader(BytesIO(bar)), 40, h-140, width=400, height=60)
+    _draw_risk_bar(c, proba, 40, h-115, 400, 22)
     # summary
     c.setFont("Helvetica", 10)
     if proba>0.7:
@@ -76,22 +176,124 @@ def build_report_bytes(inference, bundle=None, title="NeuroMindX Report"):
     text.setFont("Helvetica", 10)
     text.textLines(["Summary:", summary, "Note: This is an experimental screening aid."])
     c.drawText(text)
-    # SHAP if in bundle
+    # SHAP if in bundle, else this prediction's feature contributions
     if bundle and bundle.get("last_shap_png"):
         try:
-            c.drawImage(ImageReader(BytesIO(bundle["last_shap_png"])), 40, h-420, width=500, height=200)
+            c.drawImage(_bundle_image(bundle), 40, h-420, width=500, height=200)
         except Exception:
             pass
+    else:
+        explanation = _explanation(inference, bundle)
+        if explanation is not None:
+            _draw_contributions(c, explanation["table"], 40, h-230, 500)
     # features table
-    feat_png = _feat_table_image(inference.get("features", {}), top_n=18)
-    c.drawImage(ImageReader(BytesIO(feat_png)), 40, h-720, width=500, height=200)
+    _draw_feature_table(c, inference.get("features", {}), 40, h-440, 500, top_n=18)
     # waveform if audio present
     audio_bytes = inference.get("audio_bytes", None) or inference.get("features", {}).get("audio_bytes")
     if audio_bytes:
-        wave = _waveform_image(audio_bytes)
-        if wave:
-            c.drawImage(ImageReader(BytesIO(wave)), 40, h-920, width=500, height=100)
+        _draw_waveform(c, audio_bytes, 40, 40, 500, 80)
     c.showPage()
     c.save()
     buf.seek(0)
     return buf.read()
+
+
+# ---------------------------------------------------
+# BATCH REPORTS (process pool)
+# ---------------------------------------------------
+
+_WORKER = {}    # per-process: bundle, out_dir, title
+
+
+def _init_worker(bundle_path, out_dir, title):
+    _WORKER["bundle"] = get_bundle(bundle_path) if bundle_path else None
+    _WORKER["out_dir"] = out_dir
+    _WORKER["title"] = title
+
+
+def _report_names(inferences):
+    """
+    File stems for a batch of reports: each inference id reduced to a safe
+    basename (its position if it has none). A stem that sanitising changed,
+    or that repeats within the batch (compared case-insensitively), gets a
+    short hash of the raw id appended, then the position if it still clashes.
+    """
+    names, seen = [], set()
+    for i, inference in enumerate(inferences):
+        raw = inference.get("id")
+        raw = "" if raw is None else str(raw)
+        name = re.sub(r"[^\w.-]", "_", raw).lstrip(".") or f"report_{i:06d}"
+        if (raw and name != raw) or name.casefold() in seen:
+            name = f"{name}-{hashlib.sha1(raw.encode()).hexdigest()[:8]}"
+        while name.casefold() in seen:
+            name = f"{name}-{i}"
+        seen.add(name.casefold())
+        names.append(name)
+    return names
+
+
+def _write_report(job):
+    inference, name = job
+    path = os.path.join(_WORKER["out_dir"], f"{name}.pdf")
+    pdf = build_report_bytes(inference, bundle=_WORKER["bundle"], title=_WORKER["title"])
+    with open(path, "wb") as f:
+        f.write(pdf)
+    return path
+
+
+def build_reports(inferences, out_dir, bundle_path=None, workers=None, chunksize=None,
+                  title="NeuroMindX Report", verbose=True):
+    """
+    Writes one PDF per inference dict into `out_dir` (named by inference["id"]
+    or its position, made safe and unique by _report_names) using `workers`
+    processes (default CPU count). Each process loads the bundle once.
+    Returns the list of written paths, in input order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    inferences = list(inferences)
+    jobs = list(zip(inferences, _report_names(inferences)))
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    t0 = time.perf_counter()
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(bundle_path, out_dir, title)) as pool:
+            paths = list(pool.map(_write_report, jobs,
+                                  chunksize=chunksize or max(1, len(jobs) // (8 * workers))))
+    else:
+        _init_worker(bundle_path, out_dir, title)
+        paths = [_write_report(j) for j in jobs]
+    if verbose:
+        dt = time.perf_counter() - t0
+        print(f"[report] {len(paths)} pages in {dt:.2f}s - "
+              f"{len(paths) / max(dt, 1e-9):.1f} pages/sec ({workers} workers)")
+    return paths
+
+
+def main(argv=None):
+    import argparse
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+    from src.model import DEFAULT_BUNDLE, feature_columns, predict_ensemble
+
+    ap = argparse.ArgumentParser(description="Score a CSV of texts and write one PDF report per row.")
+    ap.add_argument("csv")
+    ap.add_argument("--text-col", default="text")
+    ap.add_argument("--out", default="reports")
+    ap.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--limit", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    texts = pd.read_csv(args.csv, nrows=args.limit)[args.text_col].astype(str).tolist()
+    bundle = get_bundle(args.bundle)
+    feats = pd.DataFrame(extract_features_batch(texts), columns=FEATURE_COLUMNS)
+    X = feats.reindex(columns=feature_columns(bundle))
+    scores = predict_ensemble(X, bundle=bundle)
+    ts = datetime.datetime.now()
+    inferences = [{"proba": float(p), "features": f, "ts": ts}
+                  for p, f in zip(scores, feats.to_dict(orient="records"))]
+    build_reports(inferences, args.out, bundle_path=args.bundle, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
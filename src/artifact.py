@@ -0,0 +1,339 @@
+# src/artifact.py
+"""
+Versioned, pickle-free model artifacts.
+
+    models/final_model/
+        manifest.json   format version, library versions, and the bundle's
+                        object graph (estimator classes + their attributes)
+        arrays.bin      every NumPy array, 64-byte aligned, read back through
+                        one read-only np.memmap (pages are shared between
+                        processes that load the same artifact)
+        lgbm.txt        LightGBM boosters in their own text format
+
+Only the exact classes in ALLOWED_CLASSES are rebuilt, and they are
+rebuilt from plain attributes (cls.__new__ + __dict__), so loading never
+runs pickle code or calls anything named by the manifest. The one
+exception is sklearn's Cython Tree (REDUCED_CLASSES), which is constructed
+from its (n_features, n_classes, n_outputs) arguments and copies its node
+tables in; everything else (coefficients, MLP weights, classes, ...)
+stays mapped.
+"""
+import collections
+import datetime
+import importlib
+import json
+import os
+import platform
+import shutil
+import numpy as np
+
+FORMAT = "neuromindx-model"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+ARRAYS = "arrays.bin"
+ALIGN = 64
+# every class a bundle member is made of; anything else is refused on save and load
+ALLOWED_CLASSES = frozenset({
+    "sklearn.linear_model._logistic.LogisticRegression",
+    "sklearn.ensemble._forest.RandomForestClassifier",
+    "sklearn.tree._classes.DecisionTreeClassifier",
+    "sklearn.tree._tree.Tree",
+    "sklearn.neural_network._multilayer_perceptron.MLPClassifier",
+    "sklearn.neural_network._stochastic_optimizers.AdamOptimizer",
+    "sklearn.neural_network._stochastic_optimizers.SGDOptimizer",
+    "sklearn.preprocessing._label.LabelBinarizer",
+    "sklearn.preprocessing._label.LabelEncoder",
+    "sklearn.feature_extraction.text.TfidfVectorizer",
+    "sklearn.feature_extraction.text.TfidfTransformer",
+    "sklearn.feature_extraction.text.HashingVectorizer",
+    "sklearn.feature_extraction.text.CountVectorizer",
+    "lightgbm.sklearn.LGBMClassifier",
+})
+# Cython types without __dict__, rebuilt as cls(*args) + __setstate__
+REDUCED_CLASSES = frozenset({"sklearn.tree._tree.Tree"})
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def library_versions():
+    versions = {"python": platform.python_version(), "numpy": np.__version__}
+    for mod in ("sklearn", "lightgbm", "scipy"):
+        try:
+            versions[mod] = importlib.import_module(mod).__version__
+        except Exception:
+            versions[mod] = None
+    return versions
+
+
+def _qualname(obj_or_cls):
+    cls = obj_or_cls if isinstance(obj_or_cls, type) else type(obj_or_cls)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def _allowed_class(name, allowed=ALLOWED_CLASSES):
+    """The class `name` names, if it is one of `allowed` (exact qualified names)."""
+    if not isinstance(name, str) or name not in allowed:
+        raise TypeError(f"refusing to load {name!r}: not an allowed model class")
+    module, _, attr = name.rpartition(".")
+    cls = getattr(importlib.import_module(module), attr, None)
+    if not isinstance(cls, type) or _qualname(cls) != name:
+        raise TypeError(f"refusing to load {name!r}: not a class")
+    return cls
+
+
+def _numpy_type(name):
+    """numpy scalar types stored as values (e.g. a vectorizer's dtype=np.float64)."""
+    cls = getattr(np, name.rpartition(".")[2], None) if isinstance(name, str) else None
+    if not (isinstance(cls, type) and issubclass(cls, np.generic)):
+        raise TypeError(f"refusing to load {name!r}: not a numpy scalar type")
+    return cls
+
+
+# ---------------------------------------------------
+# ENCODER
+# ---------------------------------------------------
+
+class _Writer:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.blob = open(os.path.join(directory, ARRAYS), "wb")
+        self.offset = 0
+        self.boosters = []
+        self._seen = {}     # id -> (array, entry): shared arrays are written once
+
+    def array(self, a):
+        seen = self._seen.get(id(a))
+        if seen is not None and seen[0] is a:
+            return seen[1]
+        src, a = a, np.ascontiguousarray(a)
+        pad = -self.offset % ALIGN
+        self.blob.write(b"\0" * pad)
+        self.offset += pad
+        entry = {"__array__": self.offset, "dtype": np.lib.format.dtype_to_descr(a.dtype),
+                 "shape": list(a.shape)}
+        self.blob.write(a.tobytes())
+        self.offset += a.nbytes
+        self._seen[id(src)] = (src, entry)
+        return entry
+
+    def encode(self, v):
+        if v is None or isinstance(v, (bool, int, float, str)):
+            return v
+        if isinstance(v, np.generic):
+            return {"__scalar__": v.item(), "dtype": v.dtype.str}
+        if isinstance(v, np.ndarray):
+            if v.dtype.hasobject:
+                return {"__objarray__": [self.encode(x) for x in v.ravel().tolist()],
+                        "shape": list(v.shape)}
+            return self.array(v)
+        if isinstance(v, tuple):
+            return {"__tuple__": [self.encode(x) for x in v]}
+        if isinstance(v, list):
+            return [self.encode(x) for x in v]
+        if isinstance(v, (set, frozenset)):
+            return {"__set__": [self.encode(x) for x in sorted(v, key=repr)]}
+        if isinstance(v, dict):
+            kind = "dict"
+            if isinstance(v, collections.defaultdict):
+                factory = v.default_factory
+                kind = "defaultdict:" + (factory.__name__ if factory else "")
+            elif isinstance(v, collections.OrderedDict):
+                kind = "OrderedDict"
+            return {"__dict__": kind,
+                    "items": [[self.encode(k), self.encode(x)] for k, x in v.items()]}
+        if isinstance(v, np.random.RandomState):
+            return {"__random_state__": self.encode(v.get_state())}
+        if isinstance(v, type) and (_qualname(v) in ALLOWED_CLASSES
+                                    or issubclass(v, np.generic)):
+            return {"__class__": _qualname(v)}
+        if isinstance(v, np.dtype):
+            return {"__dtype__": np.lib.format.dtype_to_descr(v)}
+
+        name = _qualname(v)
+        if name == "lightgbm.basic.Booster":
+            self.boosters.append(v.model_to_string(num_iteration=-1))
+            return {"__booster__": len(self.boosters) - 1}
+        if hasattr(v, "tocsr") and hasattr(v, "format"):     # scipy.sparse
+            m = v.tocsr()
+            return {"__sparse__": v.format, "shape": list(m.shape), "data": self.array(m.data),
+                    "indices": self.array(m.indices), "indptr": self.array(m.indptr)}
+        if name not in ALLOWED_CLASSES:
+            raise TypeError(f"cannot store {name} in a model artifact (not in ALLOWED_CLASSES)")
+        if hasattr(v, "__dict__"):
+            return {"__object__": name, "state": self.encode(vars(v))}
+        if name not in REDUCED_CLASSES:
+            raise TypeError(f"cannot store {name} in a model artifact (no __dict__)")
+        cls, args, state = v.__reduce__()[:3]
+        return {"__reduced__": _qualname(cls), "args": self.encode(args), "state": self.encode(state)}
+
+    def close(self):
+        self.blob.close()
+        if self.boosters:
+            with open(os.path.join(self.directory, "lgbm.txt"), "w") as f:
+                json.dump(self.boosters, f)
+
+
+def save_bundle(bundle, path, extra=None):
+    """
+    Writes `bundle` (dict of estimators and plain values) as an artifact
+    directory at `path`, replacing any previous one atomically.
+    """
+    path = os.path.normpath(path)
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    writer = _Writer(tmp)
+    try:
+        graph = writer.encode(bundle)
+    finally:
+        writer.close()
+    manifest = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "created_utc": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "libraries": library_versions(),
+        "members": {k: _qualname(v) for k, v in bundle.items()
+                    if not isinstance(v, (str, int, float, list, tuple, dict, type(None)))},
+        "arrays_bytes": writer.offset,
+        "boosters": len(writer.boosters),
+        "extra": extra or {},
+        "bundle": graph,
+    }
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+# ---------------------------------------------------
+# DECODER
+# ---------------------------------------------------
+
+class _Reader:
+
+    def __init__(self, directory, manifest, mmap):
+        size = manifest.get("arrays_bytes", 0)
+        arrays_path = os.path.join(directory, ARRAYS)
+        if size == 0:
+            self.blob = np.zeros(0, np.uint8)
+        elif mmap:
+            self.blob = np.memmap(arrays_path, dtype=np.uint8, mode="r", shape=(size,))
+        else:
+            self.blob = np.fromfile(arrays_path, dtype=np.uint8, count=size)
+        self.boosters = []
+        if manifest.get("boosters"):
+            with open(os.path.join(directory, "lgbm.txt")) as f:
+                self.boosters = json.load(f)
+
+    def array(self, e):
+        dtype = np.lib.format.descr_to_dtype(_as_descr(e["dtype"]))
+        shape = tuple(e["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        return np.ndarray(shape, dtype=dtype, buffer=self.blob, offset=e["__array__"]) \
+            if count else np.zeros(shape, dtype)
+
+    def decode(self, v):
+        if isinstance(v, list):
+            return [self.decode(x) for x in v]
+        if not isinstance(v, dict):
+            return v
+        if "__array__" in v:
+            return self.array(v)
+        if "__scalar__" in v:
+            return np.dtype(v["dtype"]).type(v["__scalar__"])
+        if "__objarray__" in v:
+            out = np.empty(len(v["__objarray__"]), dtype=object)
+            out[:] = [self.decode(x) for x in v["__objarray__"]]
+            return out.reshape(v["shape"])
+        if "__tuple__" in v:
+            return tuple(self.decode(x) for x in v["__tuple__"])
+        if "__set__" in v:
+            return {self.decode(x) for x in v["__set__"]}
+        if "__dict__" in v:
+            items = [(_hashable(self.decode(k)), self.decode(x)) for k, x in v["items"]]
+            kind = v["__dict__"]
+            if kind == "OrderedDict":
+                return collections.OrderedDict(items)
+            if kind.startswith("defaultdict:"):
+                factory = {"": None, "dict": dict, "list": list,
+                           "OrderedDict": collections.OrderedDict}[kind.split(":", 1)[1]]
+                return collections.defaultdict(factory, items)
+            return dict(items)
+        if "__random_state__" in v:
+            rs = np.random.RandomState()
+            rs.set_state(self.decode(v["__random_state__"]))
+            return rs
+        if "__class__" in v:
+            name = v["__class__"]
+            if isinstance(name, str) and name.startswith("numpy."):
+                return _numpy_type(name)
+            return _allowed_class(name)
+        if "__dtype__" in v:
+            return np.lib.format.descr_to_dtype(_as_descr(v["__dtype__"]))
+        if "__booster__" in v:
+            import lightgbm as lgb
+            return lgb.Booster(model_str=self.boosters[v["__booster__"]])
+        if "__sparse__" in v:
+            import scipy.sparse as sp
+            m = sp.csr_matrix((self.array(v["data"]), self.array(v["indices"]),
+                               self.array(v["indptr"])), shape=tuple(v["shape"]))
+            return m.asformat(v["__sparse__"])
+        if "__object__" in v:
+            cls = _allowed_class(v["__object__"])
+            obj = cls.__new__(cls)
+            obj.__dict__.update(self.decode(v["state"]))
+            return obj
+        if "__reduced__" in v:
+            cls = _allowed_class(v["__reduced__"], REDUCED_CLASSES)
+            args = self.decode(v["args"])
+            if not isinstance(args, tuple) or len(args) != 3:
+                raise TypeError(f"refusing to load {v['__reduced__']}: unexpected arguments")
+            obj = cls(*args)
+            obj.__setstate__(self.decode(v["state"]))
+            return obj
+        raise ValueError(f"unknown artifact entry: {sorted(v)[:3]}")
+
+
+def _as_descr(d):
+    """Undoes JSON's tuple -> list conversion in structured dtype descriptions."""
+    if isinstance(d, str):
+        return d
+    fields = []
+    for name, dt, *shape in d:
+        fields.append((name, _as_descr(dt), tuple(shape[0])) if shape else (name, _as_descr(dt)))
+    return fields
+
+
+def _hashable(k):
+    return tuple(k) if isinstance(k, list) else k
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def load_artifact(path, mmap=True):
+    """
+    Loads an artifact directory written by save_bundle. Arrays are views
+    into a read-only memory map unless mmap=False. Warns when the artifact
+    was written with different sklearn / lightgbm versions.
+    """
+    manifest = read_manifest(path)
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported artifact {manifest.get('format')} "
+                         f"v{manifest.get('version')}")
+    saved, current = manifest.get("libraries", {}), library_versions()
+    for lib in ("sklearn", "lightgbm"):
+        if saved.get(lib) and current.get(lib) and saved[lib] != current[lib]:
+            print(f"[WARN] {path} was saved with {lib} {saved[lib]}, running {current[lib]}")
+    return _Reader(path, manifest, mmap).decode(manifest["bundle"])
@@ -4,26 +4,15 @@ import pandas as pd
 import time
 import uuid
 from datetime import datetime
-
-DATA_FILE = "data/user_assessments.csv"
+from src.storage import append_record
+from src.scoring import (CLOCK_HOURS, CLOCK_MINUTES, MDQ_MIN_SYMPTOMS, RECALL_WORDS,
+                         risk_label, score_record, summary_column, summary_items,
+                         summary_string, urgent_messages)
 
 # ---------- Utilities ----------
 def save_result(record: dict):
-    """Append result to CSV (creates file with header if missing)."""
-    df = pd.DataFrame([record])
-    try:
-        existing = pd.read_csv(DATA_FILE)
-        df = pd.concat([existing, df], ignore_index=True)
-    except FileNotFoundError:
-        pass
-    df.to_csv(DATA_FILE, index=False)
-
-def risk_label(score, thresholds):
-    """Map numeric score to label with thresholds sorted ascending list of (threshold,label)."""
-    for th, label in thresholds:
-        if score <= th:
-            return label
-    return thresholds[-1][1]
+    """Append result to the assessment store (O(1), safe across sessions)."""
+    append_record(record)
 
 # ---------- Screening instruments ----------
 def phq9():
@@ -92,7 +81,7 @@ def mdq():
         responses.append(int(val))
     impairment = st.selectbox("Did these symptoms occur during the same time period and cause moderate/severe problems?", ["No", "Yes"], key="mdq_impair")
     total_symptoms = sum(responses)
-    positive = (total_symptoms >= 7 and impairment == "Yes") or (total_symptoms >= 5 and impairment == "Yes")
+    positive = total_symptoms >= MDQ_MIN_SYMPTOMS and impairment == "Yes"
     st.write(f"Symptoms checked: {total_symptoms}. MDQ positive screen: {'Yes' if positive else 'No'}")
     return total_symptoms, positive
 
@@ -118,7 +107,7 @@ def pqb():
 def memory_recall():
     """Simple immediate recall: show 5 words briefly then ask to recall."""
     st.subheader("Memory — Immediate recall")
-    words = ["apple","penny","river","window","tiger"]
+    words = RECALL_WORDS
     st.write("You will see a list of 5 simple words for 6 seconds. Try to remember as many as you can.")
     if st.button("Show words (6s)", key="show_words"):
         st.write(" • ".join(words))
@@ -163,9 +152,9 @@ def clock_drawing():
     minute = st.number_input("Minute hand minutes (0-59)", min_value=0, max_value=59, value=10, key="clock_min")
     # scoring heuristic: hour around 11 and minute around 10 -> correct
     score = 0
-    if hour in (10,11,12):
+    if hour in CLOCK_HOURS:
         score += 1
-    if minute in (9,10,11):
+    if minute in CLOCK_MINUTES:
         score += 1
     st.write(f"Clock task score (0-2): {score}")
     return score
@@ -220,56 +209,25 @@ def run_assessment():
     clock_score = clock_drawing()
     taps = motor_tapping()
 
-    # 3. Scoring heuristics & mapping (simple rule-based)
-    # Depression risk (PHQ-9): minimal(0-4), mild(5-9), mod(10-14), mod-severe(15-19), severe(20+)
-    dep_label = risk_label(phq_total, [(4,"Minimal"),(9,"Mild"),(14,"Moderate"),(19,"Moderately severe"),(27,"Severe")])
-    anx_label = risk_label(gad_total, [(4,"Minimal"),(9,"Mild"),(14,"Moderate"),(21,"Severe")])
-    psychosis_risk = "Low"
-    if pqb_total >= 2:
-        psychosis_risk = "Elevated"
-    bipolar_flag = "Positive" if mdq_positive else "Negative"
-
-    # Cognitive quick risk: combine sub-scores
-    cog_total = mem_score + (1 if vf_score < 10 else 2) + clock_score  # small heuristic
-    if cog_total <= 2:
-        cog_label = "Possible Cognitive Concern"
-    elif cog_total <= 4:
-        cog_label = "Mild Concerns"
-    else:
-        cog_label = "No major cognitive concerns noted"
-
-    # Motor: tapping speed heuristic (taps in 10 sec): normative values vary; low taps -> flag
-    motor_label = "Normal"
-    if taps < 15:
-        motor_label = "Bradykinesia-like (low taps) — consider evaluation for parkinsonism"
+    # 3. Scoring rules (src/scoring.py; the same engine re-scores stored records in bulk)
+    result = score_record({
+        "phq9": phq_total, "phq9_item9": phq9_item, "gad7": gad_total,
+        "mdq_symptoms": mdq_total, "mdq_positive": mdq_positive, "pqb": pqb_total,
+        "mem_score": mem_score, "vf_score": vf_score, "clock_score": clock_score, "taps": taps,
+    })
 
     # 4. Urgent flags
-    urgent_messages = []
-    if phq9_item >= 1:
-        urgent_messages.append("PHQ-9 item 9 flagged — suicidal ideation. If you have active plan or intent, seek immediate help / emergency services.")
-    if pqb_total >= 3:
-        urgent_messages.append("Several prodromal psychosis features reported — consider urgent psychiatric evaluation.")
-    if urgent_messages:
+    urgent = urgent_messages(result)
+    if urgent:
         st.error("⚠️ Urgent flags:")
-        for m in urgent_messages:
+        for m in urgent:
             st.write(f"- {m}")
         # add immediate resources
         st.markdown("**If you are in immediate danger or feel you might harm yourself, contact local emergency services now.**")
 
     # 5. Overall summary (rule-based)
-    summary = []
-    if dep_label in ("Moderate","Moderately severe","Severe"):
-        summary.append(("Depression", dep_label))
-    if anx_label in ("Moderate","Severe"):
-        summary.append(("Anxiety", anx_label))
-    if bipolar_flag == "Positive":
-        summary.append(("Bipolar disorder (screen)", "Possible — MDQ positive"))
-    if psychosis_risk == "Elevated":
-        summary.append(("Psychosis risk / Prodrome", "Elevated"))
-    if cog_label != "No major cognitive concerns noted":
-        summary.append(("Cognitive impairment", cog_label))
-    if motor_label != "Normal":
-        summary.append(("Motor/parkinsonism", motor_label))
+    summary = summary_items(result["dep_label"], result["anx_label"], result["bipolar_flag"],
+                            result["psychosis_risk"], result["cog_label"], result["motor_label"])
 
     # Show user-friendly output
     st.markdown("---")
@@ -308,7 +266,9 @@ def run_assessment():
             "vf_score": vf_score,
             "clock_score": clock_score,
             "taps": taps,
-            "summary": ";".join([f"{c}:{n}" for c,n in summary]) or "No major signals"
+            "summary": summary_string(summary),
+            # versioned copy; src/rescore.py fills it in for older rows
+            summary_column(): result["summary"],
         }
         save_result(rec)
         st.success("✅ Assessment saved.")
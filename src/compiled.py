@@ -0,0 +1,503 @@
+# src/compiled.py
+"""
+NumPy-only compiled form of the ensemble bundle.
+
+    python -m src.compiled models/final_model models/final_model.npz
+
+compile_bundle() flattens the four members into plain arrays:
+
+- logistic: coefficient vector, fused into the MLP's first weight matrix
+            as one extra output column
+- mlp:      weight matrices + biases
+- rf, lgbm: every tree of both models in one node table, laid out so that
+            a node's right child is always left + 1, over a table of the
+            distinct splits; each split is evaluated once per row and all
+            trees are walked together, one step per tree level
+
+Members are combined with the bundle's ensemble weights (learned by
+src/stacking.py, or an equal mean); members the stacker pruned are not
+compiled. CompiledEnsemble.predict(X) reproduces predict_ensemble(X)
+(sequential mode) without sklearn / lightgbm, input validation or
+DataFrame handling.
+The artifact is a single .npz holding those arrays plus a JSON header, and
+loads with allow_pickle=False.
+"""
+import json
+import math
+import sys
+from collections import OrderedDict
+import numpy as np
+
+from src.model import DEFAULT_BUNDLE, MEMBERS, REGISTRY_SIZE, ensemble_weights
+
+COMPILED_BUNDLE = "models/final_model.npz"
+FORMAT_VERSION = 2         # 2: per-member "weights" in the header
+
+# per-node handling of missing values (LightGBM's missing_type)
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_ZERO_THRESHOLD = 1e-35     # LightGBM's kZeroThreshold
+
+# rows * nodes up to which every node's child pointer is resolved up front
+# (single rows / tiny batches); larger batches walk the trees level by
+# level in blocks small enough to stay in cache
+DECISION_BUDGET = 1 << 16
+BLOCK_ROWS = 256
+
+_ACTIVATIONS = {
+    "identity": lambda h: h,
+    "relu": lambda h: np.maximum(h, 0, out=h),
+    "tanh": np.tanh,
+    "logistic": lambda h: _sigmoid(h),
+}
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# ---------------------------------------------------
+# TREE TABLE
+# ---------------------------------------------------
+
+class _TreeTable:
+    """
+    Accumulates trees into flat node arrays (right child = left child + 1).
+    Identical splits (feature, threshold, missing handling) are stored once;
+    each node points at its split, and split 0 (never taken) serves leaves.
+    """
+
+    def __init__(self):
+        self.split_of = {(0, np.inf, MISSING_NONE, True): 0}
+        self.node_split, self.left, self.value = [], [], []
+        self.roots, self.depth = [], 0
+
+    def _split(self, key):
+        return self.split_of.setdefault(key, len(self.split_of))
+
+    def add(self, left, right, feature, threshold, value, missing=None, default_left=None):
+        """
+        Adds one tree given in parent/child form (node 0 = root, left[i] == -1
+        for leaves); x[feature] <= threshold goes left.
+        """
+        n = len(left)
+        missing = np.zeros(n, np.int8) if missing is None else missing
+        default_left = np.ones(n, bool) if default_left is None else default_left
+        base = len(self.left)
+        order, new_id = [0], {0: 0}
+        depth = {0: 0}
+        i = 0
+        while i < len(order):      # breadth first, children numbered in pairs
+            node = order[i]
+            if left[node] != -1:
+                for child in (left[node], right[node]):
+                    new_id[child] = len(order)
+                    depth[child] = depth[node] + 1
+                    order.append(child)
+            i += 1
+        for node in order:
+            if left[node] == -1:
+                self.node_split.append(0)
+                self.left.append(base + new_id[node])
+                self.value.append(float(value[node]))
+            else:
+                self.node_split.append(self._split((int(feature[node]), float(threshold[node]),
+                                                    int(missing[node]), bool(default_left[node]))))
+                self.left.append(base + new_id[left[node]])
+                self.value.append(0.0)
+        self.roots.append(base)
+        self.depth = max(self.depth, max(depth.values()))
+
+    def arrays(self):
+        splits = sorted(self.split_of, key=self.split_of.get)
+        return {
+            "split_feature": np.asarray([k[0] for k in splits], np.int32),
+            "split_threshold": np.asarray([k[1] for k in splits], np.float64),
+            "split_missing": np.asarray([k[2] for k in splits], np.int8),
+            "split_default_left": np.asarray([k[3] for k in splits], bool),
+            "node_split": np.asarray(self.node_split, np.int32),
+            "node_left": np.asarray(self.left, np.int32),
+            "node_value": np.asarray(self.value, np.float64),
+            "tree_roots": np.asarray(self.roots, np.int32),
+        }
+
+
+def _float32_cut(t):
+    """
+    sklearn trees test float32(x) <= t. Returns t' with x <= t' giving the
+    same answer for float64 x, so all members can share one float64 input.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    c = t.astype(np.float32)
+    c = np.where(c.astype(np.float64) > t, np.nextafter(c, np.float32(-np.inf)), c)
+    mid = (c.astype(np.float64) + np.nextafter(c, np.float32(np.inf)).astype(np.float64)) / 2
+    # x == mid rounds to the neighbour with an even mantissa
+    even = (c.view(np.uint32) & 1) == 0
+    return np.where(even, mid, np.nextafter(mid, -np.inf))
+
+
+def _add_sklearn_forest(table, forest):
+    """Trees of a fitted sklearn forest; leaves hold P(class 1) / n_trees."""
+    trees = [e.tree_ for e in forest.estimators_]
+    pos = list(forest.classes_).index(1) if 1 in forest.classes_ else -1
+    for t in trees:
+        value = t.value[:, 0, :]
+        value = value[:, pos] / np.maximum(value.sum(axis=1), 1e-300) / len(trees)
+        go_left = getattr(t, "missing_go_to_left", None)
+        table.add(t.children_left, t.children_right, t.feature, _float32_cut(t.threshold), value,
+                  missing=np.full(t.node_count, MISSING_NAN, np.int8),
+                  default_left=None if go_left is None else np.asarray(go_left, bool))
+
+
+def _add_lightgbm(table, booster):
+    """Trees of a binary LightGBM model; leaves hold raw scores. Returns the sigmoid scale."""
+    dump = booster.dump_model()
+    if dump.get("num_tree_per_iteration", 1) != 1 or dump.get("average_output"):
+        raise ValueError("only binary, non-averaged LightGBM models can be compiled")
+    missing_codes = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+    for info in dump["tree_info"]:
+        left, right, feature, threshold, value, missing, default_left = [], [], [], [], [], [], []
+
+        def visit(node):
+            i = len(left)
+            for arr in (left, right, feature, threshold, value, missing, default_left):
+                arr.append(None)
+            if "split_feature" not in node:
+                left[i] = right[i] = -1
+                feature[i], threshold[i], value[i] = 0, 0.0, node["leaf_value"]
+                missing[i], default_left[i] = MISSING_NONE, True
+                return i
+            if node["decision_type"] != "<=":
+                raise ValueError("categorical LightGBM splits are not supported")
+            feature[i] = node["split_feature"]
+            threshold[i], value[i] = node["threshold"], 0.0
+            missing[i] = missing_codes[node["missing_type"]]
+            default_left[i] = node["default_left"]
+            left[i] = visit(node["left_child"])
+            right[i] = visit(node["right_child"])
+            return i
+
+        visit(info["tree_structure"])
+        table.add(left, right, feature, threshold, value, missing, default_left)
+    sigmoid = 1.0
+    for token in dump["objective"].split():
+        if token.startswith("sigmoid:"):
+            sigmoid = float(token.split(":", 1)[1])
+    return sigmoid
+
+
+# ---------------------------------------------------
+# COMPILER
+# ---------------------------------------------------
+
+def compile_bundle(bundle):
+    """Compiles a loaded bundle dict ({"logistic", "rf", "mlp", "lgbm"}) into a CompiledEnsemble."""
+    members, arrays, table = [], {}, _TreeTable()
+    n_features, names = None, None
+    weights = ensemble_weights(bundle)
+    for name in MEMBERS:
+        if name not in weights:
+            continue
+        model = bundle[name]
+        d = getattr(model, "n_features_in_", None) or getattr(model, "n_features_", None)
+        if d is None and hasattr(model, "num_feature"):
+            d = model.num_feature()
+        n_features = n_features or d
+        if names is None and getattr(model, "feature_names_in_", None) is not None:
+            names = [str(c) for c in model.feature_names_in_]
+        # every member contributes its probability ("label" is only read
+        # from older artifacts, exported when unstacked lgbm used .predict)
+        output = "proba"
+        cls = type(model).__name__
+        tree_start = len(table.roots)
+
+        if cls == "LogisticRegression":
+            if len(model.classes_) != 2:
+                raise ValueError("logistic member must be binary")
+            scale = 2.0 if getattr(model, "multi_class", "auto") == "multinomial" else 1.0
+            arrays["linear_coef"] = model.coef_[0].astype(np.float64)
+            arrays["linear_intercept"] = model.intercept_[:1].astype(np.float64)
+            members.append({"name": name, "kind": "linear", "scale": scale, "output": output})
+        elif cls == "MLPClassifier":
+            if model.out_activation_ != "logistic":
+                raise ValueError("mlp member must be a binary classifier")
+            for i, (W, b) in enumerate(zip(model.coefs_, model.intercepts_)):
+                arrays[f"mlp_W{i}"] = W.astype(np.float64)
+                arrays[f"mlp_b{i}"] = b.astype(np.float64)
+            members.append({"name": name, "kind": "mlp", "activation": model.activation,
+                            "layers": len(model.coefs_), "output": output})
+        elif hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+            _add_sklearn_forest(table, model)
+            members.append({"name": name, "kind": "trees", "link": "mean", "output": output,
+                            "trees": [tree_start, len(table.roots)]})
+        elif hasattr(model, "booster_") or hasattr(model, "dump_model"):
+            booster = model.booster_ if hasattr(model, "booster_") else model
+            sigmoid = _add_lightgbm(table, booster)
+            members.append({"name": name, "kind": "trees", "link": "sigmoid", "sigmoid": sigmoid,
+                            "output": output, "trees": [tree_start, len(table.roots)]})
+        else:
+            raise ValueError(f"cannot compile member {name!r} of type {cls}")
+
+    if n_features is None:
+        raise ValueError("bundle has no compilable members")
+    arrays.update(table.arrays())
+    meta = {"version": FORMAT_VERSION, "n_features": int(n_features), "feature_names": names,
+            "members": members, "weights": [weights[m["name"]] for m in members],
+            "depth": table.depth}
+    return CompiledEnsemble(arrays, meta)
+
+
+# ---------------------------------------------------
+# FUSED PREDICTOR
+# ---------------------------------------------------
+
+class CompiledEnsemble:
+
+    def __init__(self, arrays, meta):
+        if meta.get("version") not in (1, FORMAT_VERSION):
+            raise ValueError(f"unsupported compiled format {meta.get('version')!r}")
+        self.arrays, self.meta = arrays, meta
+        self.n_features = meta["n_features"]
+        self.feature_names = meta["feature_names"]
+        self.members = meta["members"]
+        kinds = {m["kind"]: m for m in self.members}
+
+        # logistic + first MLP layer as one matmul: the last column is the logit
+        self._linear = kinds.get("linear")
+        self._mlp = kinds.get("mlp")
+        W, b = [], []
+        if self._mlp:
+            W.append(arrays["mlp_W0"])
+            b.append(arrays["mlp_b0"])
+        if self._linear:
+            W.append(arrays["linear_coef"][:, None])
+            b.append(arrays["linear_intercept"])
+        self._W_in = np.ascontiguousarray(np.hstack(W)) if W else None
+        self._b_in = np.concatenate(b) if b else None
+        self._layers = [(arrays[f"mlp_W{i}"], arrays[f"mlp_b{i}"])
+                        for i in range(1, self._mlp["layers"])] if self._mlp else []
+        self._act = _ACTIVATIONS[self._mlp["activation"]] if self._mlp else None
+
+        self._col = {m["name"]: j for j, m in enumerate(self.members)}
+        self._neg_scale = -np.array([m.get("scale", m.get("sigmoid", 1.0)) for m in self.members])
+        self._sigmoid_cols = np.array([m["kind"] != "trees" or m["link"] == "sigmoid"
+                                       for m in self.members])
+        self._label_cols = np.array([m["output"] == "label" for m in self.members])
+        self._any_label = bool(self._label_cols.any())
+        if "weights" in meta:
+            w = np.asarray(meta["weights"], dtype=np.float64)
+            self._weights = w / w.sum()
+        else:
+            # version 1: equal mean over all four slots, missing members as zeros
+            self._weights = np.full(len(self.members), 1.0 / meta["n_members"])
+
+        self._trees = [m for m in self.members if m["kind"] == "trees"]
+        if self._trees:
+            self._split_feature = arrays["split_feature"].astype(np.intp)
+            self._split_threshold = arrays["split_threshold"]
+            self._split_missing = arrays["split_missing"]
+            self._split_default_right = ~arrays["split_default_left"]
+            self._has_zero = bool((self._split_missing == MISSING_ZERO).any())
+            self._node_split = arrays["node_split"].astype(np.intp)
+            self._left = arrays["node_left"].astype(np.intp)
+            self._value = arrays["node_value"]
+            self._roots = arrays["tree_roots"].astype(np.intp)
+            self._is_leaf = self._left == np.arange(len(self._left))
+            self._tree_starts = np.asarray([m["trees"][0] for m in self._trees], np.intp)
+            self._tree_cols = [self._col[m["name"]] for m in self._trees]
+
+    def __repr__(self):
+        kinds = ", ".join(f"{m['name']}:{m['kind']}" for m in self.members)
+        return f"CompiledEnsemble({kinds}, {len(self.arrays.get('node_left', ()))} nodes)"
+
+    # ----- input -----
+
+    def _as_array(self, X):
+        if hasattr(X, "iloc"):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected a 2D array with {self.n_features} features, got {X.shape}")
+        return X
+
+    # ----- trees -----
+
+    def _split_decisions(self, X, has_nan):
+        """(rows, splits) bool: does each row go right at each distinct split."""
+        x = X.take(self._split_feature, axis=1)
+        go = x > self._split_threshold
+        if has_nan or self._has_zero:
+            missing = self._split_missing
+            isnan = np.isnan(x)
+            x0 = np.where(isnan & (missing != MISSING_NAN), 0.0, x)
+            go = x0 > self._split_threshold
+            miss = ((missing == MISSING_NAN) & isnan) | \
+                   ((missing == MISSING_ZERO) & (np.abs(x0) <= _ZERO_THRESHOLD))
+            go = np.where(miss, self._split_default_right, go)
+        return go
+
+    def _leaf_values(self, X, has_nan):
+        n = len(X)
+        depth = self.meta["depth"]
+        n_nodes = len(self._left)
+        go = self._split_decisions(X, has_nan)
+        if n * n_nodes <= DECISION_BUDGET:
+            # child pointer of every node, then chase pointers from the roots
+            if n == 1:
+                idx, nxt = self._roots, self._left + go[0].take(self._node_split)
+                for _ in range(depth):
+                    idx = nxt.take(idx)
+                return self._value.take(idx)[None, :]
+            nxt = self._left + go.take(self._node_split, axis=1)
+            offs = (np.arange(n, dtype=np.intp) * n_nodes)[:, None]
+            flat = (nxt + offs).ravel()
+            idx = self._roots + offs
+            for _ in range(depth):
+                idx = flat.take(idx)
+            return self._value.take(idx - offs)
+        # level by level over (row, tree) pairs, dropping pairs that reach a leaf
+        n_trees = len(self._roots)
+        go = go.ravel()
+        rows = np.repeat(np.arange(n, dtype=np.intp) * go.size // n, n_trees)
+        pos = np.arange(n * n_trees, dtype=np.intp)
+        idx = np.tile(self._roots, n)
+        out = np.empty(n * n_trees)
+        for _ in range(depth):
+            idx = self._left.take(idx) + go.take(self._node_split.take(idx) + rows)
+            done = self._is_leaf.take(idx)
+            if done.any():
+                out[pos[done]] = self._value.take(idx[done])
+                keep = ~done
+                idx, rows, pos = idx[keep], rows[keep], pos[keep]
+                if not len(idx):
+                    break
+        if len(idx):
+            out[pos] = self._value.take(idx)
+        return out.reshape(n, n_trees)
+
+    # ----- ensemble -----
+
+    def predict(self, X, return_members=False):
+        """Ensemble probability for each row of X (array or DataFrame)."""
+        X = self._as_array(X)
+        if len(X) > BLOCK_ROWS:
+            parts = [self.predict(X[i:i + BLOCK_ROWS], return_members)
+                     for i in range(0, len(X), BLOCK_ROWS)]
+            if not return_members:
+                return np.concatenate(parts)
+            return (np.concatenate([p[0] for p in parts]),
+                    {k: np.concatenate([p[1][k] for p in parts]) for k in parts[0][1]})
+
+        # one column per member: logits / tree sums, linked and averaged together
+        Z = np.empty((len(X), len(self.members)))
+        if self._W_in is not None:
+            h = X @ self._W_in
+            h += self._b_in
+            if self._linear:
+                Z[:, self._col[self._linear["name"]]] = h[:, -1]
+            if self._mlp:
+                h = self._act(h[:, :-1] if self._linear else h)
+                for W, b in self._layers[:-1]:
+                    h = self._act(h @ W + b)
+                if self._layers:
+                    W, b = self._layers[-1]
+                    h = h @ W + b
+                Z[:, self._col[self._mlp["name"]]] = h[:, 0]
+        if self._trees:
+            # a NaN anywhere makes the sum NaN (inf - inf only costs the slow path)
+            leaves = self._leaf_values(X, math.isnan(X.sum()))
+            Z[:, self._tree_cols] = np.add.reduceat(leaves, self._tree_starts, axis=1)
+        Z = np.where(self._sigmoid_cols, 1.0 / (1.0 + np.exp(Z * self._neg_scale)), Z)
+        if self._any_label:
+            Z = np.where(self._label_cols, Z > 0.5, Z)
+        scores = Z @ self._weights
+        if return_members:
+            return scores, {name: Z[:, j] for name, j in self._col.items()}
+        return scores
+
+    # ----- persistence -----
+
+    def save(self, path=COMPILED_BUNDLE):
+        with open(path, "wb") as f:
+            np.savez(f, _meta=np.array(json.dumps(self.meta)), **self.arrays)
+        return path
+
+
+def load_compiled(path=COMPILED_BUNDLE):
+    with np.load(path, allow_pickle=False) as z:
+        arrays = {k: z[k] for k in z.files if k != "_meta"}
+        meta = json.loads(str(z["_meta"]))
+    return CompiledEnsemble(arrays, meta)
+
+
+# ---------------------------------------------------
+# IN-PROCESS CACHE
+# ---------------------------------------------------
+
+_COMPILED = OrderedDict()   # id(bundle) -> (bundle, CompiledEnsemble)
+
+
+def compiled_for(bundle):
+    """compile_bundle(bundle), memoised for bundles held by the model registry."""
+    key = id(bundle)
+    entry = _COMPILED.get(key)
+    if entry is None or entry[0] is not bundle:
+        entry = (bundle, compile_bundle(bundle))
+        _COMPILED[key] = entry
+        while len(_COMPILED) > REGISTRY_SIZE:
+            _COMPILED.popitem(last=False)
+    _COMPILED.move_to_end(key)
+    return entry[1]
+
+
+def export_compiled(bundle_path=DEFAULT_BUNDLE, out_path=COMPILED_BUNDLE, check_rows=2000):
+    """
+    Compiles the bundle at `bundle_path`, checks it against predict_ensemble
+    on random inputs drawn around the training feature ranges, and saves it.
+    Returns the maximum absolute difference seen.
+    """
+    from src.model import load_bundle, predict_ensemble
+    bundle = load_bundle(bundle_path)
+    if bundle is None:
+        raise FileNotFoundError(bundle_path)
+    compiled = compile_bundle(bundle)
+
+    rng = np.random.default_rng(0)
+    thr = compiled.arrays.get("split_threshold")
+    X = rng.normal(size=(check_rows, compiled.n_features))
+    if thr is not None:
+        # spread the inputs over the split thresholds each feature actually uses
+        feat = compiled.arrays["split_feature"]
+        for j in range(compiled.n_features):
+            t = thr[(feat == j) & np.isfinite(thr)]
+            if len(t):
+                # half exactly on a threshold, half near one
+                noise = rng.normal(0, t.std() / 10 + 1e-9, check_rows) * (np.arange(check_rows) % 2)
+                X[:, j] = rng.choice(t, check_rows) + noise
+    Xdf = X
+    if compiled.feature_names is not None:
+        import pandas as pd
+        Xdf = pd.DataFrame(X, columns=compiled.feature_names)
+    diff = float(np.max(np.abs(compiled.predict(X) - predict_ensemble(Xdf, bundle=bundle))))
+    compiled.save(out_path)
+    return diff
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Compile the ensemble bundle to a NumPy-only artifact.")
+    ap.add_argument("bundle", nargs="?", default=DEFAULT_BUNDLE)
+    ap.add_argument("output", nargs="?", default=COMPILED_BUNDLE)
+    args = ap.parse_args(argv)
+    diff = export_compiled(args.bundle, args.output)
+    print(f"[compiled] {args.bundle} -> {args.output}  max |diff| vs predict_ensemble: {diff:.2e}")
+    if diff > 1e-6:
+        print("[ERROR] compiled output does not match predict_ensemble", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,10 @@ import numpy as np
 import os
 import plotly.express as px
 from datetime import datetime
+from src.population import (instrument_percentiles, population_mean, population_summary,
+                            percentile_rank, refresh_population_summary, type_stats)
+from src.storage import (SCREENING_KIND, append_record, assessment_summary,
+                         latest_assessment, recent_assessments)
 
 # ============================================================
 #                FILE PATHS & CONSTANTS
@@ -11,23 +15,23 @@ from datetime import datetime
 
 os.makedirs("data", exist_ok=True)
 
-USER_FILE = "data/user_assessments.csv"
 RANDOM_FILE = "data/random_assessment_data.csv"
 
 USER_COLUMNS = ["user_id", "assessment_type", "score", "created_at"]
+HISTORY_ROWS = 50     # most recent rows shown in the history table
+PREVIEW_ROWS = 200    # population rows shown as a sample
 
 
 # ============================================================
 #                SAFE CSV LOADING FUNCTIONS
 # ============================================================
 
-def load_user_data():
-    """Loads user assessment CSV safely. Creates empty file if missing."""
-    if not os.path.exists(USER_FILE) or os.path.getsize(USER_FILE) == 0:
-        df = pd.DataFrame(columns=USER_COLUMNS)
-        df.to_csv(USER_FILE, index=False)
-        return df
-    return pd.read_csv(USER_FILE)
+def load_user_data(limit=HISTORY_ROWS):
+    """Loads the most recent user assessments from the store (tail read)."""
+    df = recent_assessments(limit)
+    if len(df) == 0:
+        return pd.DataFrame(columns=USER_COLUMNS)
+    return df
 
 
 def generate_random_dataset():
@@ -40,13 +44,16 @@ def generate_random_dataset():
             "created_at": pd.date_range(start="2024-01-01", periods=150).strftime("%Y-%m-%d")
         })
         random_df.to_csv(RANDOM_FILE, index=False)
+        refresh_population_summary(RANDOM_FILE)
 
-    return pd.read_csv(RANDOM_FILE)
+    return pd.read_csv(RANDOM_FILE, nrows=PREVIEW_ROWS)
 
 
 # Load datasets now
 user_df = load_user_data()
+user_summary = assessment_summary()
 random_df = generate_random_dataset()
+population = population_summary(RANDOM_FILE)
 
 
 # ============================================================
@@ -62,11 +69,7 @@ def add_user_assessment(user_id, assessment_type, score):
         "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-    df = load_user_data()
-    df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-    df.to_csv(USER_FILE, index=False)
-
-    return True
+    return append_record(new_entry)
 
 
 # ============================================================
@@ -88,16 +91,19 @@ st.subheader("🧑‍💻 Your Assessment History")
 if len(user_df) == 0:
     st.warning("You have not completed any assessments yet.")
 else:
+    st.caption(f"{user_summary['count']} assessments in total; showing the latest {len(user_df)}.")
     st.dataframe(user_df)
 
-    # --- Line Chart (Your Scores Over Time)
-    chart_df = user_df.copy()
-    chart_df["created_at"] = pd.to_datetime(chart_df["created_at"])
-
-    fig = px.line(chart_df, x="created_at", y="score", color="assessment_type",
-                title="📈 Your Score Trend Over Time",
-                markers=True)
-    st.plotly_chart(fig, use_container_width=True)
+    # --- Line Chart (Your Scores Over Time): daily means from the summary store
+    trend = user_summary["trend"]
+    chart_df = trend[trend["metric"] == "score"].rename(
+        columns={"bucket": "created_at", "kind": "assessment_type", "mean": "score"})
+    if len(chart_df):
+        chart_df["created_at"] = pd.to_datetime(chart_df["created_at"])
+        fig = px.line(chart_df, x="created_at", y="score", color="assessment_type",
+                    title="📈 Your Score Trend Over Time",
+                    markers=True)
+        st.plotly_chart(fig, use_container_width=True)
 
 
 # ============================================================
@@ -105,11 +111,14 @@ else:
 # ============================================================
 
 st.subheader("📊 Population-Level Comparison Dataset")
+population_stats = pd.DataFrame(type_stats(population))
+st.caption(f"{int(population_stats['n'].sum()):,} reference rows; "
+           f"showing the first {len(random_df)}.")
 st.dataframe(random_df)
 
-# Comparison bar chart
+# Comparison bar chart (pre-aggregated per assessment type)
 fig2 = px.bar(
-    random_df.groupby("assessment_type")["score"].mean().reset_index(),
+    population_stats.rename(columns={"mean": "score"}),
     x="assessment_type",
     y="score",
     title="📌 Average Mental Health Scores in Random Population",
@@ -123,16 +132,18 @@ st.plotly_chart(fig2, use_container_width=True)
 
 st.subheader("⚖ Your Score vs Population Average")
 
-if len(user_df) > 0:
-    latest = user_df.iloc[-1]
+latest = latest_assessment()
+if latest is not None and latest.get("assessment_type"):
     user_type = latest["assessment_type"]
     user_score = latest["score"]
 
-    population_avg = random_df[random_df["assessment_type"] == user_type]["score"].mean()
+    population_avg = population_mean(population, user_type)
+    user_pct = percentile_rank(population, user_type, user_score)
 
     st.success(f"Latest Assessment: **{user_type.capitalize()}**")
     st.info(f"📌 Your Score: **{user_score}**")
     st.info(f"📊 Population Average: **{round(population_avg, 2)}**")
+    st.info(f"📈 Population Percentile: **{user_pct:.0f}**")
 
     comparison_df = pd.DataFrame({
         "Category": ["Your Score", "Population Avg"],
@@ -145,6 +156,25 @@ else:
     st.warning("Complete an assessment to view comparison.")
 
 
+# ============================================================
+#          SCREENING INSTRUMENTS: PERCENTILE OF POPULATION
+# ============================================================
+
+st.subheader("📐 Your Latest Screening vs Population (percentiles)")
+
+latest_screening = latest_assessment(kind=SCREENING_KIND)
+ranks = instrument_percentiles(latest_screening, population) if latest_screening else []
+if ranks:
+    ranks_df = pd.DataFrame(ranks)
+    st.dataframe(ranks_df.round({"percentile": 1}))
+    fig4 = px.bar(ranks_df, x="instrument", y="percentile", range_y=[0, 100],
+                  hover_data=["score", "n", "reference"],
+                  title="📐 Percentile Rank per Instrument")
+    st.plotly_chart(fig4, use_container_width=True)
+else:
+    st.warning("Save a multi-domain screening to see percentile ranks.")
+
+
 # ============================================================
 #         A BUTTON TO REFRESH RANDOM DATA (OPTIONAL)
 # ============================================================
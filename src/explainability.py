@@ -1,18 +1,126 @@
 # src/explainability.py
-import shap
+import hashlib
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from collections import OrderedDict
 from io import BytesIO
 
-def shap_summary_plot_lgb(lgbm_model, X, feature_names, max_display=20):
+# shap and matplotlib are imported inside the functions that need them,
+# so importing this module does not pull them in.
+
+SAMPLE_ROWS = 10_000    # rows explained by default (None = all of X)
+CHUNK_ROWS = 4_096      # rows per SHAP call, bounds peak memory
+BACKGROUND_ROWS = 200   # background set for interventional SHAP
+RESULT_CACHE_SIZE = 4
+
+_EXPLAINERS = {}            # id(model) -> (model, background key, explainer)
+_RESULTS = OrderedDict()    # (id(model), data fingerprint, options) -> result
+
+
+# ---------------------------------------------------
+# SHARED SHAP COMPUTATION
+# ---------------------------------------------------
+
+def _is_lightgbm(model):
+    return type(model).__module__.startswith("lightgbm.")
+
+
+def _fingerprint(X):
+    a = np.ascontiguousarray(X)
+    return a.shape, hashlib.sha1(a.view(np.uint8)).hexdigest()
+
+
+def get_explainer(model, background=None):
+    """
+    shap.TreeExplainer for `model`, built once per model object (and
+    background set). With a background the explainer is interventional.
+    """
+    bg_key = None if background is None else _fingerprint(background)
+    cached = _EXPLAINERS.get(id(model))
+    if cached is not None and cached[0] is model and cached[1] == bg_key:
+        return cached[2]
+    import shap
+    if background is None:
+        explainer = shap.TreeExplainer(model)
+    else:
+        explainer = shap.TreeExplainer(model, data=background,
+                                       feature_perturbation="interventional")
+    _EXPLAINERS[id(model)] = (model, bg_key, explainer)
+    return explainer
+
+
+def _chunk_values(model, X, background):
+    """SHAP values (n, f) for positive class, and the base value, for one chunk."""
+    if _is_lightgbm(model) and background is None:
+        # LightGBM ships exact TreeSHAP: last column is the expected value
+        contrib = np.asarray(model.predict(X, pred_contrib=True))
+        return contrib[:, :-1], float(contrib[0, -1])
+    explainer = get_explainer(model, background)
+    values = explainer.shap_values(X)
+    base = explainer.expected_value
+    if isinstance(values, list):
+        values, base = values[1], np.atleast_1d(base)[-1]
+    elif np.ndim(values) == 3:
+        values, base = values[..., 1], np.atleast_1d(base)[-1]
+    return np.asarray(values), float(np.atleast_1d(base)[0])
+
+
+def compute_shap(model, X, feature_names=None, max_rows=SAMPLE_ROWS, background_rows=None,
+                 chunk_size=CHUNK_ROWS, seed=0):
+    """
+    SHAP values for `model` over X, computed once and shared by the plot
+    and the table. At most `max_rows` rows (uniform sample, fixed seed)
+    are explained, in chunks of `chunk_size`. `background_rows` > 0 uses a
+    sampled background set (interventional SHAP) instead of the trees'
+    cover statistics.
+
+    Returns {"values": (n, f) array, "X": DataFrame of explained rows,
+             "base_value": float, "rows_total": len(X)}.
+    """
+    if feature_names is None:
+        feature_names = list(X.columns) if hasattr(X, "columns") else \
+            [f"f{i}" for i in range(np.shape(X)[1])]
+    data = np.asarray(X, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    if max_rows is not None and len(data) > max_rows:
+        data = data[np.sort(rng.choice(len(data), max_rows, replace=False))]
+    background = None
+    if background_rows:
+        src = np.asarray(X, dtype=np.float64)
+        take = min(background_rows, len(src))
+        background = src[np.sort(rng.choice(len(src), take, replace=False))]
+
+    key = (id(model), _fingerprint(data), background_rows, seed)
+    hit = _RESULTS.get(key)
+    if hit is not None and hit[0] is model:
+        _RESULTS.move_to_end(key)
+        return hit[1]
+
+    frame = pd.DataFrame(data, columns=feature_names)
+    values, base = np.empty(data.shape), 0.0
+    for start in range(0, len(frame), chunk_size):
+        part = frame.iloc[start:start + chunk_size]
+        values[start:start + len(part)], base = _chunk_values(model, part, background)
+    result = {"values": values, "X": frame, "base_value": base, "rows_total": len(X)}
+
+    _RESULTS[key] = (model, result)
+    while len(_RESULTS) > RESULT_CACHE_SIZE:
+        _RESULTS.popitem(last=False)
+    return result
+
+
+# ---------------------------------------------------
+# PLOT / TABLE
+# ---------------------------------------------------
+
+def shap_summary_plot_lgb(lgbm_model, X, feature_names, max_display=20, shap_result=None,
+                          **shap_kwargs):
     try:
-        explainer = shap.TreeExplainer(lgbm_model)
-        shap_vals = explainer.shap_values(X)
-        if isinstance(shap_vals, list):
-            shap_vals = shap_vals[1]
+        import shap
+        import matplotlib.pyplot as plt
+        res = shap_result or compute_shap(lgbm_model, X, feature_names, **shap_kwargs)
         plt.figure(figsize=(8,6))
-        shap.summary_plot(shap_vals, pd.DataFrame(X, columns=feature_names), show=False, max_display=max_display)
+        shap.summary_plot(res["values"], res["X"], show=False, max_display=max_display)
         buf = BytesIO()
         plt.tight_layout()
         plt.savefig(buf, format='png', dpi=150)
@@ -22,15 +130,250 @@ def shap_summary_plot_lgb(lgbm_model, X, feature_names, max_display=20):
     except Exception:
         return None
 
-def top_shap_table(lgbm_model, X, feature_names, top_k=10):
+def top_shap_table(lgbm_model, X, feature_names, top_k=10, shap_result=None, **shap_kwargs):
     try:
-        explainer = shap.TreeExplainer(lgbm_model)
-        shap_vals = explainer.shap_values(X)
-        if isinstance(shap_vals, list):
-            shap_vals = shap_vals[1]
-        mean_abs = np.abs(shap_vals).mean(axis=0)
-        df = pd.DataFrame({"feature":feature_names, "mean_abs_shap":mean_abs})
+        res = shap_result or compute_shap(lgbm_model, X, feature_names, **shap_kwargs)
+        mean_abs = np.abs(res["values"]).mean(axis=0)
+        df = pd.DataFrame({"feature":list(res["X"].columns), "mean_abs_shap":mean_abs})
         df = df.sort_values("mean_abs_shap", ascending=False).head(top_k).reset_index(drop=True)
         return df
     except Exception:
         return pd.DataFrame(columns=["feature","mean_abs_shap"])
+
+
+# ---------------------------------------------------
+# LOCAL (PER-PREDICTION) EXPLANATIONS
+# ---------------------------------------------------
+# Contributions of every member are reported in probability units and
+# add up to (member probability - member base), so they can be averaged
+# into one ensemble view:
+#   logistic  coefficient x (value - mean training row), exact in log-odds
+#   lgbm      LightGBM's built-in TreeSHAP (pred_contrib)
+#   rf        path-dependent TreeSHAP over all feature coalitions,
+#             vectorised over every tree at once (shap for wide inputs)
+#   mlp       baseline Shapley against the cached mean training row: one
+#             predict_proba call over the 2^F mixes of the two rows
+# Log-odds contributions are rescaled to add up to the probability change.
+
+MAX_EXACT_FEATURES = 10     # 2^F coalitions; wider inputs use shap / occlusion
+BACKGROUND_TEXTS = "data/training_data.csv"
+
+_FORESTS = {}       # id(forest) -> (forest, tables)
+_BACKGROUND = {}    # id(bundle) -> (bundle, mean feature row)
+_COALITIONS = {}    # n features -> (masks, shapley weight matrix)
+
+
+def _coalitions(n):
+    """Boolean masks (2^n, n) and the matrix W with phi = v(masks) @ W."""
+    if n not in _COALITIONS:
+        from math import factorial
+        ids = np.arange(1 << n)
+        masks = ((ids[:, None] >> np.arange(n)) & 1).astype(bool)
+        size = masks.sum(axis=1)
+        W = np.zeros((1 << n, n))
+        for i in range(n):
+            without = ids[~masks[:, i]]
+            w = np.array([factorial(s) * factorial(n - s - 1) / factorial(n)
+                          for s in size[without]])
+            W[without | (1 << i), i] += w
+            W[without, i] -= w
+        _COALITIONS[n] = (masks, W)
+    return _COALITIONS[n]
+
+
+def background_row(bundle, columns):
+    """Mean feature row the explanations are relative to (cached per bundle)."""
+    cached = _BACKGROUND.get(id(bundle))
+    if cached is not None and cached[0] is bundle:
+        return cached[1]
+    means = bundle.get("feature_means")
+    if means is None:
+        from src.features import FEATURE_COLUMNS, extract_features_batch
+        try:
+            texts = pd.read_csv(BACKGROUND_TEXTS)["text"].astype(str).tolist()
+            feats = pd.DataFrame(extract_features_batch(texts), columns=FEATURE_COLUMNS)
+            means = feats.reindex(columns=columns).mean().to_numpy(np.float64)
+        except Exception as e:
+            print(f"[WARN] No background data for explanations ({e}); using zeros")
+            means = np.zeros(len(columns))
+    means = np.nan_to_num(np.asarray(means, dtype=np.float64))
+    _BACKGROUND[id(bundle)] = (bundle, means)
+    return means
+
+
+def _logit(p):
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return np.log(p / (1 - p))
+
+
+def _to_probability(contrib, z, z_base):
+    """Rescales log-odds contributions so they sum to sigmoid(z) - sigmoid(z_base)."""
+    p, p_base = 1 / (1 + np.exp(-z)), 1 / (1 + np.exp(-z_base))
+    dz = z - z_base
+    scale = (p - p_base) / dz if abs(dz) > 1e-12 else p * (1 - p)
+    return contrib * scale, float(p_base)
+
+
+def _explain_logistic(model, x, base_row):
+    coef = np.ravel(model.coef_)
+    contrib = coef * (x - base_row)
+    z_base = float(model.intercept_[0] + coef @ base_row)
+    return _to_probability(contrib, z_base + contrib.sum(), z_base)
+
+
+def _explain_lgbm(model, x, columns):
+    contrib = np.asarray(model.predict(pd.DataFrame([x], columns=columns), pred_contrib=True))[0]
+    return _to_probability(contrib[:-1], contrib.sum(), contrib[-1])
+
+
+def _forest_tables(forest):
+    """All trees of a fitted sklearn forest as flat arrays, with node depths."""
+    cached = _FORESTS.get(id(forest))
+    if cached is not None and cached[0] is forest:
+        return cached[1]
+    parts, offset = [], 0
+    for est in forest.estimators_:
+        t = est.tree_
+        left, right = t.children_left.copy(), t.children_right.copy()
+        internal = left >= 0
+        depth = np.zeros(t.node_count, dtype=np.int64)
+        for node in range(t.node_count):      # preorder: parents come first
+            if internal[node]:
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+        left[internal] += offset
+        right[internal] += offset
+        value = t.value[:, 0, :]
+        parts.append((left, right, t.feature, t.threshold, depth,
+                      value[:, 1] / value.sum(axis=1), t.weighted_n_node_samples,
+                      np.arange(t.node_count) == 0))
+        offset += t.node_count
+    left, right, feature, threshold, depth, p1, cover, root = map(np.concatenate, zip(*parts))
+    internal = left >= 0
+    levels = [np.flatnonzero(internal & (depth == d)) for d in range(depth.max())]
+    tables = {"left": left, "right": right, "feature": feature, "threshold": threshold,
+              "p1": p1, "cover": cover, "root": root, "leaf": ~internal, "levels": levels,
+              "n_trees": len(forest.estimators_)}
+    _FORESTS[id(forest)] = (forest, tables)
+    return tables
+
+
+def _forest_coalition_values(t, x, masks):
+    """E[forest(x) | features in S known] for every coalition S (TreeSHAP's EXPVALUE)."""
+    x32 = x.astype(np.float32).astype(np.float64)     # sklearn splits on float32 inputs
+    W = np.zeros((len(t["left"]), len(masks)))
+    W[t["root"]] = 1.0
+    for nodes in t["levels"]:
+        f = t["feature"][nodes]
+        go_left = (x32[f] <= t["threshold"][nodes])[:, None]
+        known = masks[:, f].T
+        w = W[nodes]
+        lc, rc = t["left"][nodes], t["right"][nodes]
+        share = (t["cover"][lc] / t["cover"][nodes])[:, None]
+        W[lc] = w * np.where(known, go_left, share)
+        W[rc] = w * np.where(known, ~go_left, 1.0 - share)
+    leaf = t["leaf"]
+    return (t["p1"][leaf] @ W[leaf]) / t["n_trees"]
+
+
+def _explain_forest(model, x, columns, method):
+    t = _forest_tables(model)
+    if method == "treeshap":
+        masks, W = _coalitions(len(x))
+        v = _forest_coalition_values(t, x, masks)
+        return v @ W, float(v[0])
+    if method == "shap":
+        res = _chunk_values(model, pd.DataFrame([x], columns=columns), None)
+        return res[0][0], res[1]
+    # Saabas: change in node value along the decision path, per split feature
+    masks = np.ones((1, len(x)), dtype=bool)
+    W = np.zeros((len(t["left"]), 1))
+    W[t["root"]] = 1.0
+    x32 = x.astype(np.float32).astype(np.float64)
+    contrib = np.zeros(len(x))
+    for nodes in t["levels"]:
+        on = nodes[W[nodes, 0] > 0]
+        child = np.where(x32[t["feature"][on]] <= t["threshold"][on], t["left"][on], t["right"][on])
+        W[child] = 1.0
+        np.add.at(contrib, t["feature"][on], t["p1"][child] - t["p1"][on])
+    base = float(t["p1"][t["root"]].mean())
+    return contrib / t["n_trees"], base
+
+
+def _explain_mlp(model, x, base_row, columns, exact):
+    if exact:
+        masks, W = _coalitions(len(x))
+        rows = np.where(masks, x, base_row)
+    else:   # occlusion: each feature alone reset to the mean
+        rows = np.vstack([x, np.where(np.eye(len(x), dtype=bool), base_row, x), base_row])
+    p = model.predict_proba(pd.DataFrame(rows, columns=columns))[:, 1]
+    if exact:
+        return p @ W, float(p[0])
+    return p[0] - p[1:-1], float(p[-1])
+
+
+def explain_prediction(X, bundle=None, bundle_path=None, members=None):
+    """
+    Local explanation of one input row (1-row DataFrame, dict or array)
+    for each ensemble member and for the ensemble, weighted as
+    predict_ensemble combines the members.
+
+    Returns {"features", "values", "base", "members": {name: {"method",
+    "base", "proba", "contributions"}}, "table": DataFrame[feature, value,
+    contribution, <member>...] sorted by |contribution|}.
+    Contributions are in probability units relative to the mean row, on
+    the same member outputs predict_ensemble combines, so base + the sum
+    of the ensemble contributions is the ensemble score.
+    """
+    from src.model import DEFAULT_BUNDLE, ensemble_weights, feature_columns, get_bundle
+    if bundle is None:
+        bundle = get_bundle(bundle_path or DEFAULT_BUNDLE)
+    if bundle is None:
+        raise FileNotFoundError("Model bundle could not be loaded. Check model path.")
+    columns = feature_columns(bundle)
+    if isinstance(X, dict):
+        X = pd.DataFrame([X])
+    if hasattr(X, "columns"):
+        x = X.reindex(columns=columns).iloc[0].to_numpy(np.float64)
+    else:
+        x = np.asarray(X, dtype=np.float64).reshape(-1)
+    base_row = background_row(bundle, columns)
+    exact = len(columns) <= MAX_EXACT_FEATURES
+
+    weights = ensemble_weights(bundle)
+    out = {}
+    for name in members or weights:
+        model = bundle.get(name)
+        if model is None:
+            continue
+        if name == "logistic":
+            method, (contrib, base) = "linear", _explain_logistic(model, x, base_row)
+        elif name == "lgbm":
+            method, (contrib, base) = "treeshap", _explain_lgbm(model, x, columns)
+        elif name == "rf":
+            method = "treeshap" if exact else "shap"
+            if method == "shap":
+                try:
+                    import shap  # noqa: F401
+                except ImportError:
+                    method = "saabas"
+            contrib, base = _explain_forest(model, x, columns, method)
+        elif name == "mlp":
+            method = "baseline-shapley" if exact else "occlusion"
+            contrib, base = _explain_mlp(model, x, base_row, columns, exact)
+        else:
+            continue
+        out[name] = {"method": method, "base": base, "proba": base + float(np.sum(contrib)),
+                     "contributions": np.asarray(contrib, dtype=np.float64)}
+
+    if not out:
+        raise ValueError("bundle has no explainable members")
+    w = np.array([weights.get(name, 0.0) for name in out])
+    w = w if w.sum() > 0 else np.ones(len(out))
+    ensemble = np.average([m["contributions"] for m in out.values()], axis=0, weights=w)
+    table = pd.DataFrame({"feature": columns, "value": x, "contribution": ensemble})
+    for name, m in out.items():
+        table[name] = m["contributions"]
+    table = table.reindex(table["contribution"].abs().sort_values(ascending=False).index)
+    return {"features": columns, "values": x,
+            "base": float(np.average([m["base"] for m in out.values()], weights=w)),
+            "members": out, "table": table.reset_index(drop=True)}
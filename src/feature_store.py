@@ -0,0 +1,168 @@
+# src/feature_store.py
+"""
+Memory-mapped feature matrices built block by block.
+
+    data/cache/features/<key>/X.npy        float32 (rows, features), opened with mmap_mode="r"
+                              y.npy        labels (when the input has a label column)
+                              vect.joblib  text vectoriser the blocks were built with
+                              meta.json    {"columns": [...], "rows": n, ...}
+                              split-<seed>-<test>/  X_train.npy, X_val.npy, y_train.npy, y_val.npy
+
+A store (and each split of it) is written into a temporary directory and
+renamed into place when complete, so an interrupted build is never mistaken
+for a cached one. Splits copy rows block by block, so neither the store nor
+a split is ever read into memory whole.
+"""
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import numpy as np
+
+from src import features
+
+FEATURE_CACHE_DIR = "data/cache/features"
+SPLIT_BLOCK_ROWS = 50_000
+
+
+def store_key(**params):
+    """
+    Cache key for a feature build; includes everything that changes the
+    columns or their values (feature code versions included).
+    """
+    params = dict(params,
+                  features=features.FEATURES_VERSION,
+                  audio_features=(features.AUDIO_FEATURES_VERSION, features.AUDIO_SR,
+                                  features.AUDIO_N_MFCC),
+                  tfidf_max=features.TFIDF_MAX,
+                  emb=features.EMB_NAME if features._sentence_transformer() else None,
+                  audio=features._librosa() is not None)
+    blob = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def open_feature_store(path):
+    """Returns (X, y, columns, vect) with X memory-mapped, or None if no complete store."""
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    import joblib
+    with open(meta_path) as f:
+        meta = json.load(f)
+    X = np.load(os.path.join(path, "X.npy"), mmap_mode="r")[:meta["rows"]]
+    y_path = os.path.join(path, "y.npy")
+    y = np.load(y_path, mmap_mode="r")[:meta["rows"]] if os.path.exists(y_path) else None
+    return X, y, meta["columns"], joblib.load(os.path.join(path, "vect.joblib"))
+
+
+def build_feature_store(frames, path, n_rows, text_vect=None, vectorizer="hashing",
+                        label_col="label", audio_workers=None, verbose=True):
+    """
+    Streams DataFrame chunks through iter_feature_blocks into an on-disk
+    float32 matrix of (at most) n_rows rows. Without `text_vect`, a
+    vectoriser of kind `vectorizer` is made (TF-IDF is fitted on the first
+    chunk). Returns the same tuple as open_feature_store.
+    """
+    import joblib
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("no input rows")
+    if text_vect is None:
+        sample = first['text_response'].fillna("").astype(str).tolist()
+        text_vect = features.make_text_vectorizer(vectorizer, sample_texts=sample)
+
+    tmp = path.rstrip("/\\") + ".partial"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    X = y = None
+    columns, row = None, 0
+    for block, cols, frame in features.iter_feature_blocks(
+            itertools.chain([first], frames), text_vect, audio_workers=audio_workers):
+        if X is None:
+            columns = cols
+            X = np.lib.format.open_memmap(os.path.join(tmp, "X.npy"), mode="w+",
+                                          dtype=np.float32, shape=(n_rows, block.shape[1]))
+            if label_col in frame.columns:
+                y = np.lib.format.open_memmap(os.path.join(tmp, "y.npy"), mode="w+",
+                                              dtype=np.int64, shape=(n_rows,))
+        end = row + len(block)
+        if end > n_rows:
+            raise ValueError(f"input has more than n_rows={n_rows} rows")
+        X[row:end] = block
+        if y is not None:
+            y[row:end] = frame[label_col].to_numpy()
+        row = end
+        if verbose:
+            print(f"[features] {row:,}/{n_rows:,} rows")
+    X.flush()
+    if y is not None:
+        y.flush()
+    del X, y
+    joblib.dump(text_vect, os.path.join(tmp, "vect.joblib"))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "rows": row, "vectorizer": type(text_vect).__name__}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return open_feature_store(path)
+
+
+def store_path(n_rows, key_params, vectorizer="hashing", cache_dir=FEATURE_CACHE_DIR):
+    """Directory of the store cached_feature_store uses for these settings."""
+    return os.path.join(cache_dir, store_key(vectorizer=vectorizer, rows=n_rows, **key_params))
+
+
+def cached_feature_store(make_frames, n_rows, key_params, vectorizer="hashing",
+                         label_col="label", cache_dir=FEATURE_CACHE_DIR, **kwargs):
+    """
+    open_feature_store for the build described by `key_params`, building it
+    from `make_frames()` on the first run only.
+    """
+    path = store_path(n_rows, key_params, vectorizer, cache_dir)
+    cached = open_feature_store(path)
+    if cached is not None:
+        print(f"[features] reusing cached features at {path}")
+        return cached
+    return build_feature_store(make_frames(), path, n_rows, vectorizer=vectorizer,
+                               label_col=label_col, **kwargs)
+
+
+def _take_rows(X, rows, path, block_rows):
+    """Writes X[rows] to a new .npy at `path`, `block_rows` rows at a time."""
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=X.dtype, shape=(len(rows),) + X.shape[1:])
+    for start in range(0, len(rows), block_rows):
+        out[start:start + block_rows] = X[rows[start:start + block_rows]]
+    out.flush()
+    del out
+
+
+def split_feature_store(path, test_size=0.2, random_state=42, block_rows=SPLIT_BLOCK_ROWS):
+    """
+    Stratified train / validation split of the store at `path`, made on row
+    indices and written once as memory-mapped matrices beside it. Returns
+    (X_train, X_val, y_train, y_val), all opened with mmap_mode="r".
+    Rows keep their store order within each part.
+    """
+    split = os.path.join(path, f"split-{random_state}-{test_size:g}")
+    names = ("X_train", "X_val", "y_train", "y_val")
+    if not os.path.exists(os.path.join(split, "y_val.npy")):
+        from sklearn.model_selection import train_test_split
+        X, y, _, _ = open_feature_store(path)
+        if y is None:
+            raise ValueError(f"{path} has no labels to split on")
+        y = np.asarray(y)
+        train, val = train_test_split(np.arange(len(y)), stratify=y, test_size=test_size,
+                                      random_state=random_state)
+        train.sort()
+        val.sort()
+        tmp = split + ".partial"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        _take_rows(X, train, os.path.join(tmp, "X_train.npy"), block_rows)
+        _take_rows(X, val, os.path.join(tmp, "X_val.npy"), block_rows)
+        np.save(os.path.join(tmp, "y_train.npy"), y[train])
+        np.save(os.path.join(tmp, "y_val.npy"), y[val])
+        shutil.rmtree(split, ignore_errors=True)
+        os.replace(tmp, split)
+    return tuple(np.load(os.path.join(split, f"{n}.npy"), mmap_mode="r") for n in names)
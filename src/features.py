@@ -1,91 +1,350 @@
 # src/features.py
+import itertools
+import os
+import time
 import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from src.vector_cache import VectorCache, content_key
 
-try:
-    from sentence_transformers import SentenceTransformer
-    EMB_AVAILABLE = True
-except Exception:
-    EMB_AVAILABLE = False
+# Heavy optional dependencies (torch via sentence_transformers, librosa,
+# scikit-learn, scipy) are imported on first use so that importing this
+# module for extract_features stays cheap.
+EMB_AVAILABLE = None      # resolved by _sentence_transformer()
+AUDIO_AVAILABLE = None    # resolved by _librosa()
+_SENTENCE_TRANSFORMER = None
+_LIBROSA = None
 
-try:
-    import librosa
-    AUDIO_AVAILABLE = True
-except Exception:
-    AUDIO_AVAILABLE = False
+def _sentence_transformer():
+    """SentenceTransformer class, or None if sentence_transformers is unusable."""
+    global EMB_AVAILABLE, _SENTENCE_TRANSFORMER
+    if EMB_AVAILABLE is None:
+        try:
+            from sentence_transformers import SentenceTransformer
+            _SENTENCE_TRANSFORMER = SentenceTransformer
+            EMB_AVAILABLE = True
+        except Exception:
+            EMB_AVAILABLE = False
+    return _SENTENCE_TRANSFORMER if EMB_AVAILABLE else None
+
+def _librosa():
+    """librosa module, or None if it cannot be imported."""
+    global AUDIO_AVAILABLE, _LIBROSA
+    if AUDIO_AVAILABLE is None:
+        try:
+            import librosa
+            _LIBROSA = librosa
+            AUDIO_AVAILABLE = True
+        except Exception:
+            AUDIO_AVAILABLE = False
+    return _LIBROSA if AUDIO_AVAILABLE else None
 
 TFIDF_MAX = 250
+FEATURES_VERSION = 1          # bump when the text / behaviour feature code changes (invalidates feature stores)
 EMB_NAME = "all-MiniLM-L6-v2"
 EMB_MODEL = None
+EMB_CACHE_DIR = "data/cache/embeddings"
+EMB_CACHE = None
+AUDIO_CACHE_DIR = "data/cache/audio"
+AUDIO_CACHE = None
+AUDIO_WORKERS = None      # process-pool size for audio decoding; None = CPU count
+AUDIO_SR = 16000
+AUDIO_N_MFCC = 13
+AUDIO_FEATURES_VERSION = 2    # bump when the audio feature code changes (invalidates the cache)
+AUDIO_COLUMNS = [f"mfcc_mean_{i}" for i in range(AUDIO_N_MFCC)] + ["zcr_mean","rmse_mean","tempo"]
+BEHAVIOR_COLUMNS = ["rt_mean","rt_std","rt_min","rt_max","age"]
+
+# ---------------------------------------------------
+# REACTION TIMES (ragged: flat values + row offsets)
+# ---------------------------------------------------
+RT_COLUMNS = ["rt_mean","rt_std","rt_min","rt_max","rt_median","rt_iqr"]
+
+def _rt_values(v):
+    if v is None:
+        return ()
+    return v if hasattr(v, "__iter__") else (v,)
+
+def ragged_from_lists(values):
+    """
+    Flattens per-row reaction times (lists / arrays / scalars / None) into
+    (flat, offsets): row i holds flat[offsets[i]:offsets[i+1]].
+    """
+    values = values.tolist() if hasattr(values, "tolist") else list(values)
+    rows = [_rt_values(v) for v in values]
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64, count=int(offsets[-1]))
+    return flat, offsets
+
+def segment_stats(flat, offsets):
+    """
+    Per-row mean, std (population), min, max, median and IQR of a ragged
+    array, keyed by RT_COLUMNS. Empty rows give NaN; so does a row containing
+    NaN, as with np.mean / np.median.
+    """
+    n = len(offsets) - 1
+    out = {c: np.full(n, np.nan) for c in RT_COLUMNS}
+    lengths = np.diff(offsets)
+    rows = np.flatnonzero(lengths)
+    if rows.size == 0:
+        return out
+    starts, counts = offsets[rows], lengths[rows]
+    # reduceat over non-empty starts only: each segment then ends where the next begins
+    mean = np.add.reduceat(flat, starts) / counts
+    dev = flat - np.repeat(mean, counts)
+    out["rt_mean"][rows] = mean
+    out["rt_std"][rows] = np.sqrt(np.add.reduceat(dev * dev, starts) / counts)
+    out["rt_min"][rows] = np.minimum.reduceat(flat, starts)
+    out["rt_max"][rows] = np.maximum.reduceat(flat, starts)
+
+    # order statistics: sort within each row once, then index
+    if rows.size == n and (lengths == lengths[0]).all():
+        srt = np.sort(flat.reshape(n, -1), axis=1).ravel()
+    else:
+        srt = flat[np.lexsort((flat, np.repeat(np.arange(rows.size), counts)))]
+
+    def quantile(q):
+        pos = q * (counts - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, counts - 1)
+        a, b = srt[starts + lo], srt[starts + hi]
+        return a + (b - a) * (pos - lo)
+
+    q1, med, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    has_nan = np.add.reduceat(np.isnan(flat).view(np.int8), starts) > 0
+    out["rt_median"][rows] = np.where(has_nan, np.nan, med)
+    out["rt_iqr"][rows] = np.where(has_nan, np.nan, q3 - q1)
+    return out
+
+def rt_stats(reaction_times):
+    """DataFrame of RT_COLUMNS for a sequence of per-row reaction-time lists."""
+    stats = segment_stats(*ragged_from_lists(reaction_times))
+    index = reaction_times.index if isinstance(reaction_times, pd.Series) else None
+    return pd.DataFrame(stats, index=index, columns=RT_COLUMNS)
 
 def _flatten_rts(df):
-    df = df.copy()
-    df['rt_mean'] = df['reaction_times'].apply(lambda x: float(np.mean(x)) if hasattr(x, "__iter__") else float(x))
-    df['rt_std'] = df['reaction_times'].apply(lambda x: float(np.std(x)) if hasattr(x, "__iter__") else 0.0)
-    df['rt_min'] = df['reaction_times'].apply(lambda x: float(np.min(x)) if hasattr(x, "__iter__") else float(x))
-    df['rt_max'] = df['reaction_times'].apply(lambda x: float(np.max(x)) if hasattr(x, "__iter__") else float(x))
-    return df
-
-def tfidf_fit_transform(corpus, max_features=TFIDF_MAX):
+    return df.assign(**rt_stats(df['reaction_times']))
+
+def _tfidf_columns(n):
+    return [f"tfidf_{i}" for i in range(n)]
+
+def tfidf_fit_transform(corpus, max_features=TFIDF_MAX, sparse=False):
+    """Fits TF-IDF. Returns (DataFrame, vect), or (CSR matrix, vect) with sparse=True."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
     vect = TfidfVectorizer(max_features=max_features, stop_words='english')
     X = vect.fit_transform(corpus)
-    cols = [f"tfidf_{i}" for i in range(X.shape[1])]
-    return pd.DataFrame(X.toarray(), columns=cols), vect
+    if sparse:
+        return X.tocsr(), vect
+    return pd.DataFrame(X.toarray(), columns=_tfidf_columns(X.shape[1])), vect
 
-def tfidf_transform(corpus, vect):
+def tfidf_transform(corpus, vect, sparse=False):
     X = vect.transform(corpus)
-    cols = [f"tfidf_{i}" for i in range(X.shape[1])]
-    return pd.DataFrame(X.toarray(), columns=cols)
+    if sparse:
+        return X.tocsr()
+    return pd.DataFrame(X.toarray(), columns=_tfidf_columns(X.shape[1]))
 
-def embed_texts(corpus):
-    if not EMB_AVAILABLE:
+def _embedding_cache(dim):
+    global EMB_CACHE
+    if EMB_CACHE is None:
+        EMB_CACHE = VectorCache(os.path.join(EMB_CACHE_DIR, EMB_NAME), dim)
+    return EMB_CACHE
+
+def embed_texts(corpus, use_cache=True):
+    """
+    Sentence embeddings for `corpus`. Each distinct string is encoded at most
+    once per call, and with use_cache=True only strings never seen before
+    (by content hash) reach the model.
+    """
+    SentenceTransformer = _sentence_transformer()
+    if SentenceTransformer is None:
         return pd.DataFrame(np.zeros((len(corpus), 1)), columns=["emb_fallback"])
     global EMB_MODEL
     if EMB_MODEL is None:
         EMB_MODEL = SentenceTransformer(EMB_NAME)
-    emb = EMB_MODEL.encode(corpus, show_progress_bar=False)
+    texts = list(corpus)
+    uniq = list(dict.fromkeys(texts))
+    dim = EMB_MODEL.get_sentence_embedding_dimension()
+    vecs = {}
+    if use_cache:
+        cache = _embedding_cache(dim)
+        keys = {t: content_key(t) for t in uniq}
+        hits = cache.get_many(list(keys.values()))
+        vecs = {t: hits[k] for t, k in keys.items() if k in hits}
+    missing = [t for t in uniq if t not in vecs]
+    if missing:
+        enc = np.asarray(EMB_MODEL.encode(missing, show_progress_bar=False), dtype=np.float32)
+        vecs.update(zip(missing, enc))
+        if use_cache:
+            cache.put_many([keys[t] for t in missing], enc)
+    emb = np.stack([vecs[t] for t in texts]) if texts else np.zeros((0, dim), dtype=np.float32)
     cols = [f"emb_{i}" for i in range(emb.shape[1])]
     return pd.DataFrame(emb, columns=cols)
 
-def audio_features_from_bytes(byte_content, sr=16000):
+def _decode_audio(byte_content, sr=AUDIO_SR):
+    """AUDIO_COLUMNS dict for one clip; raises if librosa cannot decode it."""
+    import io
+    librosa = _librosa()
     out = {}
-    audio_cols = [f"mfcc_mean_{i}" for i in range(13)] + ["zcr_mean","rmse_mean","tempo"]
-    if not AUDIO_AVAILABLE or byte_content is None:
-        return {c:0.0 for c in audio_cols}
+    y, sr = librosa.load(io.BytesIO(byte_content), sr=sr, mono=True)
+    # one STFT / mel spectrogram shared by MFCC and onset strength;
+    # RMS is taken from the frames directly and needs no spectrogram
+    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S**2, sr=sr))
+    mfcc = librosa.feature.mfcc(S=mel_db, sr=sr, n_mfcc=AUDIO_N_MFCC)
+    for i, v in enumerate(mfcc.mean(axis=1)):
+        out[f"mfcc_mean_{i}"] = float(v)
+    out["zcr_mean"] = float(librosa.feature.zero_crossing_rate(y).mean())
+    out["rmse_mean"] = float(librosa.feature.rms(y=y).mean())
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+    tempo_fn = getattr(librosa.feature, "tempo", None) or librosa.beat.tempo   # moved in 0.10
+    tempo = tempo_fn(onset_envelope=onset_env, sr=sr)
+    out["tempo"] = float(tempo[0]) if len(tempo)>0 else 0.0
+    return out
+
+def audio_features_from_bytes(byte_content, sr=AUDIO_SR):
+    """AUDIO_COLUMNS dict for one clip; all zeros if it is missing or cannot be decoded."""
+    if byte_content is None or _librosa() is None:
+        return {c:0.0 for c in AUDIO_COLUMNS}
     try:
-        import io
-        y, sr = librosa.load(io.BytesIO(byte_content), sr=sr, mono=True)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        for i, v in enumerate(mfcc.mean(axis=1)):
-            out[f"mfcc_mean_{i}"] = float(v)
-        out["zcr_mean"] = float(librosa.feature.zero_crossing_rate(y).mean())
-        out["rmse_mean"] = float(librosa.feature.rms(y).mean())
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-        tempo = librosa.beat.tempo(onset_envelope=onset_env, sr=sr)
-        out["tempo"] = float(tempo[0]) if len(tempo)>0 else 0.0
-        return out
+        return _decode_audio(byte_content, sr)
+    except Exception:
+        return {c:0.0 for c in AUDIO_COLUMNS}
+
+def _audio_vector(byte_content):
+    """
+    Float32 vector in AUDIO_COLUMNS order for one clip, or None if it cannot
+    be decoded (pool worker).
+    """
+    try:
+        feats = _decode_audio(byte_content)
     except Exception:
-        return {c:0.0 for c in audio_cols}
+        return None
+    return np.array([feats[c] for c in AUDIO_COLUMNS], dtype=np.float32)
 
-def build_feature_dataframe(df, tfidf_vect=None, fit_tfidf=False):
+def _audio_key(byte_content):
+    """
+    Cache key of a clip: its content hash plus everything the vector depends
+    on (feature code version, sample rate, MFCC count, librosa version).
+    """
+    params = f"audio-v{AUDIO_FEATURES_VERSION}/sr{AUDIO_SR}/mfcc{AUDIO_N_MFCC}/librosa{_librosa().__version__}"
+    return content_key(f"{params}/{content_key(bytes(byte_content))}")
+
+def _audio_cache():
+    global AUDIO_CACHE
+    if AUDIO_CACHE is None:
+        AUDIO_CACHE = VectorCache(AUDIO_CACHE_DIR, len(AUDIO_COLUMNS))
+    return AUDIO_CACHE
+
+def audio_features_batch(byte_list, workers=None, use_cache=True, verbose=False):
+    """
+    Audio features for many clips. Identical clips are decoded once, known
+    clips come from the content-hash cache, and the rest are decoded in a
+    process pool of `workers` processes (default AUDIO_WORKERS or CPU count).
+    Clips that fail to decode get zeros and are not cached, so they are
+    retried next time. Returns a DataFrame with AUDIO_COLUMNS, one row per input.
+    """
+    t0 = time.perf_counter()
+    clips = [b if isinstance(b, (bytes, bytearray)) else None for b in byte_list]
+    out = np.zeros((len(clips), len(AUDIO_COLUMNS)), dtype=np.float32)
+    present = [i for i, b in enumerate(clips) if b is not None]
+    decoded = failed = 0
+    if present and _librosa() is not None:
+        keys = [_audio_key(clips[i]) for i in present]
+        first = {}
+        for i, k in zip(present, keys):
+            first.setdefault(k, i)
+        vecs = _audio_cache().get_many(list(first)) if use_cache else {}
+        todo = [k for k in first if k not in vecs]
+        if todo:
+            payloads = [clips[first[k]] for k in todo]
+            workers = workers or AUDIO_WORKERS or os.cpu_count() or 1
+            if workers > 1 and len(payloads) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=min(workers, len(payloads))) as pool:
+                    results = list(pool.map(_audio_vector, payloads,
+                                            chunksize=max(1, len(payloads) // (4 * workers))))
+            else:
+                results = [_audio_vector(b) for b in payloads]
+            ok = [(k, v) for k, v in zip(todo, results) if v is not None]
+            vecs.update(ok)
+            decoded, failed = len(todo), len(todo) - len(ok)
+            if use_cache and ok:
+                _audio_cache().put_many([k for k, _ in ok], np.stack([v for _, v in ok]))
+        for i, k in zip(present, keys):
+            if k in vecs:       # failed decodes stay zero
+                out[i] = vecs[k]
+    if verbose:
+        dt = time.perf_counter() - t0
+        print(f"[audio] {len(present)} clips ({decoded} decoded, {failed} failed) in {dt:.2f}s "
+              f"- {len(present) / max(dt, 1e-9):.1f} clips/sec")
+    return pd.DataFrame(out.astype(np.float64), columns=AUDIO_COLUMNS)
+
+def _feature_blocks(df, tfidf_vect=None, fit_tfidf=False, audio_workers=None):
+    """Behaviour / TF-IDF (CSR) / embedding / audio blocks for build_feature_*."""
     df = _flatten_rts(df).reset_index(drop=True)
     texts = df['text_response'].fillna("").astype(str).tolist()
     if tfidf_vect is None and fit_tfidf:
-        tfidf_df, vect = tfidf_fit_transform(texts)
+        X_tfidf, vect = tfidf_fit_transform(texts, sparse=True)
     elif tfidf_vect is not None:
-        tfidf_df = tfidf_transform(texts, tfidf_vect); vect = tfidf_vect
+        X_tfidf = tfidf_transform(texts, tfidf_vect, sparse=True); vect = tfidf_vect
     else:
-        tfidf_df, vect = tfidf_fit_transform(texts)
+        X_tfidf, vect = tfidf_fit_transform(texts, sparse=True)
     emb_df = embed_texts(texts)
-    behavior = df[["rt_mean","rt_std","rt_min","rt_max","age"]].reset_index(drop=True)
-    audio_cols = [f"mfcc_mean_{i}" for i in range(13)] + ["zcr_mean","rmse_mean","tempo"]
-    audio_list = []
-    for idx, row in df.iterrows():
-        audio_bytes = row.get("audio_bytes", None)
-        feats = audio_features_from_bytes(audio_bytes)
-        audio_list.append(feats)
-    audio_df = pd.DataFrame(audio_list)
+    behavior = df[BEHAVIOR_COLUMNS].reset_index(drop=True)
+    clips = df["audio_bytes"].tolist() if "audio_bytes" in df.columns else [None] * len(df)
+    audio_df = audio_features_batch(clips, workers=audio_workers)
+    return behavior, X_tfidf, emb_df, audio_df, vect
+
+def build_feature_matrix(df, tfidf_vect=None, fit_tfidf=False, dtype=np.float64, audio_workers=None):
+    """
+    Sparse-native variant of build_feature_dataframe.
+    Returns (X, columns, vect) where X is a CSR matrix: TF-IDF stays sparse
+    and the dense behaviour / embedding / audio blocks are stacked beside it.
+    """
+    import scipy.sparse as sp
+    behavior, X_tfidf, emb_df, audio_df, vect = _feature_blocks(df, tfidf_vect, fit_tfidf, audio_workers)
+    blocks = [
+        sp.csr_matrix(behavior.fillna(0).to_numpy(dtype)),
+        X_tfidf.astype(dtype),
+        sp.csr_matrix(emb_df.fillna(0).to_numpy(dtype)),
+        sp.csr_matrix(audio_df.fillna(0).to_numpy(dtype)),
+    ]
+    X = sp.hstack(blocks, format="csr", dtype=dtype)
+    columns = (list(behavior.columns) + _tfidf_columns(X_tfidf.shape[1])
+               + list(emb_df.columns) + list(audio_df.columns))
+    return X, columns, vect
+
+def make_text_vectorizer(kind="hashing", sample_texts=None, max_features=TFIDF_MAX):
+    """
+    Text vectoriser for streaming feature builds.
+    "hashing": stateless HashingVectorizer with max_features columns.
+    "tfidf":   TfidfVectorizer fitted on `sample_texts` only.
+    """
+    if kind == "hashing":
+        from sklearn.feature_extraction.text import HashingVectorizer
+        return HashingVectorizer(n_features=max_features, stop_words='english',
+                                 alternate_sign=False, norm='l2')
+    if kind == "tfidf":
+        if sample_texts is None:
+            raise ValueError("a TF-IDF vectoriser needs sample_texts to fit on")
+        return tfidf_fit_transform(list(sample_texts), max_features=max_features, sparse=True)[1]
+    raise ValueError(f"unknown vectoriser kind: {kind!r}")
+
+def iter_feature_blocks(frames, text_vect, dtype=np.float32, audio_workers=None):
+    """
+    Chunked build_feature_dataframe: for each input DataFrame in `frames`
+    yields (X_block, columns, frame) where X_block is a dense C-ordered
+    array. `text_vect` must already be fitted (or stateless), so every block
+    has the same columns.
+    """
+    for frame in frames:
+        X, columns, _ = build_feature_matrix(frame, tfidf_vect=text_vect, dtype=dtype,
+                                             audio_workers=audio_workers)
+        yield np.ascontiguousarray(X.toarray()), columns, frame
+
+def build_feature_dataframe(df, tfidf_vect=None, fit_tfidf=False, audio_workers=None):
+    behavior, X_tfidf, emb_df, audio_df, vect = _feature_blocks(df, tfidf_vect, fit_tfidf, audio_workers)
+    tfidf_df = pd.DataFrame(X_tfidf.toarray(), columns=_tfidf_columns(X_tfidf.shape[1]))
     feat = pd.concat([behavior.reset_index(drop=True), tfidf_df.reset_index(drop=True),
                       emb_df.reset_index(drop=True), audio_df.reset_index(drop=True)], axis=1)
     feat.fillna(0, inplace=True)
@@ -98,3 +357,80 @@ def extract_features(text):
         "avg_word_length": sum(len(w) for w in text.split()) / (len(text.split()) or 1)
     }
     return features
+
+# Column order of extract_features / extract_features_batch
+FEATURE_COLUMNS = ["length", "num_words", "avg_word_length"]
+BATCH_CHUNK = 16_384   # texts per pass; keeps the per-character arrays cache-sized
+
+# str.split() separators: every whitespace code point is <= U+3000
+_WS_MAX = 0x3000
+_WS_TABLE = np.array([chr(i).isspace() for i in range(_WS_MAX + 1)], dtype=bool)
+
+def _segment_sums(values, starts, ends):
+    """Per-text sums of a per-character array via one running total."""
+    cs = np.empty(len(values) + 1, dtype=np.uint32)
+    cs[0] = 0
+    np.cumsum(values, dtype=np.uint32, out=cs[1:])
+    return cs[ends] - cs[starts]   # exact modulo 2**32
+
+def _text_stats(texts):
+    """length / num_words / avg_word_length for a list of str, via one code-point array."""
+    try:
+        joined = "".join(texts)
+    except TypeError:
+        # missing values count as empty strings
+        texts = [t if isinstance(t, str) else ("" if t is None or t != t else str(t)) for t in texts]
+        joined = "".join(texts)
+    n = len(texts)
+    out = np.zeros((n, 3), dtype=np.float32)
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+    if not joined:
+        return out
+    if joined.isascii():
+        codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+        nonspace = codes > 32
+        ctrl = np.flatnonzero(codes < 28)    # rare: control chars, only \t-\r are spaces
+        if len(ctrl):
+            nonspace[ctrl] = ~_WS_TABLE[codes[ctrl]]
+    else:
+        codes = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        nonspace = ~(_WS_TABLE[np.minimum(codes, _WS_MAX)] & (codes <= _WS_MAX))
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    ends = starts + lengths
+    nonempty = lengths > 0
+
+    # a word starts at a non-space char preceded by a space or a text boundary
+    word_start = np.empty_like(nonspace)
+    word_start[0] = nonspace[0]
+    np.greater(nonspace[1:], nonspace[:-1], out=word_start[1:])
+    word_start[starts[nonempty]] = nonspace[starts[nonempty]]
+
+    if lengths.max() < 2**16:
+        # both counts fit in 16 bits: pack them and take a single running sum
+        packed = word_start.astype(np.uint32)
+        packed <<= 16
+        packed += nonspace
+        sums = _segment_sums(packed, starts, ends)
+        num_words, word_chars = sums >> 16, sums & 0xFFFF
+    else:
+        num_words = _segment_sums(word_start, starts, ends)
+        word_chars = _segment_sums(nonspace, starts, ends)
+
+    out[:, 0] = lengths
+    out[:, 1] = num_words
+    out[:, 2] = word_chars / np.maximum(num_words, 1)
+    return out
+
+def extract_features_batch(texts, chunk_size=BATCH_CHUNK):
+    """
+    Vectorised extract_features over a whole corpus.
+    Returns a C-contiguous float32 array of shape (n, 3) in FEATURE_COLUMNS
+    order; values equal extract_features(text) cast to float32.
+    Missing values are treated as empty strings.
+    """
+    texts = texts.tolist() if hasattr(texts, "tolist") else list(texts)
+    if len(texts) <= chunk_size:
+        return _text_stats(texts)
+    return np.concatenate([_text_stats(texts[i:i + chunk_size])
+                           for i in range(0, len(texts), chunk_size)])
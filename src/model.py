@@ -1,16 +1,25 @@
 # src/model.py
 
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import joblib
 import numpy as np
 
+DEFAULT_BUNDLE = "models/final_model"     # artifact directory, see src/artifact.py
+REGISTRY_SIZE = 4
+
 # ---------------------------------------------------
 # SAFE MODEL LOADER
 # ---------------------------------------------------
 
-def load_bundle(path="models/final_model.pkl"):
+def load_bundle(path=DEFAULT_BUNDLE, mmap=True):
     """
     Loads the trained ensemble model safely.
+    Reads artifact directories (src/artifact.py; arrays memory-mapped unless
+    mmap=False) and, for older bundles, joblib pickles.
     Returns None if file missing.
     """
     p = Path(path)
@@ -19,6 +28,13 @@ def load_bundle(path="models/final_model.pkl"):
         return None
 
     try:
+        from src.artifact import is_artifact, load_artifact
+        if is_artifact(p):
+            return load_artifact(str(p), mmap=mmap)
+        if p.is_dir():
+            print(f"[ERROR] {path} is not a model artifact (no manifest.json)")
+            return None
+        import joblib
         bundle = joblib.load(path)
         return bundle
     except Exception as e:
@@ -26,23 +42,203 @@ def load_bundle(path="models/final_model.pkl"):
         return None
 
 
+# ---------------------------------------------------
+# IN-PROCESS MODEL REGISTRY
+# ---------------------------------------------------
+
+_REGISTRY = OrderedDict()   # resolved path -> (signature, bundle)
+_REGISTRY_LOCK = threading.RLock()
+
+
+def _signature(p):
+    """Cheap change detector for a model file or artifact: (mtime_ns, size)."""
+    st = os.stat(p / "manifest.json" if p.is_dir() else p)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_bundle(path=DEFAULT_BUNDLE, reload_on_change=True):
+    """
+    Returns the bundle for `path` from the shared registry, loading it
+    once per process. The file is re-read only when its mtime/size change.
+    Least-recently-used bundles are evicted beyond REGISTRY_SIZE.
+    Returns None if the file is missing or fails to load.
+    """
+    p = Path(path).resolve()
+    key = str(p)
+    try:
+        sig = _signature(p)
+    except OSError:
+        sig = None
+
+    with _REGISTRY_LOCK:
+        entry = _REGISTRY.get(key)
+        if entry is not None and (not reload_on_change or entry[0] == sig):
+            _REGISTRY.move_to_end(key)
+            return entry[1]
+
+        bundle = load_bundle(p)
+        if bundle is None:
+            _REGISTRY.pop(key, None)
+            return None
+        _REGISTRY[key] = (sig, bundle)
+        _REGISTRY.move_to_end(key)
+        while len(_REGISTRY) > REGISTRY_SIZE:
+            _REGISTRY.popitem(last=False)
+        return bundle
+
+
+def warm_up(*paths):
+    """Loads the given bundles (default: the production bundle) ahead of the first request."""
+    return {str(p): get_bundle(p) is not None for p in (paths or (DEFAULT_BUNDLE,))}
+
+
+def clear_registry():
+    with _REGISTRY_LOCK:
+        _REGISTRY.clear()
+
+
 # ---------------------------------------------------
 # ENSEMBLE PREDICTOR
 # ---------------------------------------------------
 
-def predict_ensemble(X, bundle_path="models/final_model.pkl"):
+MEMBERS = ("logistic", "rf", "mlp", "lgbm")
+EXPENSIVE_MEMBERS = ("rf", "mlp")     # skipped by the cascade when logistic is confident
+RISK_THRESHOLDS = (0.33, 0.66)        # Low / Moderate / High cut points used by the UI
+CASCADE_MARGIN = 0.15
+MODES = ("sequential", "parallel", "cascade", "compiled")
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=len(MEMBERS),
+                                           thread_name_prefix="ensemble")
+        return _EXECUTOR
+
+
+def feature_columns(bundle):
+    """Input columns the bundle was fitted on."""
+    for name in ("logistic", "rf", "mlp"):
+        names = getattr(bundle.get(name), "feature_names_in_", None)
+        if names is not None:
+            return [str(c) for c in names]
+    if bundle.get("feature_columns"):
+        return list(bundle["feature_columns"])
+    from src.features import FEATURE_COLUMNS
+    return list(FEATURE_COLUMNS)
+
+
+def _rows(X, mask):
+    return X[mask] if not hasattr(X, "iloc") else X.iloc[np.flatnonzero(mask)]
+
+
+def ensemble_weights(bundle):
+    """
+    Member -> combination weight. Bundles with a learned stacker
+    (bundle["stacker"], src/stacking.py) use its weights and run only the
+    members it kept; others average the MEMBERS they hold equally.
+    """
+    stacker = bundle.get("stacker")
+    if stacker:
+        return {n: float(w) for n, w in zip(stacker["members"], stacker["weights"]) if n in bundle}
+    present = [n for n in MEMBERS if n in bundle]
+    return {n: 1.0 / len(present) for n in present}
+
+
+def member_proba(model, X):
+    """Positive-class probability of a fitted member (classifier or raw LightGBM Booster)."""
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(X)[:, 1]
+    return np.asarray(model.predict(X), dtype=float)
+
+
+def _member_predict(bundle, name, X):
+    """Positive-class output of one member; None when the member is missing or fails."""
+    model = bundle.get(name)
+    if model is None:
+        return None
+    try:
+        return member_proba(model, X)
+    except Exception as e:
+        print(f"[WARN] ensemble member {name} failed: {e}")
+        return None
+
+
+def _combine(parts, n):
+    """
+    Weighted mean of (weight, output, rows) member outputs, rows=None for
+    every row. Members without output drop out and the remaining weights
+    are renormalised, row by row.
+    """
+    total, wsum = np.zeros(n), np.zeros(n)
+    for w, out, rows in parts:
+        if out is None:
+            continue
+        sel = slice(None) if rows is None else rows
+        total[sel] += w * out
+        wsum[sel] += w
+    if not wsum.all():
+        raise RuntimeError("no ensemble member produced a score")
+    return total / wsum
+
+
+def _timed_member(bundle, name, X):
+    t0 = time.perf_counter()
+    out = _member_predict(bundle, name, X)
+    return out, time.perf_counter() - t0
+
+
+def _run_members(bundle, names, X, parallel):
+    if parallel and len(names) > 1:
+        futures = {n: _executor().submit(_timed_member, bundle, n, X) for n in names}
+        return {n: f.result() for n, f in futures.items()}
+    return {n: _timed_member(bundle, n, X) for n in names}
+
+
+def predict_ensemble(X, bundle_path=DEFAULT_BUNDLE, mode="sequential",
+                     cascade_margin=CASCADE_MARGIN, return_timings=False, bundle=None):
     """
     Takes a feature DataFrame (X) and returns an ensemble probability score.
-    Internally loads the model bundle.
+    The bundle comes from the in-process registry (loaded once per process)
+    unless an already-loaded `bundle` is passed.
 
     Models expected in bundle:
     - logistic
     - rf
     - mlp
     - lgbm (optional)
+    - stacker (optional): learned member weights, see src/stacking.py.
+      Without it the members are averaged equally. Members the stacker
+      pruned are not run; a member that fails is left out and the others
+      are reweighted.
+
+    mode:
+    - "sequential": members one after another (default)
+    - "parallel":   members run concurrently in a shared thread pool
+    - "cascade":    logistic + lgbm score every row; rf/mlp only score rows
+                    whose logistic probability lies within `cascade_margin`
+                    of a risk threshold. Confident rows combine the
+                    probabilities of the members that ran, so their score
+                    approximates the sequential one (it keeps the same
+                    risk band on the training data); cascade_margin >= 1
+                    gives exactly the sequential scores.
+    - "compiled":   all members in one NumPy-only pass (src.compiled); same
+                    scores as "sequential", timed as a whole
+
+    With return_timings=True returns (scores, timings) where timings maps
+    each member to its wall time in seconds, plus "total" and, for the
+    cascade, "skipped_rows".
     """
 
-    bundle = load_bundle(bundle_path)
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+
+    if bundle is None:
+        bundle = get_bundle(bundle_path)
 
     if bundle is None:
         raise FileNotFoundError("Model bundle could not be loaded. Check model path.")
@@ -51,37 +247,51 @@ def predict_ensemble(X, bundle_path="models/final_model.pkl"):
     if not hasattr(X, "shape"):
         raise ValueError("X must be a DataFrame or 2D array of features.")
 
-    # Collect model outputs
-    preds = []
+    t0 = time.perf_counter()
+    weights = ensemble_weights(bundle)
 
-    # Logistic Regression Probability
-    if "logistic" in bundle:
-        preds.append(bundle["logistic"].predict_proba(X)[:, 1])
+    if mode == "compiled":
+        from src.compiled import compiled_for
+        final_prediction = compiled_for(bundle).predict(X)
+        timings = {"compiled": time.perf_counter() - t0}
+    elif mode != "cascade":
+        results = _run_members(bundle, list(weights), X, parallel=(mode == "parallel"))
+        # Final weighted ensemble
+        final_prediction = _combine([(w, results[n][0], None) for n, w in weights.items()], len(X))
+        timings = {n: results[n][1] for n in weights}
     else:
-        preds.append(np.zeros(len(X)))
+        final_prediction, timings = _predict_cascade(bundle, X, cascade_margin, weights)
 
-    # Random Forest Probability
-    if "rf" in bundle:
-        preds.append(bundle["rf"].predict_proba(X)[:, 1])
-    else:
-        preds.append(np.zeros(len(X)))
+    timings["total"] = time.perf_counter() - t0
+    if return_timings:
+        return final_prediction, timings
+    return final_prediction
 
-    # MLP Probability
-    if "mlp" in bundle:
-        preds.append(bundle["mlp"].predict_proba(X)[:, 1])
-    else:
-        preds.append(np.zeros(len(X)))
-
-    # LightGBM Prediction
-    if "lgbm" in bundle:
-        try:
-            preds.append(bundle["lgbm"].predict(X))
-        except Exception:
-            preds.append(np.zeros(len(X)))
+
+def _predict_cascade(bundle, X, margin, weights):
+    cheap = [n for n in weights if n not in EXPENSIVE_MEMBERS]
+    expensive = [n for n in weights if n in EXPENSIVE_MEMBERS]
+    results = _run_members(bundle, cheap, X, parallel=False)
+    timings = {n: results[n][1] for n in cheap}
+
+    p_log = results["logistic"][0] if "logistic" in results else None
+    if p_log is None:
+        uncertain = np.ones(len(X), dtype=bool)
     else:
-        preds.append(np.zeros(len(X)))
+        dist = np.min(np.abs(p_log[:, None] - np.asarray(RISK_THRESHOLDS)[None, :]), axis=1)
+        uncertain = dist <= margin
 
-    # Final average ensemble
-    final_prediction = np.mean(preds, axis=0)
+    parts = [(weights[n], results[n][0], None) for n in cheap]
+    if uncertain.any() and expensive:
+        rows = None if uncertain.all() else uncertain
+        X_unc = X if rows is None else _rows(X, uncertain)
+        scored = _run_members(bundle, expensive, X_unc, parallel=True)
+        for n in expensive:
+            parts.append((weights[n], scored[n][0], rows))
+            timings[n] = scored[n][1]
+    else:
+        for n in expensive:
+            timings[n] = 0.0
 
-    return final_prediction
+    timings["skipped_rows"] = int((~uncertain).sum())
+    return _combine(parts, len(X)), timings
@@ -0,0 +1,151 @@
+# src/perf.py
+"""Small helpers for reporting throughput and memory in scripts and benchmarks."""
+import os
+import sys
+import threading
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the current process in MB.
+    Returns None where it cannot be measured.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def current_rss_mb():
+    """Resident set size of the current process in MB (None if unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class track_peak_rss:
+    """
+    Context manager sampling this process's RSS every `interval` seconds:
+
+        with track_peak_rss() as mem:
+            model.fit(X, y)
+        mem.peak_mb, mem.start_mb
+
+    Unlike peak_rss_mb() (lifetime high-water mark) this measures one block,
+    even in a reused worker process.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_mb = self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None:
+                self.peak_mb = max(self.peak_mb or 0.0, rss)
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = current_rss_mb()
+        if self.start_mb is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            rss = current_rss_mb()
+            self.peak_mb = max(self.peak_mb, rss if rss is not None else 0.0)
+        return False
+
+
+# ---------------------------------------------------
+# IMPORT-TIME PROFILING
+# ---------------------------------------------------
+
+# Modules that must not be loaded just by importing a page-facing module
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "librosa",
+                 "sklearn", "scipy", "lightgbm", "shap", "matplotlib")
+
+# Cold-import budgets of page-facing modules, as multiples of a bare
+# `import pandas` timed in the same run (absolute milliseconds vary too much
+# between machines and under load to assert on). numpy + pandas are the
+# floor (~1x); the headroom covers run-to-run noise, while an eager sklearn
+# or torch import still lands far above it. Enforced by
+# tests/test_import_time.py and `benchmarks.py import-time --check`.
+IMPORT_BASELINE = "pandas"
+IMPORT_BUDGETS = {
+    "src.features": 2.0,
+    "src.model": 1.0,
+    "src.explainability": 2.0,
+    "src.storage": 2.0,
+    "report": 2.5,
+}
+IMPORT_REPEAT = 3     # best of N cold imports, for both module and baseline
+
+
+def import_profile(module):
+    """
+    Imports `module` in a fresh interpreter under `python -X importtime`.
+    Returns (total_ms, {imported module: cumulative_ms}).
+    """
+    import subprocess
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1] if proc.stderr else module)
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum) / 1000.0
+    return cumulative.get(module, 0.0), cumulative
+
+
+def import_baseline(repeat=IMPORT_REPEAT):
+    """Best-of-`repeat` cold import time (ms) of IMPORT_BASELINE."""
+    return min(import_profile(IMPORT_BASELINE)[0] for _ in range(repeat))
+
+
+def eager_heavy_imports(module, heavy=HEAVY_MODULES):
+    """Heavy modules loaded just by importing `module`."""
+    _, cumulative = import_profile(module)
+    return [name for name in heavy if name in cumulative]
+
+
+def check_import_budget(module, budget, baseline_ms, heavy=HEAVY_MODULES,
+                        repeat=IMPORT_REPEAT):
+    """
+    Returns (total_ms, problems): heavy modules pulled in eagerly, or a
+    best-of-`repeat` cold import slower than `budget` * `baseline_ms`.
+    No problems means within budget.
+    """
+    runs = [import_profile(module) for _ in range(repeat)]
+    total = min(t for t, _ in runs)
+    problems = [f"{module} imports {name} eagerly"
+                for name in heavy if any(name in cumulative for _, cumulative in runs)]
+    if total > budget * baseline_ms:
+        problems.append(f"{module} took {total:.0f} ms to import "
+                        f"(budget {budget:g} x {baseline_ms:.0f} ms for {IMPORT_BASELINE})")
+    return total, problems
@@ -0,0 +1,288 @@
+# src/population.py
+"""
+Pre-aggregated statistics for the population comparison dataset.
+
+    data/random_assessment_data.csv            reference rows (can be millions)
+    data/random_assessment_data.summary.json   per assessment_type:
+                                                n, sum, sum of squares, min, max,
+                                                a unit-width score histogram and
+                                                a KLL quantile sketch; per
+                                                instrument column (phq9, gad7, ...)
+                                                present in the CSV: a KLL sketch
+
+The summary records how many bytes of the CSV it has folded in (always up
+to a complete line; an unterminated last line waits for its newline) and
+the file size, inode, and hashes of the first bytes and of the bytes just
+before that offset. When the CSV only grew (rows appended to the same
+file), refresh reads just the new tail; when it was rewritten
+(regenerated, replaced) the summary is rebuilt in chunks. Pages call
+population_summary(), which costs one os.stat when nothing changed.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import numpy as np
+
+from src.sketches import KLLSketch
+
+POPULATION_CSV = "data/random_assessment_data.csv"
+SUMMARY_SUFFIX = ".summary.json"
+SUMMARY_VERSION = 3
+
+# Screening instruments (display name -> assessment store column)
+INSTRUMENTS = {
+    "PHQ-9": "phq9",
+    "GAD-7": "gad7",
+    "MDQ": "mdq_symptoms",
+    "PQ-B": "pqb",
+    "Memory": "mem_score",
+    "Fluency": "vf_score",
+    "Clock": "clock_score",
+    "Taps": "taps",
+}
+
+# Scores are small non-negative integers; one bin per value, clamped into
+# [HIST_MIN, HIST_MAX], makes the histogram an exact quantile table.
+HIST_MIN = 0
+HIST_MAX = 100
+READ_BLOCK = 16 << 20       # bytes of CSV parsed per chunk
+CHECK_BYTES = 4096          # bytes hashed at the start and before the offset
+
+_CACHE = {}                 # csv path -> (stat signature, summary)
+
+
+def summary_path(csv_path=POPULATION_CSV):
+    return os.path.splitext(csv_path)[0] + SUMMARY_SUFFIX
+
+
+def _hash_range(f, start, end):
+    f.seek(start)
+    return hashlib.sha1(f.read(max(end - start, 0))).hexdigest()
+
+
+def _fingerprint(f, st, offset):
+    """What must still match for the first `offset` bytes to count as already folded."""
+    return {"inode": [st.st_dev, st.st_ino],
+            "head": _hash_range(f, 0, min(offset, CHECK_BYTES)),
+            "tail": _hash_range(f, max(offset - CHECK_BYTES, 0), offset)}
+
+
+def _empty_stats():
+    return {"n": 0, "sum": 0.0, "sum_sq": 0.0, "min": None, "max": None,
+            "hist": [0] * (HIST_MAX - HIST_MIN + 1), "sketch": KLLSketch().to_dict()}
+
+
+def _fold_sketch(entry, values):
+    entry["sketch"] = KLLSketch.from_dict(entry["sketch"]).update(values).to_dict()
+
+
+def _fold(summary, chunk):
+    """Adds one DataFrame chunk into the per-type and per-instrument entries."""
+    for column, entry in summary["instruments"].items():
+        _fold_sketch(entry, _numeric(chunk[column]))
+    types = summary["types"]
+    chunk = chunk.dropna(subset=["assessment_type", "score"])
+    scores = chunk["score"].astype(float).to_numpy()
+    for kind, idx in chunk.groupby("assessment_type", sort=False).indices.items():
+        x = scores[idx]
+        s = types.setdefault(str(kind), _empty_stats())
+        s["n"] += int(x.size)
+        s["sum"] += float(x.sum())
+        s["sum_sq"] += float(np.dot(x, x))
+        s["min"] = float(x.min()) if s["min"] is None else min(s["min"], float(x.min()))
+        s["max"] = float(x.max()) if s["max"] is None else max(s["max"], float(x.max()))
+        bins = np.clip(np.rint(x), HIST_MIN, HIST_MAX).astype(np.int64) - HIST_MIN
+        counts = np.bincount(bins, minlength=len(s["hist"]))
+        s["hist"] = (np.asarray(s["hist"], dtype=np.int64) + counts).tolist()
+        _fold_sketch(s, x)
+
+
+def _numeric(series):
+    import pandas as pd
+    return pd.to_numeric(series, errors="coerce").to_numpy(np.float64)
+
+
+def _read_from(f, offset, columns, summary):
+    """Folds complete lines from byte `offset` to EOF; returns the new offset."""
+    import pandas as pd
+
+    f.seek(offset)
+    carry = b""
+    while True:
+        block = f.read(READ_BLOCK)
+        if not block:
+            break
+        block = carry + block
+        cut = block.rfind(b"\n") + 1
+        carry = block[cut:]
+        if cut:
+            _fold(summary, pd.read_csv(io.BytesIO(block[:cut]), header=None, names=columns))
+            offset += cut
+    return offset
+
+
+def refresh_population_summary(csv_path=POPULATION_CSV, verbose=False):
+    """
+    Brings the summary next to `csv_path` up to date and returns it.
+    Appended rows are folded in incrementally; anything else rebuilds.
+    """
+    if not os.path.exists(csv_path):
+        return None
+    out_path = summary_path(csv_path)
+    old = None
+    if os.path.exists(out_path):
+        with open(out_path) as fh:
+            old = json.load(fh)
+
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        columns = header.decode().strip().split(",")
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        # appending grows the same file and leaves the folded bytes as they were;
+        # a rewrite of the same size is a rebuild
+        reuse = (old is not None and old.get("version") == SUMMARY_VERSION
+                 and old.get("columns") == columns
+                 and (old["size"] < size or old.get("mtime_ns") == st.st_mtime_ns)
+                 and old["bytes"] <= old["size"] <= size
+                 and old.get("check") == _fingerprint(f, st, old["bytes"]))
+        if reuse:
+            summary, start = old, old["bytes"]
+        else:
+            summary = {"version": SUMMARY_VERSION, "columns": columns, "types": {},
+                       "instruments": {c: {"sketch": KLLSketch().to_dict()}
+                                       for c in INSTRUMENTS.values() if c in columns}}
+            start = len(header)
+        if "assessment_type" not in columns or "score" not in columns:
+            raise ValueError(f"{csv_path}: needs assessment_type and score columns")
+        summary["bytes"] = _read_from(f, start, columns, summary)
+        summary["size"] = size
+        summary["check"] = _fingerprint(f, st, summary["bytes"])
+        summary["mtime_ns"] = st.st_mtime_ns
+
+    if verbose:
+        action = "updated" if reuse else "rebuilt"
+        print(f"[population] {action} {out_path} ({summary['bytes'] - start:,} new bytes)")
+    tmp = out_path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(summary, fh)
+    os.replace(tmp, out_path)
+    _CACHE.pop(csv_path, None)
+    return summary
+
+
+def population_summary(csv_path=POPULATION_CSV):
+    """The current summary; refreshes it only when the CSV changed since last read."""
+    try:
+        st = os.stat(csv_path)
+    except FileNotFoundError:
+        return None
+    sig = (st.st_size, st.st_mtime_ns)
+    cached = _CACHE.get(csv_path)
+    if cached and cached[0] == sig:
+        return cached[1]
+    summary = None
+    out_path = summary_path(csv_path)
+    if os.path.exists(out_path):
+        with open(out_path) as fh:
+            summary = json.load(fh)
+        if (summary.get("size"), summary.get("mtime_ns"), summary.get("version")) != \
+                (st.st_size, st.st_mtime_ns, SUMMARY_VERSION):
+            summary = None
+    if summary is None:
+        summary = refresh_population_summary(csv_path)
+    _CACHE[csv_path] = (sig, summary)
+    return summary
+
+
+def instrument_sketch(metric, summary=None):
+    """
+    Population sketch for an instrument column: from the reference CSV
+    when it carries that column, else from every screening saved in the
+    assessment store. Returns (KLLSketch, source) or (None, None).
+    """
+    entry = (summary or {}).get("instruments", {}).get(metric)
+    if entry and entry["sketch"]["n"]:
+        return KLLSketch.from_dict(entry["sketch"]), "reference"
+    from src.storage import SCREENING_KIND, metric_sketch
+    sketch = metric_sketch(SCREENING_KIND, metric)
+    if sketch is not None and sketch.n:
+        return sketch, "saved screenings"
+    return None, None
+
+
+def instrument_percentiles(record, summary=None):
+    """[{instrument, score, percentile, n, reference}] for the instruments in `record`."""
+    rows = []
+    for name, metric in INSTRUMENTS.items():
+        value = record.get(metric)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if math.isnan(value):
+            continue
+        sketch, source = instrument_sketch(metric, summary)
+        if sketch is None:
+            continue
+        rows.append({"instrument": name, "score": value,
+                     "percentile": 100.0 * sketch.rank(value), "n": sketch.n,
+                     "reference": source})
+    return rows
+
+
+# ---------------------------------------------------
+# QUERIES (constant time per assessment type)
+# ---------------------------------------------------
+
+def type_stats(summary):
+    """[{assessment_type, n, mean, std, min, max}] for the bar charts."""
+    rows = []
+    for kind, s in sorted((summary or {}).get("types", {}).items()):
+        n = s["n"]
+        mean = s["sum"] / n if n else float("nan")
+        var = (s["sum_sq"] - n * mean * mean) / (n - 1) if n > 1 else float("nan")
+        rows.append({"assessment_type": kind, "n": n, "mean": mean,
+                     "std": max(var, 0.0) ** 0.5, "min": s["min"], "max": s["max"]})
+    return rows
+
+
+def population_mean(summary, assessment_type):
+    s = (summary or {}).get("types", {}).get(assessment_type)
+    return s["sum"] / s["n"] if s and s["n"] else float("nan")
+
+
+def percentile_rank(summary, assessment_type, score):
+    """
+    Share of the population (0-100) scoring below `score`, counting ties
+    as half, from the type's quantile sketch. NaN when the type is unknown.
+    """
+    s = (summary or {}).get("types", {}).get(assessment_type)
+    if not s or not s["n"]:
+        return float("nan")
+    return 100.0 * KLLSketch.from_dict(s["sketch"]).rank(float(score))
+
+
+def population_quantile(summary, assessment_type, q):
+    """Score at quantile q (0-1) from the type's sketch."""
+    s = (summary or {}).get("types", {}).get(assessment_type)
+    if not s or not s["n"]:
+        return float("nan")
+    return KLLSketch.from_dict(s["sketch"]).quantile(q)
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Refresh the population summary.")
+    ap.add_argument("csv", nargs="?", default=POPULATION_CSV)
+    args = ap.parse_args(argv)
+    summary = refresh_population_summary(args.csv, verbose=True)
+    for row in type_stats(summary):
+        print(f"  {row['assessment_type']:>12}: n={row['n']:,} mean={row['mean']:.2f} "
+              f"std={row['std']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
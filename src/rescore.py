@@ -0,0 +1,205 @@
+# src/rescore.py
+"""
+Bulk re-scoring of stored screening assessments under the current rules.
+
+    python -m src.rescore --workers 4                      # data/assessments.db
+    python -m src.rescore --csv old.csv --out rescored.csv # a CSV export
+
+Every screening row gets summary_v<N> (N = src.scoring.RULES_VERSION)
+next to the summary stored when it was taken, recomputed by score_frame
+from the stored totals. The original "summary" is never modified.
+
+The history is cut into chunks (rowid ranges of the store, row blocks of
+a CSV). Worker processes score the chunks; the parent writes them back in
+order and advances a checkpoint with each one:
+
+    store  _meta["rescore:summary_v<N>"] = last rowid done, committed in
+           the same transaction as the chunk's rows
+    CSV    <out>.checkpoint = {"column", "rows", "bytes"} of the output
+           written; a resume truncates <out> to "bytes" and skips "rows"
+
+Stored rows keep the MDQ symptom count and the positive flag, but not the
+impairment answer, so bipolar_flag is recomputed as far as it can be:
+
+    stored positive                     impairment was Yes -> positive iff
+                                        symptoms >= MDQ_MIN_SYMPTOMS now
+    stored negative, symptoms >= the    impairment was No -> negative
+      threshold it was saved under
+    stored negative, fewer symptoms     impairment unknown -> kept negative
+
+The last case only matters if MDQ_MIN_SYMPTOMS is lowered: such rows may
+be positive under the new rule, and only re-taking the MDQ can tell.
+
+An interrupted run resumes after its checkpoint (--restart starts over).
+Rows saved by the app after a rules change already carry summary_v<N>;
+a later run also picks up anything appended since the last one.
+"""
+import json
+import os
+import time
+from collections import deque
+
+from src.scoring import RULES_VERSION, score_frame, summary_column
+from src.storage import DB_FILE, SCREENING_KIND, get_meta, max_rowid, read_rows, write_column
+
+CHUNK_ROWS = 50_000
+# stored columns the rules read (score_frame's "totals" inputs)
+SCORE_COLUMNS = ["phq9", "phq9_item9", "gad7", "mdq_symptoms", "mdq_positive", "pqb",
+                 "mem_score", "vf_score", "clock_score", "taps"]
+
+
+def _score_chunk(df):
+    return score_frame(df, labels=False)["summary"].astype(str).to_numpy()
+
+
+def _ordered(pool, fn, jobs, workers):
+    """Results of fn over jobs, in order, with at most 2 * workers chunks in flight."""
+    if pool is None:
+        for job in jobs:
+            yield job, fn(job)
+        return
+    pending = deque()
+    for job in jobs:
+        pending.append((job, pool.submit(fn, job)))
+        if len(pending) >= 2 * workers:
+            job, fut = pending.popleft()
+            yield job, fut.result()
+    while pending:
+        job, fut = pending.popleft()
+        yield job, fut.result()
+
+
+def _pool(workers):
+    if workers <= 1:
+        return None
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+# ---------------------------------------------------
+# ASSESSMENT STORE
+# ---------------------------------------------------
+
+def checkpoint_key(version=RULES_VERSION):
+    return f"rescore:{summary_column(version)}"
+
+
+def _score_range(job):
+    """Worker: (lo, hi, db_path) -> (rowids, summaries) for the screening rows in the range."""
+    lo, hi, db_path = job
+    df = read_rows(lo, hi, SCORE_COLUMNS, kind=SCREENING_KIND, db_path=db_path)
+    return df["_rowid"].to_numpy(), _score_chunk(df)
+
+
+def rescore_store(db_path=DB_FILE, workers=None, chunk_rows=CHUNK_ROWS, restart=False,
+                  verbose=True):
+    """
+    Writes summary_v<RULES_VERSION> for every screening row of the store.
+    Returns the number of rows re-scored by this call.
+    """
+    column, key = summary_column(), checkpoint_key()
+    start = 0 if restart else int(get_meta(key, db_path) or 0)
+    end = max_rowid(db_path)
+    ranges = [(lo, min(lo + chunk_rows, end), db_path) for lo in range(start, end, chunk_rows)]
+    if verbose:
+        resumed = f", resuming after rowid {start:,}" if start else ""
+        print(f"[rescore] {column}: rowids {start:,}..{end:,} in {len(ranges)} chunks{resumed}")
+    workers = min(workers or os.cpu_count() or 1, max(len(ranges), 1))
+    t0, done = time.perf_counter(), 0
+    pool = _pool(workers)
+    try:
+        for (lo, hi, _), (rowids, summaries) in _ordered(pool, _score_range, ranges, workers):
+            write_column(column, rowids, summaries, checkpoint=(key, hi), db_path=db_path)
+            done += len(rowids)
+            if verbose:
+                dt = time.perf_counter() - t0
+                print(f"[rescore] rowid {hi:,}/{end:,}  {done:,} rows  {done / max(dt, 1e-9):,.0f} rows/s")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return done
+
+
+# ---------------------------------------------------
+# CSV EXPORTS
+# ---------------------------------------------------
+
+def _score_frame_chunk(df):
+    """Worker: a CSV chunk with summary_v<N> added."""
+    screening = (df["assessment_type"].isna() | (df["assessment_type"] == "")) \
+        if "assessment_type" in df.columns else slice(None)
+    out = df.copy()
+    out[summary_column()] = None
+    out.loc[screening, summary_column()] = _score_chunk(df.loc[screening])
+    return out
+
+
+def rescore_csv(csv_path, out_path, workers=None, chunk_rows=CHUNK_ROWS, restart=False,
+                verbose=True):
+    """
+    Streams `csv_path` in chunks into `out_path` with summary_v<RULES_VERSION>
+    added. Returns the number of rows written by this call.
+    """
+    import pandas as pd
+    ckpt_path = out_path + ".checkpoint"
+    ckpt = {"rows": 0, "bytes": 0}
+    if not restart and os.path.exists(ckpt_path) and os.path.exists(out_path):
+        with open(ckpt_path) as f:
+            ckpt = json.load(f)
+        if ckpt.get("column") != summary_column():
+            ckpt = {"rows": 0, "bytes": 0}
+    skip = ckpt["rows"]
+    if verbose and skip:
+        print(f"[rescore] resuming {out_path} after {skip:,} rows")
+
+    chunks = pd.read_csv(csv_path, chunksize=chunk_rows, skiprows=range(1, skip + 1),
+                         low_memory=False)
+    workers = workers or os.cpu_count() or 1
+    t0, done = time.perf_counter(), 0
+    pool = _pool(workers)
+    with open(out_path, "r+b" if skip else "wb") as f:
+        f.truncate(ckpt["bytes"])
+        f.seek(ckpt["bytes"])
+        try:
+            for _, out in _ordered(pool, _score_frame_chunk, chunks, workers):
+                if out.empty:       # everything already written
+                    continue
+                f.write(out.to_csv(index=False, header=ckpt["rows"] == 0).encode())
+                f.flush()
+                os.fsync(f.fileno())
+                ckpt = {"column": summary_column(), "rows": ckpt["rows"] + len(out),
+                        "bytes": f.tell()}
+                with open(ckpt_path + ".tmp", "w") as c:
+                    json.dump(ckpt, c)
+                os.replace(ckpt_path + ".tmp", ckpt_path)
+                done += len(out)
+                if verbose:
+                    dt = time.perf_counter() - t0
+                    print(f"[rescore] {ckpt['rows']:,} rows  {done / max(dt, 1e-9):,.0f} rows/s")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    return done
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description=f"Re-score stored assessments into {summary_column()}.")
+    ap.add_argument("--db", default=DB_FILE)
+    ap.add_argument("--csv", default=None, help="re-score a CSV export instead of the store")
+    ap.add_argument("--out", default=None, help="output CSV (with --csv)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    args = ap.parse_args(argv)
+    if args.csv:
+        if not args.out:
+            ap.error("--csv needs --out")
+        n = rescore_csv(args.csv, args.out, args.workers, args.chunk_rows, args.restart)
+    else:
+        n = rescore_store(args.db, args.workers, args.chunk_rows, args.restart)
+    print(f"[rescore] {n:,} rows re-scored under rules v{RULES_VERSION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# src/score.py
+"""
+Offline batch scoring of free-text entries.
+
+    python -m src.score entries.csv scores.csv --text-col text
+    python -m src.score entries.parquet scores.parquet --chunksize 100000
+
+The input is streamed in fixed-size chunks through extract_features_batch and
+predict_ensemble, so memory stays bounded by the chunk size rather than
+the file size.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+from src.features import FEATURE_COLUMNS, extract_features_batch
+from src.model import DEFAULT_BUNDLE, MODES, predict_ensemble, warm_up
+
+CHUNKSIZE = 50_000
+
+
+def _is_parquet(path):
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+# ---------------------------------------------------
+# CHUNKED READERS / WRITERS
+# ---------------------------------------------------
+
+def iter_chunks(path, chunksize=CHUNKSIZE, columns=None):
+    """Yields DataFrame chunks of at most `chunksize` rows from a CSV or Parquet file."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+class _ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a",
+                      header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# ---------------------------------------------------
+# SCORING
+# ---------------------------------------------------
+
+def score_frame(df, text_col="text", bundle_path=DEFAULT_BUNDLE, mode="sequential"):
+    """Scores one chunk. Returns a Series of ensemble probabilities aligned with df."""
+    X = pd.DataFrame(extract_features_batch(df[text_col]), columns=FEATURE_COLUMNS)
+    return pd.Series(predict_ensemble(X, bundle_path=bundle_path, mode=mode), index=df.index, name="score")
+
+
+def score_file(in_path, out_path, text_col="text", keep=None, chunksize=CHUNKSIZE,
+               bundle_path=DEFAULT_BUNDLE, mode="sequential", verbose=True):
+    """
+    Streams `in_path` through the ensemble and writes `keep` columns
+    (default: all input columns) plus `score` to `out_path`.
+    Returns a dict with rows, seconds and rows_per_sec.
+    """
+    warm_up(bundle_path)
+    columns = None
+    if keep is not None:
+        columns = list(dict.fromkeys(list(keep) + [text_col]))
+
+    writer = _ChunkWriter(out_path)
+    rows = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_chunks(in_path, chunksize=chunksize, columns=columns):
+            if len(chunk) == 0:
+                continue
+            scores = score_frame(chunk, text_col=text_col, bundle_path=bundle_path, mode=mode)
+            out = chunk if keep is None else chunk[list(keep)]
+            writer.write(out.assign(score=scores.values))
+            rows += len(chunk)
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"[score] {rows:,} rows  {rows / max(elapsed, 1e-9):,.0f} rows/sec",
+                      file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {"rows": rows, "seconds": elapsed, "rows_per_sec": rows / max(elapsed, 1e-9)}
+    if verbose:
+        print(f"[score] done: {rows:,} rows in {elapsed:.2f}s "
+              f"({stats['rows_per_sec']:,.0f} rows/sec) -> {out_path}")
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch-score free-text entries with the ensemble model.")
+    ap.add_argument("input", help="CSV or Parquet file with a text column")
+    ap.add_argument("output", help="CSV or Parquet file to write (format from suffix)")
+    ap.add_argument("--text-col", default="text")
+    ap.add_argument("--keep", default=None,
+                    help="comma-separated input columns to copy to the output (default: all)")
+    ap.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    ap.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    ap.add_argument("--mode", default="sequential", choices=MODES,
+                    help="ensemble execution mode (see predict_ensemble)")
+    args = ap.parse_args(argv)
+
+    keep = [c for c in args.keep.split(",") if c] if args.keep else None
+    score_file(args.input, args.output, text_col=args.text_col, keep=keep,
+               chunksize=args.chunksize, bundle_path=args.bundle, mode=args.mode)
+
+
+if __name__ == "__main__":
+    main()
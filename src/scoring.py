@@ -0,0 +1,252 @@
+# src/scoring.py
+"""
+Scoring rules of the multi-domain screening (run_assessment), UI-free and
+vectorized.
+
+    scored = score_frame(df)            # one pass over any number of rows
+    result = score_record(record)       # one assessment (the interactive path)
+
+Input columns, per instrument either raw items or the stored total:
+
+    PHQ-9   phq9_1 .. phq9_9            or  phq9, phq9_item9
+    GAD-7   gad7_1 .. gad7_7            or  gad7
+    MDQ     mdq_1 .. mdq_7, mdq_impair  or  mdq_symptoms, mdq_positive
+    PQ-B    pqb_1 .. pqb_4              or  pqb
+    memory  recall_input (text)         or  mem_score
+    fluency vf_input (text)             or  vf_score
+    clock   clock_hour, clock_min       or  clock_score
+    motor   taps
+
+(the raw names are the widget keys in src/assessments_utils.py). Missing
+values give what the interactive rules' comparisons give: a NaN total
+falls into the last band (as risk_label does) and never sets a flag.
+
+Severity bands use np.searchsorted over the band upper bounds. The summary
+string depends only on six small label codes, so it is looked up from a
+table of every label combination built with summary_items(), the same
+function the interactive path uses.
+"""
+import itertools
+import numpy as np
+import pandas as pd
+
+RULES_VERSION = 1       # bump whenever a threshold or label below changes
+
+# upper bound (inclusive) -> label, ascending (risk_label semantics)
+PHQ9_BANDS = [(4, "Minimal"), (9, "Mild"), (14, "Moderate"), (19, "Moderately severe"), (27, "Severe")]
+GAD7_BANDS = [(4, "Minimal"), (9, "Mild"), (14, "Moderate"), (21, "Severe")]
+COG_BANDS = [(2, "Possible Cognitive Concern"), (4, "Mild Concerns"),
+             (float("inf"), "No major cognitive concerns noted")]
+
+MDQ_MIN_SYMPTOMS = 5        # with impairment
+PQB_ELEVATED = 2
+PQB_URGENT = 3
+PHQ9_ITEM9_URGENT = 1
+VF_LOW = 10                 # animals named below this count 1 point, else 2
+CLOCK_HOURS = (10, 11, 12)
+CLOCK_MINUTES = (9, 10, 11)
+TAPS_LOW = 15
+RECALL_WORDS = ["apple", "penny", "river", "window", "tiger"]
+
+MOTOR_NORMAL = "Normal"
+MOTOR_FLAG = "Bradykinesia-like (low taps) — consider evaluation for parkinsonism"
+NO_SIGNALS = "No major signals"
+URGENT_SUICIDAL = ("PHQ-9 item 9 flagged — suicidal ideation. If you have active plan or intent, "
+                   "seek immediate help / emergency services.")
+URGENT_PSYCHOSIS = ("Several prodromal psychosis features reported — consider urgent "
+                    "psychiatric evaluation.")
+
+ITEMS = {"phq9": 9, "gad7": 7, "mdq": 7, "pqb": 4}
+YES = ("yes", "true", "1", "y")
+
+
+# ---------------------------------------------------
+# SCALAR RULES (shared with the interactive path)
+# ---------------------------------------------------
+
+def risk_label(score, thresholds):
+    """Map numeric score to label with thresholds sorted ascending list of (threshold,label)."""
+    for th, label in thresholds:
+        if score <= th:
+            return label
+    return thresholds[-1][1]
+
+
+def summary_items(dep_label, anx_label, bipolar_flag, psychosis_risk, cog_label, motor_label):
+    """(condition, note) pairs shown in the screening summary and stored as "summary"."""
+    summary = []
+    if dep_label in ("Moderate", "Moderately severe", "Severe"):
+        summary.append(("Depression", dep_label))
+    if anx_label in ("Moderate", "Severe"):
+        summary.append(("Anxiety", anx_label))
+    if bipolar_flag == "Positive":
+        summary.append(("Bipolar disorder (screen)", "Possible — MDQ positive"))
+    if psychosis_risk == "Elevated":
+        summary.append(("Psychosis risk / Prodrome", "Elevated"))
+    if cog_label != COG_BANDS[-1][1]:
+        summary.append(("Cognitive impairment", cog_label))
+    if motor_label != MOTOR_NORMAL:
+        summary.append(("Motor/parkinsonism", motor_label))
+    return summary
+
+
+def summary_string(items):
+    return ";".join(f"{c}:{n}" for c, n in items) or NO_SIGNALS
+
+
+def summary_column(version=RULES_VERSION):
+    """Stored column holding the summary under one rules version ("summary_v1")."""
+    return f"summary_v{version}"
+
+
+# ---------------------------------------------------
+# VECTORIZED ENGINE
+# ---------------------------------------------------
+
+_LABELS = {
+    "dep_label": [label for _, label in PHQ9_BANDS],
+    "anx_label": [label for _, label in GAD7_BANDS],
+    "bipolar_flag": ["Negative", "Positive"],
+    "psychosis_risk": ["Low", "Elevated"],
+    "cog_label": [label for _, label in COG_BANDS],
+    "motor_label": [MOTOR_NORMAL, MOTOR_FLAG],
+}
+_RADIX = [len(v) for v in _LABELS.values()]
+
+
+def _summary_table():
+    """Every label combination -> index into a list of distinct summary strings."""
+    strings, index, codes = [], {}, []
+    for combo in itertools.product(*_LABELS.values()):
+        s = summary_string(summary_items(*combo))
+        codes.append(index.setdefault(s, len(index)))
+        if len(strings) < len(index):
+            strings.append(s)
+    return np.asarray(codes, dtype=np.intp), strings
+
+
+_SUMMARY_CODES, _SUMMARIES = _summary_table()
+
+
+def _num(df, col):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _bool(df, col):
+    """Truthiness of a stored flag (bool, 0/1, "True"/"Yes" text); missing -> False."""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    s = df[col]
+    if s.dtype == bool:
+        return s.to_numpy()
+    if s.dtype.kind in "if":
+        return s.fillna(0).to_numpy() != 0
+    return s.astype(str).str.strip().str.lower().isin(YES).to_numpy()
+
+
+def _total(df, prefix, total_col):
+    """Sum of raw items prefix_1..prefix_n when present, else the stored total."""
+    cols = [f"{prefix}_{i}" for i in range(1, ITEMS[prefix] + 1)]
+    if all(c in df.columns for c in cols):
+        return np.sum([_num(df, c) for c in cols], axis=0)
+    return _num(df, total_col)
+
+
+def _bands(score, bands):
+    """Index of the first band whose upper bound >= score (NaN -> last band)."""
+    bounds = np.asarray([th for th, _ in bands], dtype=np.float64)
+    return np.minimum(np.searchsorted(bounds, score, side="left"), len(bounds) - 1)
+
+
+def _recall(df):
+    if "recall_input" not in df.columns:
+        return _num(df, "mem_score")
+    text = df["recall_input"].fillna("").astype(str).str.lower()
+    return np.sum([text.str.contains(w, regex=False).to_numpy() for w in RECALL_WORDS],
+                  axis=0).astype(np.float64)
+
+
+def _fluency(df):
+    if "vf_input" not in df.columns:
+        return _num(df, "vf_score")
+    # comma-separated entries that are not blank
+    return df["vf_input"].fillna("").astype(str).str.count(r"[^,\s][^,]*") \
+        .to_numpy(dtype=np.float64)
+
+
+def _clock(df):
+    if "clock_hour" not in df.columns or "clock_min" not in df.columns:
+        return _num(df, "clock_score")
+    return (np.isin(_num(df, "clock_hour"), CLOCK_HOURS).astype(np.float64)
+            + np.isin(_num(df, "clock_min"), CLOCK_MINUTES))
+
+
+def score_frame(df, labels=True):
+    """
+    Applies the current scoring rules to every row of `df` (see module
+    doc for the input columns). Returns a DataFrame on df's index with the
+    totals, label columns (categorical), urgent flags, "summary" and
+    "rules_version". labels=False skips the label columns (totals, flags
+    and summary only).
+    """
+    phq9 = _total(df, "phq9", "phq9")
+    item9 = _num(df, "phq9_9" if "phq9_9" in df.columns else "phq9_item9")
+    gad7 = _total(df, "gad7", "gad7")
+    mdq = _total(df, "mdq", "mdq_symptoms")
+    if "mdq_impair" in df.columns and "mdq_1" in df.columns:
+        mdq_positive = (mdq >= MDQ_MIN_SYMPTOMS) & _bool(df, "mdq_impair")
+    else:
+        # Stored totals keep only the flag, not the impairment answer. A stored
+        # positive implies impairment was "Yes", so it is re-thresholded under
+        # the current MDQ_MIN_SYMPTOMS; a stored negative stays negative (its
+        # impairment was "No", or unknown below the old threshold; see src/rescore.py).
+        mdq_positive = _bool(df, "mdq_positive") & (mdq >= MDQ_MIN_SYMPTOMS)
+    pqb = _total(df, "pqb", "pqb")
+    mem, vf, clock, taps = _recall(df), _fluency(df), _clock(df), _num(df, "taps")
+
+    cog_total = mem + np.where(vf < VF_LOW, 1, 2) + clock
+    codes = {
+        "dep_label": _bands(phq9, PHQ9_BANDS),
+        "anx_label": _bands(gad7, GAD7_BANDS),
+        "bipolar_flag": mdq_positive.astype(np.intp),
+        "psychosis_risk": (pqb >= PQB_ELEVATED).astype(np.intp),
+        "cog_label": _bands(cog_total, COG_BANDS),
+        "motor_label": (taps < TAPS_LOW).astype(np.intp),
+    }
+    combo = np.zeros(len(df), dtype=np.intp)
+    for code, radix in zip(codes.values(), _RADIX):
+        combo = combo * radix + code
+
+    out = {"phq9": phq9, "phq9_item9": item9, "gad7": gad7, "mdq_symptoms": mdq,
+           "mdq_positive": mdq_positive, "pqb": pqb, "mem_score": mem, "vf_score": vf,
+           "clock_score": clock, "taps": taps, "cog_total": cog_total}
+    if labels:
+        for name, code in codes.items():
+            out[name] = pd.Categorical.from_codes(code, _LABELS[name])
+    out["urgent_suicidal"] = item9 >= PHQ9_ITEM9_URGENT
+    out["urgent_psychosis"] = pqb >= PQB_URGENT
+    out["summary"] = pd.Categorical.from_codes(_SUMMARY_CODES[combo], _SUMMARIES)
+    out = pd.DataFrame(out, index=df.index)
+    out["rules_version"] = RULES_VERSION
+    return out
+
+
+def score_record(record):
+    """score_frame for one assessment dict; returns a plain dict (labels as str, flags as bool)."""
+    row = score_frame(pd.DataFrame([record])).iloc[0]
+    out = {}
+    for k, v in row.items():
+        out[k] = v.item() if hasattr(v, "item") else v
+    return out
+
+
+def urgent_messages(result):
+    """Urgent-flag messages for one scored assessment (score_record output)."""
+    messages = []
+    if result["urgent_suicidal"]:
+        messages.append(URGENT_SUICIDAL)
+    if result["urgent_psychosis"]:
+        messages.append(URGENT_PSYCHOSIS)
+    return messages
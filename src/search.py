@@ -0,0 +1,425 @@
+# src/search.py
+"""
+Hyperparameter search over the ensemble members (Hyperband: successive
+halving brackets over a per-member resource such as trees or epochs).
+
+    folds = fold_cache(make_xy, key_params={...}, n_folds=3)
+    result = search(folds, members=("rf", "lgbm"), workers=4)
+    models, _ = fit_best(result, folds)
+
+    python -m src.search data/training_data.csv --out models/final_model --workers 4 [--stack]
+
+Fold splits and fold feature matrices are written once per data source:
+
+    data/cache/search/<key>/X.npy, y.npy            full matrix (final fit)
+                            fold_<k>/train_idx.npy  split indices
+                                     X_train.npy, y_train.npy, X_val.npy, y_val.npy
+                            meta.json               {"columns", "rows", "folds", ...}
+
+so repeated searches skip feature extraction. Trials run in a process
+pool; every worker memory-maps the fold matrices. LightGBM trials stop
+early on the fold's validation split and the best iteration count carries
+over to the final fit.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import numpy as np
+
+SEARCH_CACHE_DIR = "data/cache/search"
+ETA = 3                         # successive halving keeps the best 1/ETA per rung
+EARLY_STOPPING_ROUNDS = 30      # LightGBM rounds without validation AUC gain
+
+# Per member: (resource parameter, min, max) and the sampled parameter grid.
+SPACES = {
+    "logistic": {
+        "resource": ("max_iter", 50, 1000),
+        "params": {"C": [0.01, 0.1, 1.0, 10.0, 100.0],
+                   "class_weight": [None, "balanced"]},
+    },
+    "rf": {
+        "resource": ("n_estimators", 25, 400),
+        "params": {"max_depth": [None, 8, 16, 32],
+                   "min_samples_leaf": [1, 2, 5, 10],
+                   "max_features": ["sqrt", 0.5, 1.0]},
+    },
+    "mlp": {
+        "resource": ("max_iter", 60, 800),
+        "params": {"hidden_layer_sizes": [(32,), (64, 32), (128, 64), (64, 64, 32)],
+                   "alpha": [1e-5, 1e-4, 1e-3, 1e-2],
+                   "learning_rate_init": [1e-3, 3e-3, 1e-2]},
+    },
+    "lgbm": {
+        "resource": ("n_estimators", 30, 800),
+        "params": {"num_leaves": [7, 15, 31, 63],
+                   "learning_rate": [0.02, 0.05, 0.1, 0.2],
+                   "min_child_samples": [5, 20, 50],
+                   "colsample_bytree": [0.6, 0.8, 1.0]},
+    },
+}
+
+
+def _member_class(name):
+    if name == "logistic":
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression
+    if name == "rf":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier
+    if name == "mlp":
+        from sklearn.neural_network import MLPClassifier
+        return MLPClassifier
+    if name == "lgbm":
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier
+    raise ValueError(f"unknown member {name!r}")
+
+
+def _member_params(name, params, resource, random_state):
+    kw = dict(params)
+    kw[SPACES[name]["resource"][0]] = int(resource)
+    if name != "logistic":
+        kw["random_state"] = random_state
+    if name == "lgbm":
+        kw["verbose"] = -1
+    if "hidden_layer_sizes" in kw:
+        kw["hidden_layer_sizes"] = tuple(kw["hidden_layer_sizes"])
+    return kw
+
+
+# ---------------------------------------------------
+# FOLD CACHE
+# ---------------------------------------------------
+
+def source_signature(path):
+    """Identity of an input file for cache keys (path, size, mtime)."""
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def open_fold_cache(path):
+    """Cache descriptor (dict) for a complete fold cache directory, or None."""
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return dict(meta, path=path)
+
+
+def fold_cache(make_xy, key_params, n_folds=3, seed=42, cache_dir=SEARCH_CACHE_DIR):
+    """
+    Fold cache for the data described by `key_params`. `make_xy()` returns
+    (X, y) with X a DataFrame or 2-D array; it runs on the first call only.
+    Splits are stratified.
+    """
+    blob = json.dumps(dict(key_params, folds=n_folds, seed=seed), sort_keys=True, default=str)
+    path = os.path.join(cache_dir, hashlib.sha1(blob.encode()).hexdigest()[:16])
+    cached = open_fold_cache(path)
+    if cached is not None:
+        print(f"[search] reusing cached folds at {path}")
+        return cached
+
+    from sklearn.model_selection import StratifiedKFold
+    X, y = make_xy()
+    columns = [str(c) for c in X.columns] if hasattr(X, "columns") else None
+    X = np.ascontiguousarray(X.to_numpy() if columns else X, dtype=np.float64)
+    y = np.asarray(y)
+    tmp = path + ".partial"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "X.npy"), X)
+    np.save(os.path.join(tmp, "y.npy"), y)
+    splits = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X, y)
+    for k, (tr, va) in enumerate(splits):
+        d = os.path.join(tmp, f"fold_{k}")
+        os.makedirs(d)
+        np.save(os.path.join(d, "train_idx.npy"), tr)
+        np.save(os.path.join(d, "val_idx.npy"), va)
+        for part, idx in (("train", tr), ("val", va)):
+            np.save(os.path.join(d, f"X_{part}.npy"), X[idx])
+            np.save(os.path.join(d, f"y_{part}.npy"), y[idx])
+    meta = {"columns": columns, "rows": int(len(y)), "folds": n_folds, "seed": seed,
+            "key": json.loads(blob)}
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    print(f"[search] cached {n_folds} folds of {len(y):,} rows at {path}")
+    return open_fold_cache(path)
+
+
+def load_fold(cache, k):
+    """(X_train, y_train, X_val, y_val) of fold k, memory-mapped."""
+    d = os.path.join(cache["path"], f"fold_{k}")
+    return tuple(np.load(os.path.join(d, f"{p}.npy"), mmap_mode="r")
+                 for p in ("X_train", "y_train", "X_val", "y_val"))
+
+
+def fold_val_index(cache, k):
+    """Row indices (into the full matrix) of fold k's validation split."""
+    return np.load(os.path.join(cache["path"], f"fold_{k}", "val_idx.npy"))
+
+
+def csv_fold_cache(csv, text_col="text", label_col="label", n_folds=3, seed=42):
+    """fold_cache over the text features of a labelled CSV (extract_features_batch)."""
+    import pandas as pd
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+
+    def make_xy():
+        df = pd.read_csv(csv)
+        X = pd.DataFrame(extract_features_batch(df[text_col].astype(str)), columns=FEATURE_COLUMNS)
+        return X, df[label_col].to_numpy()
+
+    return fold_cache(make_xy, {"source": source_signature(csv), "text_col": text_col,
+                                "label_col": label_col, "columns": FEATURE_COLUMNS},
+                      n_folds=n_folds, seed=seed)
+
+
+def load_full(cache):
+    """(X, y) of the whole cached dataset; X is a DataFrame when columns are known."""
+    X = np.load(os.path.join(cache["path"], "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(cache["path"], "y.npy"))
+    if cache.get("columns"):
+        import pandas as pd
+        X = pd.DataFrame(X, columns=cache["columns"], copy=False)
+    return X, y
+
+
+# ---------------------------------------------------
+# TRIALS (process pool workers)
+# ---------------------------------------------------
+
+_WORKER = {}    # per-process: cache descriptor, opened folds
+
+
+def _init_worker(cache):
+    import warnings
+    from threadpoolctl import threadpool_limits
+    from sklearn.exceptions import ConvergenceWarning
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+    threadpool_limits(limits=1)     # parallelism is across trials
+    _WORKER["cache"] = cache
+    _WORKER["folds"] = {}
+
+
+def _run_trial(job):
+    """job = (member, params, resource, fold, seed) -> (auc, fit seconds, best iteration)."""
+    from sklearn.metrics import roc_auc_score
+    name, params, resource, k, seed = job
+    folds = _WORKER["folds"]
+    if k not in folds:
+        folds[k] = load_fold(_WORKER["cache"], k)
+    X_tr, y_tr, X_va, y_va = folds[k]
+    kw = _member_params(name, params, resource, seed)
+    if name in ("rf", "lgbm"):
+        kw["n_jobs"] = 1
+    model = _member_class(name)(**kw)
+    t0 = time.perf_counter()
+    best_iteration = None
+    if name == "lgbm":
+        import lightgbm as lgb
+        import inspect
+        # lightgbm >= 4.6 takes eval_X / eval_y and deprecates eval_set
+        if "eval_X" in inspect.signature(model.fit).parameters:
+            evals = {"eval_X": (X_va,), "eval_y": (y_va,)}
+        else:
+            evals = {"eval_set": [(X_va, y_va)]}
+        model.fit(X_tr, y_tr, eval_metric="auc",
+                  callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)], **evals)
+        best_iteration = int(model.best_iteration_ or resource)
+    else:
+        model.fit(X_tr, y_tr)
+    fit_s = time.perf_counter() - t0
+    return float(roc_auc_score(y_va, model.predict_proba(X_va)[:, 1])), fit_s, best_iteration
+
+
+# ---------------------------------------------------
+# HYPERBAND
+# ---------------------------------------------------
+
+def _sample(space, n, rng):
+    names = sorted(space)
+    configs, seen = [], set()
+    for _ in range(n * 20):
+        if len(configs) == n:
+            break
+        cfg = {p: space[p][rng.integers(len(space[p]))] for p in names}
+        key = json.dumps(cfg, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            configs.append(cfg)
+    return configs
+
+
+def brackets(member, eta=ETA, rng=None):
+    """Hyperband brackets for one member: [{"member", "s", "n", "r", "configs"}, ...]."""
+    rng = rng or np.random.default_rng(0)
+    _, r_min, r_max = SPACES[member]["resource"]
+    s_max = int(math.floor(math.log(r_max / r_min, eta) + 1e-9))
+    out = []
+    for s in range(s_max, -1, -1):
+        n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        r = r_max * eta ** -s
+        out.append({"member": member, "s": s, "n": n, "r": r, "rung": 0,
+                    "configs": _sample(SPACES[member]["params"], n, rng)})
+    return out
+
+
+def search(cache, members=None, eta=ETA, workers=None, seed=42, verbose=True):
+    """
+    Runs Hyperband for every member over the cached folds. Rungs of all
+    brackets that are ready run together in one pool round. Returns
+    {"best": {member: {"params", "resource", "score", "best_iteration"}},
+     "trials": DataFrame (one row per config and rung)}.
+    """
+    import pandas as pd
+    members = list(members or SPACES)
+    rng = np.random.default_rng(seed)
+    active = [b for m in members for b in brackets(m, eta, rng)]
+    workers = workers or os.cpu_count() or 1
+    n_folds = cache["folds"]
+    trials = []
+    t0 = time.perf_counter()
+
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(cache,))
+    else:
+        _init_worker(cache)
+    try:
+        round_no = 0
+        while active:
+            jobs, owners = [], []
+            for b in active:
+                resource = max(1, int(round(b["r"] * eta ** b["rung"])))
+                for ci, cfg in enumerate(b["configs"]):
+                    for k in range(n_folds):
+                        jobs.append((b["member"], cfg, resource, k, seed))
+                        owners.append((b, ci, resource))
+            results = list(pool.map(_run_trial, jobs, chunksize=max(1, len(jobs) // (4 * workers)))
+                           if pool else map(_run_trial, jobs))
+
+            scores = {}
+            for (b, ci, resource), (auc, fit_s, best_it) in zip(owners, results):
+                acc = scores.setdefault((id(b), ci), {"b": b, "ci": ci, "resource": resource,
+                                                      "auc": [], "fit_s": 0.0, "best_it": []})
+                acc["auc"].append(auc)
+                acc["fit_s"] += fit_s
+                if best_it is not None:
+                    acc["best_it"].append(best_it)
+            for acc in scores.values():
+                b = acc["b"]
+                trials.append({"member": b["member"], "bracket": b["s"], "rung": b["rung"],
+                               "resource": acc["resource"], "final": b["rung"] == b["s"],
+                               "score": float(np.mean(acc["auc"])),
+                               "score_std": float(np.std(acc["auc"])),
+                               "fit_s": acc["fit_s"],
+                               "best_iteration": int(np.mean(acc["best_it"]))
+                               if acc["best_it"] else None,
+                               "params": b["configs"][acc["ci"]]})
+
+            still = []
+            for b in active:
+                if b["rung"] == b["s"]:
+                    continue
+                ranked = sorted(range(len(b["configs"])),
+                                key=lambda ci: -float(np.mean(scores[(id(b), ci)]["auc"])))
+                b["rung"] += 1
+                keep = max(1, int(b["n"] * eta ** -b["rung"]))
+                b["configs"] = [b["configs"][ci] for ci in ranked[:keep]]
+                still.append(b)
+            active = still
+            round_no += 1
+            if verbose:
+                print(f"[search] round {round_no}: {len(jobs)} fits, "
+                      f"{len(active)} brackets left ({time.perf_counter() - t0:.1f}s)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    df = pd.DataFrame(trials)
+    best = {}
+    for member in members:
+        final = df[(df["member"] == member) & df["final"]]
+        row = final.loc[final["score"].idxmax()]
+        best[member] = {"params": row["params"], "resource": int(row["resource"]),
+                        "score": float(row["score"]),
+                        "best_iteration": None if pd.isna(row["best_iteration"])
+                        else int(row["best_iteration"])}
+    if verbose:
+        print(f"[search] {len(df)} trials, {len(df) * n_folds} fits "
+              f"in {time.perf_counter() - t0:.1f}s ({workers} workers)")
+        for member, b in best.items():
+            print(f"  {member:<9} auc {b['score']:.4f}  {SPACES[member]['resource'][0]}="
+                  f"{b['best_iteration'] or b['resource']}  {b['params']}")
+    return {"best": best, "trials": df}
+
+
+# ---------------------------------------------------
+# FINAL FIT
+# ---------------------------------------------------
+
+def best_specs(best, seed=42):
+    """src.training specs for the winning configurations (LightGBM at its best iteration)."""
+    from src.training import estimator_spec
+    specs = {}
+    for member, b in best.items():
+        resource = b["best_iteration"] or b["resource"]
+        params = _member_params(member, b["params"], resource, seed)
+        specs[member] = estimator_spec(_member_class(member),
+                                       "n_jobs" if member in ("rf", "lgbm") else None, **params)
+    return specs
+
+
+def fit_best(result, cache, seed=42, cores=None, parallel=True):
+    """Refits the best configuration of every member on the full cached data."""
+    from src.training import train_members
+    X, y = load_full(cache)
+    return train_members(X, y, best_specs(result["best"], seed), cores=cores, parallel=parallel)
+
+
+def main(argv=None):
+    import argparse
+    from src.artifact import save_bundle
+
+    ap = argparse.ArgumentParser(description="Hyperband search over the ensemble members.")
+    ap.add_argument("csv", nargs="?", default="data/training_data.csv")
+    ap.add_argument("--text-col", default="text")
+    ap.add_argument("--label-col", default="label")
+    ap.add_argument("--members", nargs="+", default=list(SPACES), choices=list(SPACES))
+    ap.add_argument("--folds", type=int, default=3)
+    ap.add_argument("--eta", type=int, default=ETA)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=None, help="artifact directory for the best ensemble")
+    ap.add_argument("--compiled", default=None, help="also export a compiled .npz (src/compiled.py)")
+    ap.add_argument("--stack", action="store_true",
+                    help="learn ensemble weights and prune members (src/stacking.py)")
+    args = ap.parse_args(argv)
+
+    cache = csv_fold_cache(args.csv, args.text_col, args.label_col, args.folds, args.seed)
+    result = search(cache, members=args.members, eta=args.eta, workers=args.workers,
+                    seed=args.seed)
+    if args.out:
+        models, _ = fit_best(result, cache, seed=args.seed)
+        extra = {"search": result["best"]}
+        if args.stack:
+            from src.stacking import stack_bundle
+            stacker = stack_bundle(models, cache)
+            extra["stacker"] = {k: stacker[k] for k in ("members", "weights", "pruned", "auc")}
+        save_bundle(models, args.out, extra=extra)
+        print("Saved ensemble to", args.out)
+        if args.compiled:
+            from src.compiled import export_compiled
+            diff = export_compiled(args.out, args.compiled)
+            print(f"Compiled ensemble -> {args.compiled} (max |diff| {diff:.1e})")
+
+
+if __name__ == "__main__":
+    main()
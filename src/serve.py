@@ -0,0 +1,383 @@
+# src/serve.py
+"""
+Local prediction service with micro-batching.
+
+    python -m src.serve --port 8765 --max-batch 64 --max-wait-ms 5
+    python -m src.serve --unix /tmp/neuromindx.sock
+
+One process holds the bundle; concurrent requests are queued and scored
+together by predict_ensemble, a batch closing when it reaches --max-batch
+rows or its first request has waited --max-wait-ms. Each batch takes the
+bundle from the model registry, so replacing the bundle file is picked up
+without a restart. Every request is scored in the service's --mode.
+
+    POST /predict   {"rows": [{"length": 42, "num_words": 9, ...}, ...]}
+                    -> {"scores": [...], "batch_rows": n, "latency_ms": ...}
+    GET  /metrics   request / batch counts and p50 / p99 latency
+    GET  /health
+
+Clients (e.g. the Model Predictions page) use PredictClient; set
+NEUROMINDX_PREDICT_URL=http://127.0.0.1:8765 or unix:///tmp/neuromindx.sock.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import numpy as np
+
+from src.model import DEFAULT_BUNDLE, MODES, feature_columns, get_bundle, predict_ensemble
+
+PREDICT_URL_ENV = "NEUROMINDX_PREDICT_URL"
+MAX_BATCH = 64
+MAX_WAIT_MS = 5.0
+METRICS_WINDOW = 10_000     # most recent requests kept for percentiles
+
+
+# ---------------------------------------------------
+# MICRO-BATCHER
+# ---------------------------------------------------
+
+class MicroBatcher:
+    """Coalesces queued rows into batches and scores them off the event loop."""
+
+    def __init__(self, bundle_path=DEFAULT_BUNDLE, mode="sequential",
+                 max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.bundle_path = bundle_path
+        self.mode = mode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.bundle = get_bundle(bundle_path)
+        if self.bundle is None:
+            raise FileNotFoundError(f"Model bundle could not be loaded: {bundle_path}")
+        self.columns = feature_columns(self.bundle)
+        self._queue = None
+        self._task = None
+        self.started = time.time()
+        self.requests = self.rows = self.batches = self.errors = 0
+        self._latency = deque(maxlen=METRICS_WINDOW)
+        self._batch_ms = deque(maxlen=METRICS_WINDOW)
+        self._batch_rows = deque(maxlen=METRICS_WINDOW)
+
+    def start(self):
+        import pandas as pd
+        # first call pays one-off costs (e.g. compiling the bundle for mode="compiled")
+        predict_ensemble(pd.DataFrame([dict.fromkeys(self.columns, 0.0)]),
+                         bundle=self.bundle, mode=self.mode)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def validate(self, rows):
+        """
+        Feature dicts of one request reduced to self.columns as floats;
+        raises ValueError naming the first missing or non-numeric value.
+        """
+        if not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+            raise ValueError("'rows' must be a non-empty list of feature dicts")
+        out = []
+        for i, row in enumerate(rows):
+            missing = [c for c in self.columns if c not in row]
+            if missing:
+                raise ValueError(f"row {i}: missing features {missing[:5]}")
+            clean = {}
+            for c in self.columns:
+                v = row[c]
+                if isinstance(v, bool) or not isinstance(v, (int, float)) or not np.isfinite(v):
+                    raise ValueError(f"row {i}: {c} must be a finite number, got {v!r}")
+                clean[c] = float(v)
+            out.append(clean)
+        return out
+
+    async def submit(self, rows):
+        """Scores a list of validated feature dicts; returns (scores, batch_rows)."""
+        t0 = time.perf_counter()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, fut))
+        try:
+            return await fut
+        finally:
+            self.requests += 1
+            self._latency.append((time.perf_counter() - t0) * 1000.0)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n += len(item[0])
+            await self._score(batch, n)
+
+    def _current_bundle(self):
+        """The registry's bundle (reloaded if the file changed); the last good one if it fails to load."""
+        bundle = get_bundle(self.bundle_path)
+        if bundle is None:
+            print(f"[WARN] could not reload {self.bundle_path}; scoring with the previous bundle")
+            return self.bundle
+        if bundle is not self.bundle:
+            self.bundle, self.columns = bundle, feature_columns(bundle)
+        return bundle
+
+    async def _predict(self, records):
+        import pandas as pd
+
+        def run():
+            bundle = self._current_bundle()
+            X = pd.DataFrame.from_records(records, columns=self.columns)
+            if X.isna().any().any():    # validated against a bundle with other columns
+                raise ValueError("the model bundle changed; resend the request")
+            return predict_ensemble(X, bundle=bundle, mode=self.mode)
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+
+    def _done(self, n, t0):
+        self.batches += 1
+        self.rows += n
+        self._batch_ms.append((time.perf_counter() - t0) * 1000.0)
+        self._batch_rows.append(n)
+
+    async def _score(self, batch, n):
+        t0 = time.perf_counter()
+        try:
+            scores = await self._predict([r for rows, _ in batch for r in rows])
+        except Exception as e:
+            if len(batch) > 1:
+                await self._score_each(batch)
+                return
+            self.errors += 1
+            if not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        self._done(n, t0)
+        start = 0
+        for rows, fut in batch:
+            if not fut.done():
+                fut.set_result((scores[start:start + len(rows)], n))
+            start += len(rows)
+
+    async def _score_each(self, batch):
+        """A failed batch is rescored request by request, so only the bad request fails."""
+        for rows, fut in batch:
+            t0 = time.perf_counter()
+            try:
+                scores = await self._predict(rows)
+            except Exception as e:
+                self.errors += 1
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            self._done(len(rows), t0)
+            if not fut.done():
+                fut.set_result((scores, len(rows)))
+
+    def metrics(self):
+        def pct(values, q):
+            return float(np.percentile(values, q)) if values else None
+        lat, bms = list(self._latency), list(self._batch_ms)
+        return {
+            "uptime_s": time.time() - self.started,
+            "mode": self.mode,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_rows": float(np.mean(self._batch_rows)) if self._batch_rows else None,
+            "latency_ms": {"p50": pct(lat, 50), "p99": pct(lat, 99)},
+            "batch_predict_ms": {"p50": pct(bms, 50), "p99": pct(bms, 99)},
+        }
+
+
+# ---------------------------------------------------
+# HTTP FRONT END (stdlib asyncio, HTTP/1.1 keep-alive)
+# ---------------------------------------------------
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+def _response(status, payload):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+    return head.encode() + body
+
+
+async def _handle(batcher, reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "bad request line"}))
+                break
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                k, _, v = h.decode("latin-1").partition(":")
+                headers[k.strip().lower()] = v.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+            if method == "POST" and path == "/predict":
+                t0 = time.perf_counter()
+                try:
+                    # bad input fails this request only, before it can join a batch
+                    rows = batcher.validate(json.loads(body or b"{}")["rows"])
+                    scores, batch_rows = await batcher.submit(rows)
+                    out = _response(200, {"scores": [float(s) for s in scores],
+                                          "batch_rows": batch_rows,
+                                          "latency_ms": (time.perf_counter() - t0) * 1000.0})
+                except (KeyError, ValueError, TypeError) as e:
+                    out = _response(400, {"error": str(e)})
+                except Exception as e:
+                    out = _response(500, {"error": str(e)})
+            elif method == "GET" and path == "/metrics":
+                out = _response(200, batcher.metrics())
+            elif method == "GET" and path == "/health":
+                out = _response(200, {"ok": True})
+            else:
+                out = _response(404, {"error": f"no route for {method} {path}"})
+            writer.write(out)
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765, unix_path=None, ready=None, **batcher_kwargs):
+    """Runs the service until cancelled. `ready` (threading.Event) is set once listening."""
+    batcher = MicroBatcher(**batcher_kwargs)
+    batcher.start()
+    handler = lambda r, w: _handle(batcher, r, w)
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        where = f"unix://{unix_path}"
+    else:
+        server = await asyncio.start_server(handler, host=host, port=port)
+        where = f"http://{host}:{server.sockets[0].getsockname()[1]}"
+    print(f"[serve] listening on {where}  mode={batcher.mode} "
+          f"max_batch={batcher.max_batch} max_wait_ms={batcher.max_wait * 1000:g}")
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+# ---------------------------------------------------
+# CLIENT
+# ---------------------------------------------------
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class PredictClient:
+    """
+    Blocking client for the prediction service. One connection per thread,
+    reused across calls.
+    """
+
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            u = urlparse(self.url)
+            if u.scheme == "unix":
+                conn = _UnixHTTPConnection(u.path, self.timeout)
+            else:
+                conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload)
+        headers = {"Content-Type": "application/json"} if body else {}
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = json.loads(resp.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if resp.status != 200:
+            raise RuntimeError(f"prediction service: {data.get('error', resp.status)}")
+        return data
+
+    def predict(self, X, return_info=False):
+        """Scores a DataFrame or list of feature dicts; same output as predict_ensemble."""
+        rows = X.to_dict(orient="records") if hasattr(X, "to_dict") else list(X)
+        data = self._request("POST", "/predict", {"rows": rows})
+        scores = np.asarray(data["scores"], dtype=float)
+        return (scores, data) if return_info else scores
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
+
+
+def client_from_env():
+    """PredictClient for $NEUROMINDX_PREDICT_URL, or None when it is not set."""
+    url = os.environ.get(PREDICT_URL_ENV)
+    return PredictClient(url) if url else None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Micro-batching prediction service.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix", default=None, help="listen on a Unix socket instead of TCP")
+    ap.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    ap.add_argument("--mode", default="sequential", choices=MODES)
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, unix_path=args.unix, bundle_path=args.bundle,
+                          mode=args.mode, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
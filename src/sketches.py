@@ -0,0 +1,127 @@
+# src/sketches.py
+"""
+Mergeable streaming quantile sketch (KLL, Karnin-Lang-Liberty).
+
+    s = KLLSketch()
+    s.update(scores)                 # any iterable / array, NaN ignored
+    s.rank(12)                       # fraction of values below 12 (ties count half)
+    s.quantile(0.9)
+    s.merge(other)                   # sketches of disjoint data combine
+    KLLSketch.from_dict(s.to_dict()) # JSON-safe
+
+Memory is O(k log(n / k)) values. Rank error is about 1.7 / k with high
+probability (k=200: ~1%), whatever the number of values folded in.
+"""
+import math
+import numpy as np
+
+DEFAULT_K = 200
+_C = 2.0 / 3.0      # capacity shrink factor per level below the top
+
+
+class KLLSketch:
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = int(k)
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0)]     # level h holds items of weight 2**h
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * _C ** depth)))
+
+    def _compress(self):
+        changed = True
+        while changed:
+            changed = False
+            for h in range(len(self.levels)):
+                level = self.levels[h]
+                if level.size < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                keep = level[:level.size % 2]           # odd item stays at this weight
+                pairs = level[level.size % 2:]
+                offset = int(self._rng.integers(2))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], pairs[offset::2]])
+                self.levels[h] = keep
+                changed = True
+
+    def update(self, values):
+        x = np.asarray(values, dtype=np.float64).ravel()
+        x = x[~np.isnan(x)]
+        if x.size == 0:
+            return self
+        self.n += int(x.size)
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+        self.levels[0] = np.concatenate([self.levels[0], x])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if other.k != self.k:
+            raise ValueError(f"cannot merge sketches with k={self.k} and k={other.k}")
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2.0 ** h)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def rank(self, value):
+        """Approximate fraction (0-1) of values below `value`, ties counted as half."""
+        if self.n == 0:
+            return float("nan")
+        below = equal = total = 0.0
+        for h, level in enumerate(self.levels):
+            w = 2.0 ** h
+            below += w * np.count_nonzero(level < value)
+            equal += w * np.count_nonzero(level == value)
+            total += w * level.size
+        return (below + 0.5 * equal) / total
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1); exact min / max at the ends."""
+        if self.n == 0:
+            return float("nan")
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        items, weights = self._weighted()
+        cum = np.cumsum(weights)
+        return float(items[min(np.searchsorted(cum, q * cum[-1], side="left"), items.size - 1)])
+
+    def to_dict(self):
+        return {"k": self.k, "n": self.n,
+                "min": self.min if self.n else None, "max": self.max if self.n else None,
+                "levels": [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls(d["k"], seed=d["n"])
+        s.n = d["n"]
+        if s.n:
+            s.min, s.max = d["min"], d["max"]
+        s.levels = [np.asarray(level, dtype=np.float64) for level in d["levels"]] or [np.empty(0)]
+        return s
@@ -0,0 +1,222 @@
+# src/stacking.py
+"""
+Stacking stage: learned ensemble weights and member pruning.
+
+    oof, y = oof_predictions(cache, specs_from_bundle(bundle))
+    bundle["stacker"] = fit_stacker(oof, y, member_latency(bundle, X_row))
+
+    python -m src.stacking data/training_data.csv --bundle models/final_model
+
+Every member is refitted on each cached fold (src/search.py fold cache)
+and scores its held-out rows, giving out-of-fold probabilities for the
+whole training set. The stacker is a convex combination of member
+probabilities (weights >= 0, summing to 1) fitted by minimising log loss
+on them, so the ensemble score stays a probability and the weights can be
+renormalised over whichever members ran (cascade mode, a failed member).
+
+Members are then pruned, slowest first: a member is dropped when the
+cross-validated AUC of the re-fitted weights without it stays within
+`tol` of the AUC with every member. Zero-weight members are dropped too.
+
+    bundle["stacker"] = {"version": 1, "members": [...], "weights": [...],
+                         "pruned": [...], "auc": ..., "auc_all": ...,
+                         "auc_mean": ..., "member_auc": {...}, "latency_ms": {...}}
+
+predict_ensemble, the compiled artifact and explain_prediction read it.
+"""
+import time
+import numpy as np
+
+PRUNE_TOLERANCE = 0.0       # allowed AUC loss from dropping a member
+CV_FOLDS = 5                # folds over the out-of-fold rows when scoring a member set
+MIN_WEIGHT = 1e-4           # smaller learned weights are treated as zero
+_EPS = 1e-6
+
+
+# ---------------------------------------------------
+# OUT-OF-FOLD MEMBER OUTPUTS
+# ---------------------------------------------------
+
+def specs_from_bundle(bundle):
+    """src.training specs that refit each member of a fitted bundle with the same settings."""
+    from src.model import MEMBERS
+    from src.training import booster_spec, estimator_spec
+    specs = {}
+    for name in MEMBERS:
+        model = bundle.get(name)
+        if model is None:
+            continue
+        if hasattr(model, "get_params"):
+            params = model.get_params(deep=False)
+            n_jobs = "n_jobs" if "n_jobs" in params else None
+            params.pop("n_jobs", None)
+            if name == "lgbm":
+                params["verbose"] = -1      # fold refits only; the fitted model is unchanged
+            specs[name] = estimator_spec(type(model), n_jobs, **params)
+        else:   # raw LightGBM Booster
+            params = {k: v for k, v in model.params.items()
+                      if k not in ("num_threads", "num_iterations")}
+            specs[name] = booster_spec(params, model.current_iteration())
+    return specs
+
+
+def oof_predictions(cache, specs, cores=None, parallel=True, verbose=True):
+    """
+    Out-of-fold positive-class probabilities of every spec over the cached
+    folds. Returns (DataFrame rows x members, y).
+    """
+    import pandas as pd
+    from src.model import member_proba
+    from src.search import fold_val_index, load_fold, load_full
+    from src.training import train_members
+    _, y = load_full(cache)
+    oof = np.full((len(y), len(specs)), np.nan)
+    for k in range(cache["folds"]):
+        X_tr, y_tr, X_va, _ = load_fold(cache, k)
+        models, _ = train_members(X_tr, y_tr, specs, cores=cores, parallel=parallel,
+                                  verbose=False)
+        idx = fold_val_index(cache, k)
+        for j, name in enumerate(specs):
+            oof[idx, j] = member_proba(models[name], X_va)
+        if verbose:
+            print(f"[stacking] fold {k + 1}/{cache['folds']} done")
+    return pd.DataFrame(oof, columns=list(specs)), y
+
+
+def member_latency(bundle, X_row, repeat=30):
+    """Median single-row latency (ms) of each member as predict_ensemble calls it."""
+    from src.model import MEMBERS, _member_predict
+    out = {}
+    for name in MEMBERS:
+        if name not in bundle:
+            continue
+        _member_predict(bundle, name, X_row)      # warm up
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            _member_predict(bundle, name, X_row)
+            times.append(time.perf_counter() - t0)
+        out[name] = float(np.median(times) * 1e3)
+    return out
+
+
+# ---------------------------------------------------
+# WEIGHTS
+# ---------------------------------------------------
+
+def _log_loss(p, y):
+    p = np.clip(p, _EPS, 1 - _EPS)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def fit_weights(P, y):
+    """Convex weights (>= 0, sum 1) over the columns of P minimising log loss."""
+    from scipy.optimize import minimize
+    P, y = np.asarray(P, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    m = P.shape[1]
+    if m == 1:
+        return np.ones(1)
+    res = minimize(lambda w: _log_loss(P @ w, y), np.full(m, 1.0 / m), method="SLSQP",
+                   bounds=[(0.0, 1.0)] * m,
+                   constraints=[{"type": "eq", "fun": lambda w: w.sum() - 1.0}])
+    w = np.clip(res.x, 0.0, None)
+    w[w < MIN_WEIGHT] = 0.0
+    return w / w.sum() if w.sum() > 0 else np.full(m, 1.0 / m)
+
+
+def cv_auc(P, y, n_folds=CV_FOLDS, seed=0):
+    """AUC of fit_weights when the weights are learned on other out-of-fold rows."""
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import StratifiedKFold
+    P, y = np.asarray(P, dtype=np.float64), np.asarray(y)
+    scores = np.empty(len(y))
+    for tr, va in StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(P, y):
+        scores[va] = P[va] @ fit_weights(P[tr], y[tr])
+    return float(roc_auc_score(y, scores))
+
+
+def fit_stacker(oof, y, latency_ms=None, tol=PRUNE_TOLERANCE, verbose=True):
+    """Learned weights plus pruning over the out-of-fold member outputs (see module doc)."""
+    from sklearn.metrics import roc_auc_score
+    y = np.asarray(y)
+    latency_ms = latency_ms or {}
+    kept = list(oof.columns)
+    auc_all = cv_auc(oof[kept], y)
+    for name in sorted(kept, key=lambda n: -latency_ms.get(n, 0.0)):
+        if len(kept) == 1:
+            break
+        trial = [n for n in kept if n != name]
+        auc = cv_auc(oof[trial], y)
+        if verbose:
+            print(f"[stacking] without {name:<9} cv AUC {auc:.4f} (all members {auc_all:.4f})")
+        if auc >= auc_all - tol:
+            kept = trial
+
+    w = fit_weights(oof[kept], y)
+    kept, w = [n for n, wi in zip(kept, w) if wi > 0], w[w > 0]
+    stacker = {"version": 1, "members": kept, "weights": [float(x) for x in w],
+               "pruned": [n for n in oof.columns if n not in kept],
+               "auc": cv_auc(oof[kept], y), "auc_all": auc_all,
+               "auc_mean": float(roc_auc_score(y, oof.mean(axis=1))),
+               "member_auc": {n: float(roc_auc_score(y, oof[n])) for n in oof.columns},
+               "latency_ms": {n: float(v) for n, v in latency_ms.items()}}
+    if verbose:
+        print(f"[stacking] members {kept} weights {[round(x, 3) for x in stacker['weights']]}; "
+              f"cv AUC {stacker['auc']:.4f} vs equal mean {stacker['auc_mean']:.4f}; "
+              f"pruned {stacker['pruned'] or 'none'}")
+    return stacker
+
+
+def stack_bundle(bundle, cache, tol=PRUNE_TOLERANCE, cores=None, parallel=True, verbose=True):
+    """Fits a stacker for a fitted bundle over the fold cache and stores it in bundle["stacker"]."""
+    from src.search import load_full
+    X, _ = load_full(cache)
+    row = X.iloc[:1] if hasattr(X, "iloc") else np.asarray(X)[:1]
+    specs = specs_from_bundle(bundle)
+    oof, y = oof_predictions(cache, specs, cores=cores, parallel=parallel, verbose=verbose)
+    bundle["stacker"] = fit_stacker(oof, y, member_latency(bundle, row), tol=tol, verbose=verbose)
+    return bundle["stacker"]
+
+
+def main(argv=None):
+    import argparse
+    from src.artifact import is_artifact, read_manifest, save_bundle
+    from src.model import DEFAULT_BUNDLE, load_bundle
+    from src.search import csv_fold_cache
+
+    ap = argparse.ArgumentParser(description="Learn ensemble weights and prune members.")
+    ap.add_argument("csv", nargs="?", default="data/training_data.csv")
+    ap.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    ap.add_argument("--out", default=None, help="artifact directory to write (default: --bundle)")
+    ap.add_argument("--text-col", default="text")
+    ap.add_argument("--label-col", default="label")
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--tol", type=float, default=PRUNE_TOLERANCE,
+                    help="AUC a pruned member may cost (default: none)")
+    ap.add_argument("--drop-pruned", action="store_true",
+                    help="remove pruned members from the artifact, not just from inference")
+    ap.add_argument("--compiled", default=None, help="also export a compiled .npz (src/compiled.py)")
+    args = ap.parse_args(argv)
+
+    bundle = load_bundle(args.bundle, mmap=False)
+    if bundle is None:
+        raise SystemExit(1)
+    cache = csv_fold_cache(args.csv, args.text_col, args.label_col, args.folds, args.seed)
+    stacker = stack_bundle(bundle, cache, tol=args.tol)
+    if args.drop_pruned:
+        for name in stacker["pruned"]:
+            bundle.pop(name, None)
+    out = args.out or args.bundle
+    extra = read_manifest(args.bundle).get("extra", {}) if is_artifact(args.bundle) else {}
+    save_bundle(bundle, out, extra=dict(extra, stacker={k: stacker[k] for k in (
+        "members", "weights", "pruned", "auc", "auc_mean")}))
+    print("Saved ensemble to", out)
+    if args.compiled:
+        from src.compiled import export_compiled
+        diff = export_compiled(out, args.compiled)
+        print(f"Compiled ensemble -> {args.compiled} (max |diff| {diff:.1e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+# src/storage.py
+import math
+import os
+import sqlite3
+import threading
+import json
+import pandas as pd
+
+from src.sketches import KLLSketch
+
+# ============================================================
+#                FILE PATHS & CONSTANTS
+# ============================================================
+
+DB_FILE = "data/assessments.db"
+LEGACY_CSV = "data/user_assessments.csv"
+TABLE = "assessments"
+
+# Union of the dashboard rows (add_user_assessment) and the
+# multi-domain screening rows (run_assessment), in CSV header order.
+ASSESSMENT_COLUMNS = [
+    "user_id", "assessment_type", "score", "created_at",
+    "id", "timestamp", "phq9", "phq9_item9", "gad7", "mdq_symptoms",
+    "mdq_positive", "pqb", "mem_score", "vf_score", "clock_score",
+    "taps", "summary",
+]
+
+# Running aggregates kept next to the rows (see SUMMARIES below). Dashboard
+# rows carry one "score" under their assessment_type; screening rows
+# (run_assessment) have no type and are summarised per instrument.
+SUMMARY_VERSION = "2"
+SCREENING_KIND = "screening"
+SUMMARY_METRICS = [
+    "score", "phq9", "gad7", "mdq_symptoms", "pqb",
+    "mem_score", "vf_score", "clock_score", "taps",
+]
+
+_LOCK = threading.Lock()
+_COLUMNS = {}   # db path -> set of known column names
+
+
+def _q(name):
+    """Quote an identifier for SQLite."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _clean(value):
+    """Convert pandas/NumPy scalars and NaN to plain SQLite values."""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        return str(value)
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    return str(value)
+
+
+# ============================================================
+#                SCHEMA / MIGRATION
+# ============================================================
+
+def _init_db(db_path):
+    """Create the store (WAL mode) once per process and import the legacy CSV."""
+    with _LOCK:
+        if db_path in _COLUMNS:
+            return
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = _connect(db_path)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            cols = ", ".join(_q(c) for c in ASSESSMENT_COLUMNS)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ({cols})")
+            conn.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT)")
+            _COLUMNS[db_path] = {r[1] for r in conn.execute(f"PRAGMA table_info({TABLE})")}
+            _init_summaries(conn, db_path)
+        finally:
+            conn.close()
+    if db_path == DB_FILE:
+        migrate_csv(LEGACY_CSV, db_path)
+
+
+def _ensure_columns(conn, db_path, names):
+    """Add columns for record keys the table has not seen yet (rare, schema-only)."""
+    known = _COLUMNS[db_path]
+    missing = [n for n in names if n not in known]
+    if not missing:
+        return
+    known.update(r[1] for r in conn.execute(f"PRAGMA table_info({TABLE})"))
+    for name in missing:
+        if name not in known:
+            conn.execute(f"ALTER TABLE {TABLE} ADD COLUMN {_q(name)}")
+            known.add(name)
+
+
+def _insert_rows(conn, db_path, records):
+    by_cols = {}
+    for rec in records:
+        by_cols.setdefault(tuple(rec.keys()), []).append(rec)
+    for cols, recs in by_cols.items():
+        _ensure_columns(conn, db_path, cols)
+        sql = (f"INSERT INTO {TABLE} ({', '.join(_q(c) for c in cols)}) "
+               f"VALUES ({', '.join('?' for _ in cols)})")
+        conn.executemany(sql, [[_clean(r[c]) for c in cols] for r in recs])
+
+
+def migrate_csv(csv_path=LEGACY_CSV, db_path=DB_FILE, chunksize=50_000):
+    """
+    Imports an existing assessments CSV into the store, once.
+    Returns the number of rows imported (0 if already migrated or missing).
+    """
+    _init_db(db_path)
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return 0
+    key = "migrated:" + os.path.abspath(csv_path)
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM _meta WHERE key = ?", (key,)).fetchone():
+            conn.execute("ROLLBACK")
+            return 0
+        total = 0
+        try:
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+                records = chunk.to_dict("records")
+                _insert_rows(conn, db_path, records)
+                _update_summaries(conn, records)
+                total += len(records)
+        except pd.errors.EmptyDataError:
+            pass
+        conn.execute("INSERT INTO _meta (key, value) VALUES (?, ?)", (key, str(total)))
+        conn.execute("COMMIT")
+        return total
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+# ============================================================
+#                SUMMARIES
+# ============================================================
+# Updated in the same transaction as every insert, so readers get counts,
+# means and daily trends without scanning the history:
+#   summary_kinds    one row per assessment kind: rows, last time
+#   summary_metrics  one row per (kind, metric): n, sum, sum of squares,
+#                    min, max, last value
+#   summary_trend    one row per (day, kind, metric): n, sum
+#   summary_sketches one row per (kind, metric): KLL quantile sketch (JSON)
+
+def _init_summaries(conn, db_path):
+    conn.execute("CREATE TABLE IF NOT EXISTS summary_kinds "
+                 "(kind TEXT PRIMARY KEY, n INTEGER, last_at TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS summary_metrics "
+                 "(kind TEXT, metric TEXT, n INTEGER, total REAL, total_sq REAL, "
+                 "min REAL, max REAL, last REAL, PRIMARY KEY (kind, metric))")
+    conn.execute("CREATE TABLE IF NOT EXISTS summary_trend "
+                 "(bucket TEXT, kind TEXT, metric TEXT, n INTEGER, total REAL, "
+                 "PRIMARY KEY (bucket, kind, metric))")
+    conn.execute("CREATE TABLE IF NOT EXISTS summary_sketches "
+                 "(kind TEXT, metric TEXT, sketch TEXT, PRIMARY KEY (kind, metric))")
+    # first run on an existing store (or a new summary layout): rebuild once
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT value FROM _meta WHERE key = 'summary_version'").fetchone()
+        if row and row[0] == SUMMARY_VERSION:
+            conn.execute("COMMIT")
+            return
+        for table in ("summary_kinds", "summary_metrics", "summary_trend", "summary_sketches"):
+            conn.execute(f"DELETE FROM {table}")
+        cur = conn.execute(f"SELECT * FROM {TABLE} ORDER BY rowid")
+        names = [d[0] for d in cur.description]
+        while True:
+            rows = cur.fetchmany(50_000)
+            if not rows:
+                break
+            _update_summaries(conn, [dict(zip(names, r)) for r in rows])
+        conn.execute("INSERT OR REPLACE INTO _meta (key, value) VALUES ('summary_version', ?)",
+                     (SUMMARY_VERSION,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _number(value):
+    value = _clean(value)
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if value is None or isinstance(value, bytes) or math.isnan(value):
+        return None
+    return float(value)
+
+
+def _update_summaries(conn, records):
+    """Folds `records` into the summary tables (one upsert per touched key)."""
+    kinds, metrics, trend, values = {}, {}, {}, {}
+    for rec in records:
+        kind = _clean(rec.get("assessment_type")) or SCREENING_KIND
+        when = _clean(rec.get("created_at")) or _clean(rec.get("timestamp"))
+        when = str(when) if when is not None else None
+        n, last_at = kinds.get(kind, (0, None))
+        kinds[kind] = (n + 1, when or last_at)
+        for metric in SUMMARY_METRICS:
+            x = _number(rec.get(metric))
+            if x is None:
+                continue
+            m = metrics.get((kind, metric))
+            if m is None:
+                metrics[(kind, metric)] = [1, x, x * x, x, x, x]
+            else:
+                m[0] += 1
+                m[1] += x
+                m[2] += x * x
+                m[3] = min(m[3], x)
+                m[4] = max(m[4], x)
+                m[5] = x
+            values.setdefault((kind, metric), []).append(x)
+            if when:
+                t = trend.setdefault((when[:10], kind, metric), [0, 0.0])
+                t[0] += 1
+                t[1] += x
+
+    conn.executemany(
+        "INSERT INTO summary_kinds (kind, n, last_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (kind) DO UPDATE SET n = n + excluded.n, "
+        "last_at = COALESCE(excluded.last_at, last_at)",
+        [(k, n, last_at) for k, (n, last_at) in kinds.items()])
+    conn.executemany(
+        "INSERT INTO summary_metrics (kind, metric, n, total, total_sq, min, max, last) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (kind, metric) DO UPDATE SET n = n + excluded.n, "
+        "total = total + excluded.total, total_sq = total_sq + excluded.total_sq, "
+        "min = MIN(min, excluded.min), max = MAX(max, excluded.max), last = excluded.last",
+        [(k, m, *v) for (k, m), v in metrics.items()])
+    conn.executemany(
+        "INSERT INTO summary_trend (bucket, kind, metric, n, total) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (bucket, kind, metric) DO UPDATE SET n = n + excluded.n, "
+        "total = total + excluded.total",
+        [(b, k, m, n, total) for (b, k, m), (n, total) in trend.items()])
+    for (kind, metric), xs in values.items():
+        row = conn.execute("SELECT sketch FROM summary_sketches WHERE kind = ? AND metric = ?",
+                           (kind, metric)).fetchone()
+        sketch = KLLSketch.from_dict(json.loads(row[0])) if row else KLLSketch()
+        conn.execute("INSERT OR REPLACE INTO summary_sketches (kind, metric, sketch) "
+                     "VALUES (?, ?, ?)", (kind, metric, json.dumps(sketch.update(xs).to_dict())))
+
+
+# ============================================================
+#                APPEND / READ
+# ============================================================
+
+def append_record(record: dict, db_path=DB_FILE):
+    """Appends one assessment row. O(1) in history size and safe across sessions."""
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _insert_rows(conn, db_path, [record])
+        _update_summaries(conn, [record])
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return True
+
+
+def load_assessments(db_path=DB_FILE):
+    """Returns the full assessment history as a DataFrame, oldest first."""
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM {TABLE} ORDER BY rowid", conn)
+    finally:
+        conn.close()
+
+
+def _kind_condition(kind):
+    """SQL condition (and params) selecting one assessment kind; "" for every row."""
+    if kind == SCREENING_KIND:
+        return "(assessment_type IS NULL OR assessment_type = '')", ()
+    if kind is not None:
+        return "assessment_type = ?", (kind,)
+    return "", ()
+
+
+def latest_assessment(db_path=DB_FILE, kind=None):
+    """
+    Most recent assessment row as a dict (None if there is none), read from
+    the end of the rowid index. `kind` restricts it to one assessment_type,
+    or to screening rows with SCREENING_KIND.
+    """
+    _init_db(db_path)
+    cond, params = _kind_condition(kind)
+    where = f"WHERE {cond}" if cond else ""
+    conn = _connect(db_path)
+    try:
+        cur = conn.execute(f"SELECT * FROM {TABLE} {where} ORDER BY rowid DESC LIMIT 1", params)
+        row = cur.fetchone()
+        return dict(zip([d[0] for d in cur.description], row)) if row else None
+    finally:
+        conn.close()
+
+
+def recent_assessments(limit=50, db_path=DB_FILE):
+    """The last `limit` rows, oldest first (tail read on rowid)."""
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        df = pd.read_sql_query(
+            f"SELECT * FROM {TABLE} ORDER BY rowid DESC LIMIT ?", conn, params=(int(limit),))
+        return df.iloc[::-1].reset_index(drop=True)
+    finally:
+        conn.close()
+
+
+def assessment_summary(db_path=DB_FILE):
+    """
+    Running aggregates for the dashboards; size depends on the number of
+    kinds / metrics / days, never on the number of rows.
+
+        {"count": int,
+         "kinds":   DataFrame[kind, n, last_at],
+         "metrics": DataFrame[kind, metric, n, mean, std, min, max, last],
+         "trend":   DataFrame[bucket, kind, metric, n, mean]}
+    """
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        kinds = pd.read_sql_query("SELECT kind, n, last_at FROM summary_kinds ORDER BY kind", conn)
+        metrics = pd.read_sql_query(
+            "SELECT kind, metric, n, total, total_sq, min, max, last "
+            "FROM summary_metrics ORDER BY kind, metric", conn)
+        trend = pd.read_sql_query(
+            "SELECT bucket, kind, metric, n, total FROM summary_trend "
+            "ORDER BY bucket, kind, metric", conn)
+    finally:
+        conn.close()
+    mean = metrics["total"] / metrics["n"]
+    n = metrics["n"]
+    # sample variance, as pandas' .std() reports
+    var = ((metrics["total_sq"] - n * mean ** 2) / (n - 1).where(n > 1)).clip(lower=0)
+    metrics = metrics.assign(mean=mean, std=var ** 0.5)[
+        ["kind", "metric", "n", "mean", "std", "min", "max", "last"]]
+    trend = trend.assign(mean=trend["total"] / trend["n"]).drop(columns="total")
+    return {"count": int(kinds["n"].sum()), "kinds": kinds, "metrics": metrics, "trend": trend}
+
+
+def metric_sketch(kind, metric, db_path=DB_FILE):
+    """KLLSketch of every stored value of `metric` for `kind` (None if never seen)."""
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT sketch FROM summary_sketches WHERE kind = ? AND metric = ?",
+                           (kind, metric)).fetchone()
+    finally:
+        conn.close()
+    return KLLSketch.from_dict(json.loads(row[0])) if row else None
+
+
+# ============================================================
+#                BULK COLUMN UPDATES (re-scoring)
+# ============================================================
+# Batch jobs (src/rescore.py) walk the history in rowid ranges and write a
+# derived column back; each range is one transaction that can also record
+# the job's checkpoint in _meta.
+
+def max_rowid(db_path=DB_FILE):
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {TABLE}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def read_rows(lo, hi, columns, kind=None, db_path=DB_FILE):
+    """
+    Rows with lo < rowid <= hi as a DataFrame, rowid in "_rowid". Only the
+    `columns` the table has are read; `kind` as in latest_assessment.
+    """
+    _init_db(db_path)
+    cols = [c for c in columns if c in _COLUMNS[db_path]]
+    cond, params = _kind_condition(kind)
+    sql = (f"SELECT rowid AS _rowid{''.join(', ' + _q(c) for c in cols)} FROM {TABLE} "
+           f"WHERE rowid > ? AND rowid <= ?{' AND ' + cond if cond else ''} ORDER BY rowid")
+    conn = _connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=(int(lo), int(hi)) + params)
+    finally:
+        conn.close()
+
+
+def get_meta(key, db_path=DB_FILE):
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT value FROM _meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def write_column(name, rowids, values, checkpoint=None, db_path=DB_FILE):
+    """
+    Sets column `name` (added if new) on the given rowids in one
+    transaction. checkpoint=(key, value) is stored in _meta in the same
+    transaction, so it never runs ahead of the rows written.
+    """
+    _init_db(db_path)
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _ensure_columns(conn, db_path, [name])
+        conn.executemany(f"UPDATE {TABLE} SET {_q(name)} = ? WHERE rowid = ?",
+                         zip(map(_clean, values), map(int, rowids)))
+        if checkpoint is not None:
+            conn.execute("INSERT INTO _meta (key, value) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                         (checkpoint[0], str(checkpoint[1])))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,253 @@
+# src/training.py
+"""
+Ensemble training orchestrator.
+
+    specs = default_members(random_state=42)
+    bundle, report = train_members(X_train, y_train, specs, X_val=X_test, y_val=y_test)
+
+    python -m src.training data/training_data.csv --out models/final_model
+
+Members are fitted concurrently, one worker process each. The training
+matrix is written once to a .npy file (CSR parts for sparse input) that
+every worker memory-maps read-only, so it is not copied per member.
+Cores are budgeted: every member gets one, and the rest go to the members
+that can use them (RF trees, LightGBM threads) by CORE_WEIGHTS. Fitted one
+after another (parallel=False), each member gets every core instead. Each
+member's wall time and peak RSS are reported, so a retrain takes about as
+long as the slowest member.
+"""
+import functools
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from src.perf import peak_rss_mb, track_peak_rss
+
+# Members that scale with extra cores, and their share of the spare ones
+CORE_WEIGHTS = {"rf": 1.0, "lgbm": 1.0}
+SHARE_DIR = None    # directory for the shared training matrix; None = system temp
+
+
+# ---------------------------------------------------
+# MEMBER SPECS
+# ---------------------------------------------------
+# A spec is a picklable callable spec(X, y, n_jobs) -> fitted model.
+
+def _fit_estimator(cls, params, n_jobs_param, X, y, n_jobs):
+    kwargs = dict(params)
+    if n_jobs_param:
+        kwargs[n_jobs_param] = n_jobs
+    return cls(**kwargs).fit(X, y)
+
+
+def _fit_booster(params, num_boost_round, X, y, n_jobs):
+    import lightgbm as lgb
+    params = dict(params, num_threads=n_jobs)
+    return lgb.train(params, lgb.Dataset(X, label=y), num_boost_round=num_boost_round)
+
+
+def estimator_spec(cls, n_jobs_param=None, **params):
+    """Spec for a scikit-learn style estimator; `n_jobs_param` receives the core budget."""
+    return functools.partial(_fit_estimator, cls, params, n_jobs_param)
+
+
+def booster_spec(params, num_boost_round=100):
+    """Spec for a raw lightgbm.train Booster (num_threads receives the core budget)."""
+    return functools.partial(_fit_booster, params, num_boost_round)
+
+
+def default_members(random_state=None, logistic_max_iter=1000, rf_estimators=200,
+                    mlp_layers=(64, 32), mlp_max_iter=600):
+    """The production ensemble (logistic, rf, mlp, lgbm) as specs."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neural_network import MLPClassifier
+    specs = {
+        "logistic": estimator_spec(LogisticRegression, max_iter=logistic_max_iter),
+        "rf": estimator_spec(RandomForestClassifier, "n_jobs",
+                             n_estimators=rf_estimators, random_state=random_state),
+        "mlp": estimator_spec(MLPClassifier, hidden_layer_sizes=mlp_layers,
+                              max_iter=mlp_max_iter, random_state=random_state),
+    }
+    try:
+        from lightgbm import LGBMClassifier
+        specs["lgbm"] = estimator_spec(LGBMClassifier, "n_jobs", random_state=random_state,
+                                       verbose=-1)
+    except ImportError:
+        print("[WARN] LightGBM not installed; the lgbm slot falls back to RF")
+        specs["lgbm"] = specs["rf"]
+    return specs
+
+
+def budget_cores(names, total=None, weights=CORE_WEIGHTS):
+    """
+    Cores per member: one each, spare cores split among weighted members.
+    With fewer cores than members every member still gets one.
+    """
+    total = total or os.cpu_count() or 1
+    budget = {n: 1 for n in names}
+    spare = total - len(names)
+    weighted = {n: weights[n] for n in names if weights.get(n)}
+    if spare > 0 and weighted:
+        scale = sum(weighted.values())
+        shares = {n: spare * w / scale for n, w in weighted.items()}
+        for n, s in shares.items():
+            budget[n] += int(s)
+        left = spare - sum(int(s) for s in shares.values())
+        for n in sorted(shares, key=lambda n: shares[n] - int(shares[n]), reverse=True)[:left]:
+            budget[n] += 1
+    return budget
+
+
+# ---------------------------------------------------
+# SHARED READ-ONLY MATRIX
+# ---------------------------------------------------
+
+def _npy_backing(X):
+    """Path of the .npy file X maps in its entirety (e.g. a feature store), else None."""
+    path = getattr(X, "filename", None)
+    if not isinstance(X, np.memmap) or not path or not str(path).endswith(".npy") \
+            or not X.flags.c_contiguous:
+        return None
+    whole = np.load(path, mmap_mode="r")
+    return path if whole.shape == X.shape and whole.dtype == X.dtype else None
+
+
+def _share(X, directory):
+    """
+    Writes X once and returns a small picklable descriptor of it. A matrix
+    that is already a memory-mapped .npy is shared from its own file.
+    """
+    columns = list(X.columns) if hasattr(X, "columns") else None
+    if columns is None and _npy_backing(X):
+        return {"kind": "dense", "path": _npy_backing(X), "columns": None}
+    if hasattr(X, "tocsr"):
+        m = X.tocsr()
+        parts = {}
+        for part in ("data", "indices", "indptr"):
+            parts[part] = os.path.join(directory, f"X_{part}.npy")
+            np.save(parts[part], getattr(m, part))
+        return {"kind": "csr", "parts": parts, "shape": m.shape}
+    path = os.path.join(directory, "X.npy")
+    np.save(path, np.ascontiguousarray(X.to_numpy() if columns else X))
+    return {"kind": "dense", "path": path, "columns": columns}
+
+
+def _open_shared(desc):
+    if desc["kind"] == "csr":
+        import scipy.sparse as sp
+        parts = {k: np.load(p, mmap_mode="r") for k, p in desc["parts"].items()}
+        return sp.csr_matrix((parts["data"], parts["indices"], parts["indptr"]),
+                             shape=desc["shape"], copy=False)
+    X = np.load(desc["path"], mmap_mode="r")
+    if desc["columns"]:
+        import pandas as pd
+        return pd.DataFrame(X, columns=desc["columns"], copy=False)
+    return X
+
+
+# ---------------------------------------------------
+# FIT
+# ---------------------------------------------------
+
+def _fit_member(name, spec, X, y, cores):
+    from threadpoolctl import threadpool_limits
+    t0 = time.perf_counter()
+    with threadpool_limits(limits=cores), track_peak_rss() as mem:
+        model = spec(X, y, cores)
+    return name, model, {"member": name, "cores": cores,
+                         "wall_s": time.perf_counter() - t0,
+                         "peak_rss_mb": mem.peak_mb,
+                         "rss_delta_mb": (mem.peak_mb - mem.start_mb)
+                         if mem.start_mb is not None else None}
+
+
+def _fit_shared(name, spec, desc, y, cores):
+    """Pool worker: opens the shared matrix (memory-mapped) and fits one member."""
+    return _fit_member(name, spec, _open_shared(desc), y, cores)
+
+
+def train_members(X, y, specs=None, cores=None, parallel=True, X_val=None, y_val=None,
+                  verbose=True):
+    """
+    Fits every spec on (X, y). Returns (models, report) where models maps
+    member name -> fitted model and report is a DataFrame with per-member
+    cores, wall time, peak RSS and, with X_val / y_val, validation accuracy.
+    """
+    import pandas as pd
+    specs = specs or default_members()
+    concurrent = parallel and len(specs) > 1
+    # the budget is split only between members that actually run at the same time
+    budget = budget_cores(list(specs), cores) if concurrent else \
+        dict.fromkeys(specs, cores or os.cpu_count() or 1)
+    y = np.asarray(y)
+    t0 = time.perf_counter()
+    results = []
+    if concurrent:
+        from concurrent.futures import ProcessPoolExecutor
+        share = tempfile.mkdtemp(prefix="neuromindx-train-", dir=SHARE_DIR)
+        try:
+            desc = _share(X, share)
+            with ProcessPoolExecutor(max_workers=len(specs)) as pool:
+                futures = [pool.submit(_fit_shared, n, s, desc, y, budget[n])
+                           for n, s in specs.items()]
+                results = [f.result() for f in futures]
+        finally:
+            shutil.rmtree(share, ignore_errors=True)
+    else:
+        results = [_fit_member(n, s, X, y, budget[n]) for n, s in specs.items()]
+    wall = time.perf_counter() - t0
+
+    models = {name: model for name, model, _ in results}
+    report = pd.DataFrame([info for _, _, info in results])
+    if X_val is not None and y_val is not None:
+        report["val_accuracy"] = [_accuracy(models[n], X_val, y_val) for n in report["member"]]
+    if verbose:
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+        slowest = report["wall_s"].max()
+        print(f"[train] {len(models)} members in {wall:.2f}s "
+              f"(slowest member {slowest:.2f}s, sum {report['wall_s'].sum():.2f}s, "
+              f"{'parallel' if parallel else 'sequential'}, "
+              f"{cores or os.cpu_count() or 1} cores available); "
+              f"parent peak RSS {peak_rss_mb() or 0:.0f} MB")
+    report.attrs["wall_s"] = wall
+    return models, report
+
+
+def _accuracy(model, X, y):
+    pred = np.asarray(model.predict(X))
+    if pred.dtype.kind == "f" and not hasattr(model, "classes_"):
+        pred = (pred > 0.5).astype(int)     # raw Booster: probabilities
+    return float(np.mean(pred == np.asarray(y)))
+
+
+def main(argv=None):
+    import argparse
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from src.artifact import save_bundle
+    from src.features import FEATURE_COLUMNS, extract_features_batch
+
+    ap = argparse.ArgumentParser(description="Train the ensemble members concurrently.")
+    ap.add_argument("csv", nargs="?", default="data/training_data.csv")
+    ap.add_argument("--out", default=None, help="artifact directory to write (default: none)")
+    ap.add_argument("--cores", type=int, default=None)
+    ap.add_argument("--sequential", action="store_true")
+    args = ap.parse_args(argv)
+
+    df = pd.read_csv(args.csv)
+    X = pd.DataFrame(extract_features_batch(df["text"]), columns=FEATURE_COLUMNS)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, df["label"], test_size=0.2, random_state=42, stratify=df["label"])
+    models, _ = train_members(X_train, y_train, default_members(random_state=42),
+                              cores=args.cores, parallel=not args.sequential,
+                              X_val=X_test, y_val=y_test)
+    if args.out:
+        save_bundle(models, args.out)
+        print("Saved ensemble to", args.out)
+
+
+if __name__ == "__main__":
+    main()
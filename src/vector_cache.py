@@ -0,0 +1,166 @@
+# src/vector_cache.py
+"""
+Content-hash keyed cache of fixed-length float32 vectors.
+
+An in-memory LRU sits in front of an append-only on-disk store:
+
+    <directory>/meta.json     {"dim": ...}
+    <directory>/vectors.f32   row-major float32, read through np.memmap
+    <directory>/keys.txt      one hex digest per line; line i <-> row i
+
+    <directory>/.lock         flock()ed by writers
+
+Rows are written before their keys, so a crash can only leave unused
+trailing bytes, never a key pointing at a missing row. Writers (threads,
+pool workers, app sessions sharing the directory) hold an exclusive
+flock on .lock while they re-read the index and append, so appends from
+different processes never interleave. Readers take no lock: they only
+use keys whose line is complete and whose row is already on disk.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows: only the in-process lock applies
+    fcntl = None
+
+
+def content_key(data):
+    """Stable digest of a str / bytes payload."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class VectorCache:
+
+    def __init__(self, directory, dim, capacity=50_000):
+        self.directory = directory
+        self.dim = int(dim)
+        self.capacity = capacity
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._index = {}
+        self._mmap = None
+        os.makedirs(directory, exist_ok=True)
+        self._vec_path = os.path.join(directory, "vectors.f32")
+        self._key_path = os.path.join(directory, "keys.txt")
+        self._lock_path = os.path.join(directory, ".lock")
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored = json.load(f).get("dim")
+            if stored != self.dim:
+                raise ValueError(f"{directory} holds {stored}-dim vectors, expected {self.dim}")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": self.dim}, f)
+        self._load_index()
+
+    # ---------------------------------------------------
+    # DISK STORE
+    # ---------------------------------------------------
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        """Exclusive across processes sharing the directory (and threads of this one)."""
+        with self._lock, open(self._lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _load_index(self, writer=False):
+        """
+        Reads keys.txt. Only complete lines with a row on disk count.
+        With writer=True (write lock held) trailing rows whose keys never
+        made it to disk are truncated, so the next append lines up.
+        """
+        keys = []
+        if os.path.exists(self._key_path):
+            with open(self._key_path) as f:
+                keys = f.read().split("\n")[:-1]   # a line still being written has no "\n"
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vec_path) if os.path.exists(self._vec_path) else 0
+        keys = keys[:size // row_bytes]
+        if writer and size > len(keys) * row_bytes:
+            with open(self._vec_path, "r+b") as f:
+                f.truncate(len(keys) * row_bytes)
+        self._index = {k: i for i, k in enumerate(keys)}
+        self._rows = len(keys)
+        self._mmap = None
+
+    def _vectors(self):
+        if self._mmap is None or len(self._mmap) < self._rows:
+            self._mmap = (np.memmap(self._vec_path, dtype=np.float32, mode="r",
+                                    shape=(self._rows, self.dim)) if self._rows else None)
+        return self._mmap
+
+    def __len__(self):
+        return self._rows
+
+    def __contains__(self, key):
+        return key in self._lru or key in self._index
+
+    # ---------------------------------------------------
+    # LOOKUP / INSERT
+    # ---------------------------------------------------
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys that are cached."""
+        found = {}
+        with self._lock:
+            disk = []
+            for k in keys:
+                v = self._lru.get(k)
+                if v is not None:
+                    self._lru.move_to_end(k)
+                    found[k] = v
+                elif k in self._index:
+                    disk.append(k)
+            if disk:
+                rows = np.fromiter((self._index[k] for k in disk), dtype=np.int64, count=len(disk))
+                block = np.array(self._vectors()[rows])
+                for k, v in zip(disk, block):
+                    found[k] = v
+                    self._remember(k, v)
+        return found
+
+    def put_many(self, keys, vectors):
+        """Stores vectors for keys not already on disk."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+        with self._write_lock():
+            # other processes may have appended since this one last looked
+            self._load_index(writer=True)
+            first = {}
+            for i, k in enumerate(keys):
+                if k not in self._index:
+                    first.setdefault(k, i)
+            new = list(first.values())
+            if new:
+                with open(self._vec_path, "ab") as f:
+                    f.write(vectors[new].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self._key_path, "a") as f:
+                    f.write("".join(keys[i] + "\n" for i in new))
+                for i in new:
+                    self._index[keys[i]] = self._rows
+                    self._rows += 1
+            for k, v in zip(keys, vectors):
+                self._remember(k, v)
+
+    def _remember(self, key, vec):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
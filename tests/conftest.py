@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# the repo is not an installed package; tests import src.* and report from the root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
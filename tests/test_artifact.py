@@ -0,0 +1,63 @@
+# tests/test_artifact.py
+import json
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from src.artifact import MANIFEST, load_artifact, save_bundle
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.random((60, 4)), np.r_[np.zeros(30), np.ones(30)]
+    bundle = {"logistic": LogisticRegression().fit(X, y),
+              "rf": RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y),
+              "feature_columns": ["a", "b", "c", "d"]}
+    path = save_bundle(bundle, str(tmp_path / "model"))
+    return path, bundle, X
+
+
+def _tamper(path, entry):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    manifest["bundle"]["items"].append(["evil", entry])
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+
+def test_round_trip(artifact):
+    path, bundle, X = artifact
+    loaded = load_artifact(path)
+    for name in ("logistic", "rf"):
+        np.testing.assert_array_equal(loaded[name].predict_proba(X), bundle[name].predict_proba(X))
+
+
+@pytest.mark.parametrize("entry", [
+    # a callable from an allowed package that would unpickle a file
+    {"__reduced__": "sklearn.utils._joblib.load", "args": {"__tuple__": ["/tmp/x.pkl"]},
+     "state": None},
+    {"__reduced__": "joblib.load", "args": {"__tuple__": ["/tmp/x.pkl"]}, "state": None},
+    # an allowed class, but only the Cython Tree may be constructed from arguments
+    {"__reduced__": "sklearn.linear_model._logistic.LogisticRegression",
+     "args": {"__tuple__": []}, "state": {}},
+    {"__object__": "sklearn.utils._joblib.load", "state": {"__dict__": "dict", "items": []}},
+    {"__object__": "os.system", "state": {"__dict__": "dict", "items": []}},
+    {"__class__": "sklearn.utils._joblib.load"},
+    {"__class__": "numpy.load"},
+])
+def test_rejects_callables_outside_the_allowlist(artifact, entry):
+    path, _, _ = artifact
+    _tamper(path, entry)
+    with pytest.raises(TypeError, match="refusing to load"):
+        load_artifact(path)
+
+
+def test_refuses_to_store_unknown_classes(tmp_path):
+    class Custom:
+        pass
+    with pytest.raises(TypeError, match="cannot store"):
+        save_bundle({"x": Custom()}, str(tmp_path / "model"))
@@ -0,0 +1,30 @@
+# tests/test_explainability.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.explainability import explain_prediction
+from src.features import FEATURE_COLUMNS, extract_features_batch
+from src.model import DEFAULT_BUNDLE, get_bundle, predict_ensemble
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    b = get_bundle(os.path.join(ROOT, DEFAULT_BUNDLE))
+    if b is None:
+        pytest.skip(f"no model bundle at {DEFAULT_BUNDLE}")
+    return b
+
+
+def test_explanation_adds_up_to_the_ensemble_score(bundle):
+    texts = pd.read_csv(os.path.join(ROOT, "data", "training_data.csv"))["text"].sample(20, random_state=0)
+    X = pd.DataFrame(extract_features_batch(texts), columns=FEATURE_COLUMNS)
+    scores = predict_ensemble(X, bundle=bundle)
+    for i in range(len(X)):
+        e = explain_prediction(X.iloc[[i]], bundle=bundle)
+        total = e["base"] + e["table"]["contribution"].sum()
+        np.testing.assert_allclose(total, scores[i], atol=1e-9)
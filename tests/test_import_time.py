@@ -0,0 +1,31 @@
+# tests/test_import_time.py
+import os
+
+import pytest
+
+from src.perf import IMPORT_BUDGETS, check_import_budget, eager_heavy_imports, import_baseline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def _repo_cwd(monkeypatch):
+    # imports run in a fresh interpreter, which resolves modules from the cwd
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture(scope="module")
+def baseline_ms():
+    return import_baseline()
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_no_eager_heavy_imports(module):
+    assert not eager_heavy_imports(module), f"{module} imports heavy modules at import time"
+
+
+@pytest.mark.parametrize("module,budget", sorted(IMPORT_BUDGETS.items()))
+def test_import_within_budget(module, budget, baseline_ms):
+    # relative to `import pandas` in the same run, best of a few cold imports
+    total, problems = check_import_budget(module, budget, baseline_ms, heavy=())
+    assert not problems, "; ".join(problems)
@@ -0,0 +1,41 @@
+# tests/test_model.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import FEATURE_COLUMNS, extract_features_batch
+from src.model import DEFAULT_BUNDLE, RISK_THRESHOLDS, get_bundle, predict_ensemble
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def data():
+    bundle = get_bundle(os.path.join(ROOT, DEFAULT_BUNDLE))
+    if bundle is None:
+        pytest.skip(f"no model bundle at {DEFAULT_BUNDLE}")
+    texts = pd.read_csv(os.path.join(ROOT, "data", "training_data.csv"))["text"]
+    X = pd.DataFrame(extract_features_batch(texts.sample(300, random_state=0)),
+                     columns=FEATURE_COLUMNS)
+    return bundle, X, predict_ensemble(X, bundle=bundle)
+
+
+def test_cascade_with_full_margin_is_sequential(data):
+    bundle, X, scores = data
+    np.testing.assert_allclose(predict_ensemble(X, bundle=bundle, mode="cascade",
+                                                cascade_margin=1.0), scores, atol=1e-12)
+
+
+def test_cascade_keeps_risk_bands(data):
+    bundle, X, scores = data
+    cascade = predict_ensemble(X, bundle=bundle, mode="cascade")
+    np.testing.assert_array_equal(np.searchsorted(RISK_THRESHOLDS, cascade),
+                                  np.searchsorted(RISK_THRESHOLDS, scores))
+
+
+@pytest.mark.parametrize("mode", ["parallel", "compiled"])
+def test_modes_match_sequential(data, mode):
+    bundle, X, scores = data
+    np.testing.assert_allclose(predict_ensemble(X, bundle=bundle, mode=mode), scores, atol=1e-9)
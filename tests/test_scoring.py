@@ -0,0 +1,101 @@
+# tests/test_scoring.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.scoring import (GAD7_BANDS, MDQ_MIN_SYMPTOMS, PHQ9_BANDS, PQB_ELEVATED, PQB_URGENT,
+                         URGENT_PSYCHOSIS, URGENT_SUICIDAL, risk_label, score_frame,
+                         score_record, urgent_messages)
+
+EDGES = [0, 4, 5, 9, 10, 14, 15, 19, 20, 27]
+
+
+def _items(prefix, n, total):
+    """Raw item answers (0-3 each) adding up to `total`."""
+    values = [min(3, max(0, total - 3 * i)) for i in range(n)]
+    assert sum(values) == total
+    return {f"{prefix}_{i + 1}": v for i, v in enumerate(values)}
+
+
+@pytest.mark.parametrize("total", EDGES)
+def test_phq9_band_edges_match_risk_label(total):
+    row = score_frame(pd.DataFrame({"phq9": [total]})).iloc[0]
+    assert row["dep_label"] == risk_label(total, PHQ9_BANDS)
+    raw = score_frame(pd.DataFrame([_items("phq9", 9, total)])).iloc[0]
+    assert raw["phq9"] == total and raw["dep_label"] == row["dep_label"]
+
+
+def test_band_edges():
+    labels = score_frame(pd.DataFrame({"phq9": EDGES, "gad7": [min(t, 21) for t in EDGES]}))
+    assert labels["dep_label"].tolist() == [
+        "Minimal", "Minimal", "Mild", "Mild", "Moderate", "Moderate",
+        "Moderately severe", "Moderately severe", "Severe", "Severe"]
+    assert labels["anx_label"].tolist() == [
+        "Minimal", "Minimal", "Mild", "Mild", "Moderate", "Moderate",
+        "Severe", "Severe", "Severe", "Severe"]
+    assert labels["anx_label"].tolist() == [risk_label(min(t, 21), GAD7_BANDS) for t in EDGES]
+
+
+def test_nan_totals_fall_in_last_band_and_set_no_flag():
+    row = score_frame(pd.DataFrame({"phq9": [np.nan], "phq9_item9": [np.nan], "gad7": [np.nan],
+                                    "mdq_symptoms": [np.nan], "mdq_positive": [True],
+                                    "pqb": [np.nan], "taps": [np.nan]})).iloc[0]
+    assert row["dep_label"] == risk_label(np.nan, PHQ9_BANDS) == "Severe"
+    assert row["anx_label"] == risk_label(np.nan, GAD7_BANDS) == "Severe"
+    assert row["bipolar_flag"] == "Negative"
+    assert row["psychosis_risk"] == "Low"
+    assert row["motor_label"] == "Normal"
+    assert not row["urgent_suicidal"] and not row["urgent_psychosis"]
+
+
+@pytest.mark.parametrize("symptoms,impair,expected", [
+    (MDQ_MIN_SYMPTOMS - 1, "Yes", "Negative"),
+    (MDQ_MIN_SYMPTOMS, "Yes", "Positive"),
+    (7, "No", "Negative"),
+])
+def test_mdq_threshold(symptoms, impair, expected):
+    raw = {f"mdq_{i}": int(i <= symptoms) for i in range(1, 8)}
+    raw["mdq_impair"] = impair
+    row = score_record(raw)
+    assert row["mdq_symptoms"] == symptoms and row["bipolar_flag"] == expected
+    stored = score_record({"mdq_symptoms": symptoms, "mdq_positive": row["mdq_positive"]})
+    assert stored["bipolar_flag"] == expected
+
+
+def test_stored_mdq_positive_is_rethresholded():
+    rows = score_frame(pd.DataFrame({"mdq_symptoms": [MDQ_MIN_SYMPTOMS - 1, MDQ_MIN_SYMPTOMS],
+                                     "mdq_positive": ["True", "True"]}))
+    assert rows["bipolar_flag"].tolist() == ["Negative", "Positive"]
+
+
+@pytest.mark.parametrize("pqb,risk,urgent", [
+    (PQB_ELEVATED - 1, "Low", False),
+    (PQB_ELEVATED, "Elevated", False),
+    (PQB_URGENT, "Elevated", True),
+])
+def test_pqb_thresholds(pqb, risk, urgent):
+    row = score_record(_items("pqb", 4, pqb))
+    assert row["psychosis_risk"] == risk and row["urgent_psychosis"] is urgent
+    assert (URGENT_PSYCHOSIS in urgent_messages(row)) is urgent
+
+
+@pytest.mark.parametrize("text,count", [
+    ("", 0),
+    (",, ,", 0),
+    ("cat,dog", 2),
+    ("cat, ,dog,", 2),
+    (" cat ,  , dog , lion ,", 3),
+])
+def test_fluency_ignores_blank_entries(text, count):
+    assert score_record({"vf_input": text})["vf_score"] == count
+
+
+def test_urgent_flags_are_independent_of_the_bands():
+    # item 9 alone flags suicidal ideation even when the PHQ-9 total is "Minimal"
+    low = score_record({"phq9": 1, "phq9_item9": 1, "pqb": PQB_URGENT})
+    assert low["dep_label"] == risk_label(1, PHQ9_BANDS) == "Minimal"
+    assert urgent_messages(low) == [URGENT_SUICIDAL, URGENT_PSYCHOSIS]
+    # and a "Severe" total does not flag it without item 9
+    high = score_record({"phq9": 27, "phq9_item9": 0, "pqb": 0})
+    assert high["dep_label"] == risk_label(27, PHQ9_BANDS) == "Severe"
+    assert urgent_messages(high) == []
@@ -1,4 +1,5 @@
 # train.py
+import argparse
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -6,13 +7,14 @@ from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.neural_network import MLPClassifier
-import lightgbm as lgb
-import joblib
-from src.features import build_feature_dataframe
+from src.features import build_feature_dataframe, build_feature_matrix
+from src.feature_store import cached_feature_store, split_feature_store, store_path
+from src.perf import peak_rss_mb
+from src.artifact import save_bundle
+from src.training import booster_spec, estimator_spec, train_members
 
-def create_synthetic(n=1200, seed=42):
+def _synthetic_rows(n, seed):
     np.random.seed(seed)
-    rows = []
     for i in range(n):
         age = int(np.clip(np.random.normal(30, 8), 16, 80))
         symptom = float(np.clip(np.random.beta(2,5) + 0.12*(age>45), 0, 1))
@@ -24,53 +26,93 @@ def create_synthetic(n=1200, seed=42):
             text = "I am sometimes down, sleep is irregular, energy fluctuates."
         else:
             text = "I feel low and anxious often, can't sleep or focus."
-        rows.append({
+        yield {
             "participant_id": f"sub_{i:06d}",
             "age": age,
             "text_response": text,
             "reaction_times": rts,
             "audio_bytes": None,
             "label": label
-        })
-    return pd.DataFrame(rows)
+        }
 
-def main_train(n=1200, out_path="models/ensemble.joblib"):
-    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-    df = create_synthetic(n=n)
-    # Build features and fit TF-IDF inside build_feature_dataframe with fit
-    feat_df, tfidf_vect = build_feature_dataframe(df, tfidf_vect=None, fit_tfidf=True)
-    X = feat_df.values
-    y = df["label"].values
-    X_train, X_val, y_train, y_val = train_test_split(X, y, stratify=y, test_size=0.2, random_state=42)
-
-    # Logistic
-    log = LogisticRegression(max_iter=500)
-    log.fit(X_train, y_train)
+def create_synthetic(n=1200, seed=42):
+    return pd.DataFrame(list(_synthetic_rows(n, seed)))
 
-    # Random Forest
-    rf = RandomForestClassifier(n_estimators=200, n_jobs=-1)
-    rf.fit(X_train, y_train)
+def iter_synthetic(n=1200, seed=42, chunk_size=10_000):
+    """Same rows as create_synthetic, yielded as DataFrames of at most chunk_size rows."""
+    rows = []
+    for row in _synthetic_rows(n, seed):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
 
-    # MLP
-    mlp = MLPClassifier(hidden_layer_sizes=(128,64), max_iter=500)
-    mlp.fit(X_train, y_train)
+def main_train(n=1200, out_path="models/ensemble", sparse=True,
+               streaming=False, chunk_size=10_000, vectorizer="hashing",
+               parallel=True, cores=None):
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    if streaming:
+        # Features are built chunk by chunk into a memory-mapped matrix that
+        # later runs with the same settings reuse instead of rebuilding. The
+        # split is made on row indices and written beside it, so the members
+        # (and their worker processes) get memory-mapped matrices, never a
+        # copy of the store in RAM.
+        key_params = {"source": "synthetic", "n": n, "seed": 42}
+        _, _, feature_columns, tfidf_vect = cached_feature_store(
+            lambda: iter_synthetic(n=n, chunk_size=chunk_size), n_rows=n,
+            key_params=key_params, vectorizer=vectorizer)
+        X_train, X_val, y_train, y_val = split_feature_store(
+            store_path(n, key_params, vectorizer), test_size=0.2, random_state=42)
+    else:
+        df = create_synthetic(n=n)
+        y = df["label"].values
+        # Build features and fit TF-IDF; the sparse path keeps TF-IDF as CSR end-to-end
+        if sparse:
+            X, feature_columns, tfidf_vect = build_feature_matrix(df, tfidf_vect=None, fit_tfidf=True)
+        else:
+            feat_df, tfidf_vect = build_feature_dataframe(df, tfidf_vect=None, fit_tfidf=True)
+            X, feature_columns = feat_df.values, feat_df.columns.tolist()
+        X_train, X_val, y_train, y_val = train_test_split(X, y, stratify=y, test_size=0.2, random_state=42)
 
-    # LightGBM (train on full train data)
-    dtrain = lgb.Dataset(X_train, label=y_train)
-    params = {"objective":"binary","metric":"auc","verbosity":-1}
-    lgbm = lgb.train(params, dtrain, num_boost_round=200)
+    specs = {
+        "logistic": estimator_spec(LogisticRegression, max_iter=500),
+        "rf": estimator_spec(RandomForestClassifier, "n_jobs", n_estimators=200),
+        "mlp": estimator_spec(MLPClassifier, hidden_layer_sizes=(128,64), max_iter=500),
+        # LightGBM (train on full train data)
+        "lgbm": booster_spec({"objective":"binary","metric":"auc","verbosity":-1},
+                             num_boost_round=200),
+    }
+    models, _ = train_members(X_train, y_train, specs, cores=cores, parallel=parallel,
+                              X_val=X_val, y_val=y_val)
 
     bundle = {
-        "logistic": log,
-        "rf": rf,
-        "mlp": mlp,
-        "lgbm": lgbm,
+        **models,
         "tfidf_vect": tfidf_vect,
-        "feature_columns": feat_df.columns.tolist()
+        "feature_columns": feature_columns
     }
-    joblib.dump(bundle, out_path)
+    save_bundle(bundle, out_path)
     print("Saved ensemble to", out_path)
+    rss = peak_rss_mb()
+    if rss is not None:
+        kind = "streaming" if streaming else "sparse" if sparse else "dense"
+        print(f"Peak RSS: {rss:.0f} MB ({kind} features)")
     return bundle
 
 if __name__ == "__main__":
-    main_train()
+    ap = argparse.ArgumentParser(description="Train the multimodal ensemble on synthetic data.")
+    ap.add_argument("--n", type=int, default=1200)
+    ap.add_argument("--out", default="models/ensemble", help="artifact directory")
+    ap.add_argument("--dense", action="store_true", help="use the dense DataFrame feature path")
+    ap.add_argument("--streaming", action="store_true",
+                    help="build features in chunks into a cached memory-mapped matrix")
+    ap.add_argument("--chunk-size", type=int, default=10_000)
+    ap.add_argument("--vectorizer", default="hashing", choices=["hashing", "tfidf"],
+                    help="text vectoriser for --streaming (tfidf is fitted on the first chunk)")
+    ap.add_argument("--sequential", action="store_true", help="fit members one after another")
+    ap.add_argument("--cores", type=int, default=None, help="core budget (default: all)")
+    args = ap.parse_args()
+    main_train(n=args.n, out_path=args.out, sparse=not args.dense, streaming=args.streaming,
+               chunk_size=args.chunk_size, vectorizer=args.vectorizer,
+               parallel=not args.sequential, cores=args.cores)